@@ -0,0 +1,177 @@
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from DiffCache import DiffCache
+from DiffOptions import DEFAULT_DIFF_OPTIONS, MERGE_FIRST_PARENT, MERGE_PARENTS, diff_command, diff_engine_args
+from DiffOutputPipeline import COMPRESSION_NONE, copy_to_output, describe_stats, output_path, write_git_output
+from GitObjectReader import GitObjectReader
+
+INDEX_FILE_NAME = 'diff_index.txt'
+
+DiffResult = namedtuple('DiffResult', ['commit', 'path', 'warning', 'stats'], defaults=[None])
+
+
+def diff_cache_key(base, target, pathspecs=(), diff_options=None):
+    """ Cache key of a diff; diffs with the default engine options keep the keys they always had. """
+    diff_options = diff_options or DEFAULT_DIFF_OPTIONS
+    options = diff_engine_args(diff_options)
+    if base is None:
+        options = diff_command(base, target, diff_options)[:3] + options
+    return DiffCache.make_key(base or '', target, (*options, *pathspecs))
+
+
+def write_cached_diff(repo_dir, base, target, diff_file_path, cache=None, token=None,
+                      compression=COMPRESSION_NONE, max_bytes=None, pathspecs=(), chunk_bytes=None, diff_options=None):
+    """
+    Write the diff of two resolved object ids, served from the cache when possible.
+    Git output is streamed straight to the (optionally compressed, size-limited, chunked) file and teed
+    raw into the cache. pathspecs (see DiffStat.pathspec_args) limit the files diffed, diff_options
+    (DiffOptions) set the diff engine; a base of None diffs the merge target the way
+    diff_options.merge_mode says. Returns OutputStats.
+    """
+    key = diff_cache_key(base, target, pathspecs, diff_options)
+    cached_path = cache.lookup(key) if cache is not None else None
+    if cached_path is not None:
+        return copy_to_output(cached_path, diff_file_path, compression, max_bytes, chunk_bytes)
+
+    tee_path = cache.temp_path(key) if cache is not None else None
+    try:
+        stats = write_git_output(repo_dir, [*diff_command(base, target, diff_options), *pathspecs], diff_file_path,
+                                 compression, max_bytes, token, tee_path, chunk_bytes)
+        # A truncated diff is incomplete and must never be served from the cache
+        if tee_path is not None and not stats.truncated:
+            cache.store(key, tee_path, move=True)
+    finally:
+        if tee_path is not None and os.path.exists(tee_path):
+            os.remove(tee_path)
+    return stats
+
+
+def write_index(output_dir, results, elapsed):
+    """ Write diff_index.txt listing each DiffResult with its size and warning, returns its path. """
+    index_path = os.path.join(output_dir, INDEX_FILE_NAME)
+    with open(index_path, 'w') as index_file:
+        index_file.write(f"# Diffs generated {time.strftime('%Y-%m-%d %H:%M:%S')} in {elapsed:.1f}s\n\n")
+        for result in results:
+            if result.path and result.stats is not None:
+                index_file.write(f"{result.commit}\t{describe_stats(result.stats)}\t{result.path}\n")
+            elif result.path:
+                index_file.write(f"{result.commit}\t{os.path.getsize(result.path)} bytes\t{result.path}\n")
+            else:
+                index_file.write(f"{result.commit}\tskipped\n")
+            if result.warning:
+                index_file.write(f"\t{result.warning}\n")
+    return index_path
+
+
+def default_worker_count():
+    return os.cpu_count() or 4
+
+
+def resolve_parents(repo_dir, commit_hashes, token=None):
+    """
+    Resolve many commits over the repository's persistent `git cat-file --batch` connection.
+    Returns {input hash: [full hash, parent1, parent2, ...]} in input order; the value is None for a
+    hash that does not name a commit, so one bad hash does not fail the others.
+    """
+    reader = GitObjectReader.shared(repo_dir)
+    resolved = {}
+    for commit_hash in dict.fromkeys(commit_hashes):
+        if token is not None:
+            token.raise_if_cancelled()
+        try:
+            header = reader.commitHeader(commit_hash)
+        except ValueError:
+            resolved[commit_hash] = None
+            continue
+        resolved[commit_hash] = [header.hash, *header.parents]
+    return resolved
+
+
+def plan_diff(commit_hash, parents, merge_mode=MERGE_FIRST_PARENT):
+    """
+    Return ((base, target) or None, warning) for a commit given its rev-list --parents line.
+    Merges are diffed the way merge_mode (see DiffOptions) says; base is None for the modes git
+    diffs from the merge commit alone. parents is None for a commit resolve_parents could not resolve.
+    """
+    if parents is None:
+        return None, f"Unable to resolve commit {commit_hash}. Skipping."
+    if len(parents) == 1:
+        # This is an initial commit with no parents (rare but possible)
+        return None, f"The commit {commit_hash} has no parents (initial commit). Skipping."
+    if len(parents) == 2:
+        # Not a merge commit, use the single parent
+        return ((parents[1], parents[0]),
+                f"The specified commit {commit_hash} is not a merge commit. Generating diff with its single parent.")
+    if merge_mode == MERGE_PARENTS:
+        # Both sides of the merge against each other
+        return (parents[1], parents[2]), None
+    if merge_mode == MERGE_FIRST_PARENT:
+        # What the merge brought into the branch it was merged into
+        return (parents[1], parents[0]), None
+    return (None, parents[0]), None
+
+
+class BatchDiffGenerator:
+    """ Generates the diffs of many commits concurrently with a bounded worker pool. """
+
+    def __init__(self, repo_dir, output_dir, max_workers=None, token=None, progress=None, cache=None,
+                 compression=COMPRESSION_NONE, max_bytes=None, pathspecs=(), chunk_bytes=None, diff_options=None):
+        self.repo_dir = repo_dir
+        self.output_dir = output_dir
+        self.cache = cache
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.pathspecs = pathspecs
+        self.chunk_bytes = chunk_bytes
+        self.diff_options = diff_options or DEFAULT_DIFF_OPTIONS
+        self.max_workers = max_workers or default_worker_count()
+        self.token = token
+        self.progress = progress or (lambda message: None)
+
+    def run(self, commit_hashes):
+        """ Write <hash>_diff.txt for every commit and return a DiffResult per input hash. """
+        self.progress(f"Resolving {len(commit_hashes)} commits...")
+        resolved = resolve_parents(self.repo_dir, commit_hashes, self.token)
+
+        results = []
+        jobs = {}
+        for commit_hash, parents in resolved.items():
+            revisions, warning = plan_diff(commit_hash, parents, self.diff_options.merge_mode)
+            if revisions is None:
+                results.append(DiffResult(commit_hash, None, warning))
+            else:
+                jobs[commit_hash] = (revisions, warning)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(len(jobs), 1))) as executor:
+            futures = {executor.submit(self.writeDiff, commit_hash, *revisions): (commit_hash, warning)
+                       for commit_hash, (revisions, warning) in jobs.items()}
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    commit_hash, warning = futures[future]
+                    stats = future.result()
+                    results.append(DiffResult(commit_hash, stats.path, warning, stats))
+                    self.progress(f"Generated {done}/{len(futures)} diffs")
+            except BaseException:
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+            finally:
+                if self.cache is not None:
+                    self.cache.save_index()
+
+        order = {commit_hash: index for index, commit_hash in enumerate(resolved)}
+        results.sort(key=lambda result: order[result.commit])
+        return results
+
+    def writeDiff(self, commit_hash, base, target):
+        if self.token is not None:
+            self.token.raise_if_cancelled()
+        diff_file_path = output_path(os.path.join(self.output_dir, f'{commit_hash}_diff.txt'), self.compression)
+        return write_cached_diff(self.repo_dir, base, target, diff_file_path, self.cache, self.token,
+                                 self.compression, self.max_bytes, self.pathspecs, self.chunk_bytes, self.diff_options)
+
+    def writeIndex(self, results, elapsed):
+        """ Write a single index file listing every generated diff, returns its path. """
+        return write_index(self.output_dir, results, elapsed)
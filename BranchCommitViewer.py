@@ -1,38 +1,65 @@
 import os
 import platform
 import subprocess
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QPushButton, QLineEdit, QListWidget, QMessageBox
+from PyQt5.QtCore import Qt, QModelIndex, QTimer
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit, QTreeView,
+                             QMessageBox, QHeaderView, QCheckBox, QCompleter)
 
+from BranchIndex import BranchIndex
+from BranchListModel import BranchListModel, COLUMN_AHEAD, COLUMN_BEHIND, COLUMN_NAME, COLUMN_SUBJECT
+from ChangedFilesDialog import ChangedFilesDialog
 from ConfigManager import ConfigManager
+from DiffCache import DiffCache
+from DiffExtractorCore import (DIFF_INCREMENTAL, DIFF_UNCHANGED, branch_range, diff_branch, list_branches,
+                                remote_branch_name)
+from DiffOptionsWidget import DiffOptionsWidget
+from DiffOutputPipeline import describe_stats
+from OutputOptionsWidget import OutputOptionsWidget
+from PathFilterWidget import PathFilterWidget
+from RefWatcher import REFRESH_RETRY_MS, RefWatcher
+from TaskRunner import TaskRunner
+from Tracing import TRACER
 
 
 class BranchCommitViewer(QWidget):
-    def __init__(self):
+    def __init__(self, task_runner=None, open_file=None):
         super().__init__()
+        self.task_runner = task_runner or TaskRunner(parent=self)
+        self.open_file = open_file  # shows generated files in the app; external program when None
+        self.branches_generation = 0  # identifies the listing partial results belong to
+        self.branches_task = None
+        self.branches_repo = None  # repository of the listed branches, kept current by the ref watcher
+        self.ref_watcher = RefWatcher(self)
+        self.ref_watcher.branchesChanged.connect(self.refreshBranches)
 
         layout = QVBoxLayout()
 
         # UI for repository input
         self.repo_input = QLineEdit(self)
-        self.config_manager = ConfigManager()
+        self.config_manager = ConfigManager.shared()
         self.default_output_dir = self.config_manager.get_output_dir()
         self.default_repo_dir = self.config_manager.get_repo_dir()
+        self.diff_cache = DiffCache.shared(self.config_manager.get_config_dir(),
+                                           self.config_manager.get_diff_cache_max_bytes())
 
         # Corrected conditional check
         if not self.default_repo_dir:
             self.repo_input.setPlaceholderText('Enter repository path')
         else:
             self.repo_input.setText(self.default_repo_dir)
+        self.repo_input.setCompleter(QCompleter(self.config_manager.get_recent_repos(), self))
+        self.repo_input.editingFinished.connect(self.onRepoDirEdited)
 
         layout.addWidget(self.repo_input)
 
         # Base Branch Input
         self.base_branch_input = QLineEdit(self)
-        self.default_base_branch = self.config_manager.get_origin_branch()
+        self.default_base_branch = self.config_manager.get_repo_base_branch(self.default_repo_dir)
         if not self.default_base_branch:
             self.base_branch_input.setPlaceholderText('Enter Base Branch (e.g., origin/release/2024c)')
         else:
             self.base_branch_input.setText(self.default_base_branch)
+        self.base_branch_input.editingFinished.connect(self.onBaseBranchEdited)
         layout.addWidget(self.base_branch_input)
 
         # Button to load all branches
@@ -51,17 +78,77 @@ class BranchCommitViewer(QWidget):
         self.search_input.textChanged.connect(self.searchBranches)
         layout.addWidget(self.search_input)
 
-        # List to display branches
-        self.branch_list = QListWidget(self)
-        self.branch_list.itemDoubleClicked.connect(self.loadCommitsForBranch)
+        # Branches with their ahead/behind counts and last commit; click a header to sort
+        self.branch_model = BranchListModel(self)
+        self.branch_list = QTreeView(self)
+        self.branch_list.setModel(self.branch_model)
+        self.branch_list.setRootIsDecorated(False)
+        self.branch_list.setUniformRowHeights(True)
+        self.branch_list.setSortingEnabled(True)
+        self.branch_list.sortByColumn(COLUMN_NAME, Qt.AscendingOrder)
+        self.branch_list.header().setSectionResizeMode(COLUMN_SUBJECT, QHeaderView.Stretch)
+        self.branch_list.doubleClicked.connect(self.loadCommitsForBranch)
         layout.addWidget(self.branch_list)
 
-        # Button to get all commits for the selected branch
+        # Compression and size limit of written diffs
+        self.output_options = OutputOptionsWidget(self.config_manager, self)
+        layout.addWidget(self.output_options)
+        self.path_filter = PathFilterWidget(self.config_manager, self)
+        layout.addWidget(self.path_filter)
+        # A branch diff is one range, so of the diff options only the engine knobs apply
+        self.diff_options = DiffOptionsWidget(self.config_manager, self, merge_mode=False)
+        layout.addWidget(self.diff_options)
+
+        # Button to get all commits for the selected branch, or just the changed files with patches on demand
+        commits_layout = QHBoxLayout()
         self.get_commits_button = QPushButton('Get All Diffs for Selected Branch', self)
         self.get_commits_button.clicked.connect(self.loadCommitsForSelectedBranch)
-        layout.addWidget(self.get_commits_button)
+        commits_layout.addWidget(self.get_commits_button, 1)
+        self.incremental_checkbox = QCheckBox('Only New Commits', self)
+        self.incremental_checkbox.setToolTip("Diff only what was pushed since the last extraction of the branch "
+                                             "(the full diff again after a rebase or force-push)")
+        self.incremental_checkbox.setChecked(self.config_manager.get_incremental_branch_diffs())
+        self.incremental_checkbox.toggled.connect(self.config_manager.set_incremental_branch_diffs)
+        commits_layout.addWidget(self.incremental_checkbox)
+        self.changed_files_button = QPushButton('Show Changed Files', self)
+        self.changed_files_button.clicked.connect(self.showChangedFilesForSelectedBranch)
+        commits_layout.addWidget(self.changed_files_button)
+        layout.addLayout(commits_layout)
+
+        # Background task status and cancellation
+        status_layout = QHBoxLayout()
+        self.status_label = QLabel('Ready.', self)
+        status_layout.addWidget(self.status_label, 1)
+        self.cancel_button = QPushButton('Cancel', self)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancelTasks)
+        status_layout.addWidget(self.cancel_button)
+        layout.addLayout(status_layout)
 
         self.setLayout(layout)
+        self.config_manager.addListener(self.onConfigChanged)
+
+    def onRepoDirEdited(self):
+        repo_dir = self.repo_input.text().strip()
+        if repo_dir:
+            self.config_manager.set_repo_dir(repo_dir)
+
+    def onBaseBranchEdited(self):
+        repo_dir = self.repo_input.text().strip()
+        base_branch = self.base_branch_input.text().strip()
+        if repo_dir and base_branch:
+            self.config_manager.set_repo_base_branch(repo_dir, base_branch)
+
+    def onConfigChanged(self, key, value):
+        """ Follow the repository chosen in other tabs, with the base branch last used for it. """
+        if key == 'last_repo_dir':
+            if value != self.repo_input.text():
+                self.repo_input.setText(value)
+            base_branch = self.config_manager.get_repo_base_branch(value)
+            if base_branch:
+                self.base_branch_input.setText(base_branch)
+        elif key == 'recent_repos':
+            self.repo_input.completer().model().setStringList(value)
 
     def loadBranches(self):
         repo_dir = self.repo_input.text().strip()
@@ -69,38 +156,103 @@ class BranchCommitViewer(QWidget):
             QMessageBox.warning(self, "Input Error", "Repository path must be provided.")
             return
 
-        try:
-            os.chdir(repo_dir)
-            # Ensure the local repo is up to date with the remote
-            subprocess.run(['git', 'fetch', 'origin'], check=True)
-
-            # Load all branches (including remote)
-            result = subprocess.run(['git', 'branch', '-r'], capture_output=True, text=True)
-            branches = result.stdout.strip().splitlines()
-
-            self.branch_list.clear()
-            for branch in branches:
-                self.branch_list.addItem(branch.strip())
-
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"An error occurred while loading branches: {str(e)}")
+        self.config_manager.set_repo_dir(repo_dir)
+        self.branches_generation += 1
+        self.branches_task = self.startTask(self.loadBranchesTask, repo_dir, self.base_branch_input.text().strip(),
+                                            self.config_manager.get_config_dir(), self.branches_generation,
+                                            on_partial=self.onBranchesPartial, on_result=self.onBranchesLoaded,
+                                            error_title="An error occurred while loading branches")
+        self.branches_repo = repo_dir
+        self.ref_watcher.setRepository(repo_dir)
+
+    def refreshBranches(self):
+        """ Remote refs moved (e.g. fetched): list the branches again without fetching, counting only moved ones. """
+        if self.branches_repo is None:
+            return
+        if self.branches_task is not None and self.task_runner.isActive(self.branches_task):
+            QTimer.singleShot(REFRESH_RETRY_MS, self.refreshBranches)
+            return
+        self.branches_generation += 1
+        self.branches_task = self.task_runner.submit(
+            self.loadBranchesTask, self.branches_repo, self.base_branch_input.text().strip(),
+            self.config_manager.get_config_dir(), self.branches_generation, True, owner=self,
+            on_partial=self.onBranchesPartial, on_result=self.onBranchesLoaded,
+            on_error=lambda message: self.status_label.setText(f"Refreshing the branches failed: {message}"),
+            on_finished=lambda: self.cancel_button.setEnabled(self.task_runner.activeCount(self) > 0))
+
+    @staticmethod
+    def loadBranchesTask(task, repo_dir, base_branch, index_dir, generation, refresh=False):
+        """
+        Worker: fetch, publish the branches from one for-each-ref pass, then their ahead/behind
+        counts against base_branch in batches (cached counts first). A refresh does not fetch.
+        """
+        branches = list_branches(repo_dir, fetch=not refresh, token=task.token, progress=task.report)
+        task.publish((generation, 'updated' if refresh else 'branches', branches))
+        if base_branch:
+            counts = BranchIndex(repo_dir, index_dir).iter_counts(branches, remote_branch_name(base_branch),
+                                                                  task.token, task.report)
+            try:
+                for batch in counts:
+                    task.publish((generation, 'counts', batch))
+            except ValueError as e:
+                task.report(f"Ahead/behind not counted: {e}")
+        return generation
+
+    def onBranchesPartial(self, value):
+        generation, kind, data = value
+        if generation != self.branches_generation:
+            return  # an earlier listing
+        if kind == 'branches':
+            self.displayBranches(data)
+        elif kind == 'updated':
+            self.updateBranches(data)
+        else:
+            with TRACER.span('setBranchCounts', rows=len(data)):
+                self.branch_model.setCounts(data)
+
+    def onBranchesLoaded(self, generation):
+        # Sorting by a count column can only be right once all counts are in
+        if generation == self.branches_generation and self.branch_model.sort_column in (COLUMN_AHEAD, COLUMN_BEHIND):
+            selected = self.selectedBranch()
+            self.branch_model.resort()
+            self.selectBranch(selected)
+
+    def displayBranches(self, branches):
+        with TRACER.span('displayBranches', rows=len(branches)):
+            self.branch_model.setBranches(branches)
+            self.searchBranches()
+
+    def updateBranches(self, branches):
+        """ Branches listed again after refs moved: in place if only tips moved, else keeping the selection. """
+        with TRACER.span('updateBranches', rows=len(branches)):
+            selected = self.selectedBranch()
+            if not self.branch_model.updateBranches(branches):
+                self.selectBranch(selected)
+
+    def selectBranch(self, branch_name):
+        row = self.branch_model.rowOf(branch_name) if branch_name else None
+        if row is None:
+            return
+        while row >= self.branch_model.rowCount() and self.branch_model.canFetchMore(QModelIndex()):
+            self.branch_model.fetchMore(QModelIndex())
+        self.branch_list.setCurrentIndex(self.branch_model.index(row, COLUMN_NAME))
 
     def searchBranches(self):
-        search_term = self.search_input.text().strip().lower()
-        for i in range(self.branch_list.count()):
-            item = self.branch_list.item(i)
-            item.setHidden(search_term not in item.text().lower())
+        self.branch_model.setFilterText(self.search_input.text())
 
-    def loadCommitsForBranch(self, item):
-        branch_name = item.text().strip()
+    def loadCommitsForBranch(self, index):
+        branch_name = index.data(Qt.UserRole)
         self.getCommitsForBranch(branch_name)
 
+    def selectedBranch(self):
+        selected_indexes = self.branch_list.selectionModel().selectedIndexes()
+        return selected_indexes[0].data(Qt.UserRole) if selected_indexes else None
+
     def loadCommitsForSelectedBranch(self):
-        selected_items = self.branch_list.selectedItems()
-        if not selected_items:
+        branch_name = self.selectedBranch()
+        if not branch_name:
             QMessageBox.warning(self, "Error", "No branch selected.")
             return
-        branch_name = selected_items[0].text().strip()
         self.getCommitsForBranch(branch_name)
 
     def getCommitsForBranch(self, branch_name):
@@ -113,47 +265,87 @@ class BranchCommitViewer(QWidget):
                                 "Repository path, base branch, branch, and output directory must be specified.")
             return
 
-        try:
-            os.chdir(repo_dir)
-
-            # Ensure branches are up to date
-            subprocess.run(['git', 'fetch', 'origin'], check=True)
-
-            # If the branch is remote, ensure we are using the correct format for remote branches
-            if not branch_name.startswith('origin/'):
-                branch_name = f'origin/{branch_name}'
-
-            # Use the base branch as inputted by the user
-            if not base_branch.startswith('origin/'):
-                base_branch = f'origin/{base_branch}'
-
-            # Find the common ancestor (where the branch diverged from the base branch)
-            merge_base_result = subprocess.run(['git', 'merge-base', base_branch, branch_name], capture_output=True,
-                                               text=True)
-            merge_base = merge_base_result.stdout.strip()
-
-            if not merge_base:
-                QMessageBox.critical(self, "Error",
-                                     f"Unable to find common ancestor between {base_branch} and {branch_name}.")
-                return
-
-            # Generate diff from the point where the branch diverged from the base
-            diff_file_path = os.path.join(output_dir, f'all_commits_on_{branch_name.replace("/", "_")}.diff')
-
-            with open(diff_file_path, 'w') as diff_file:
-                subprocess.run(['git', 'diff', merge_base, branch_name], stdout=diff_file)
-
-            # Inform the user and open the file
-            QMessageBox.information(self, "Success", f"All diffs for branch {branch_name} saved to {diff_file_path}.")
-            self.openFile(diff_file_path)
+        self.startTask(self.branchDiffTask, repo_dir, branch_name, base_branch, output_dir, self.diff_cache,
+                       self.output_options.compression(), self.output_options.maxBytes(), self.path_filter.pathspecs(),
+                       self.output_options.chunkBytes(), self.incremental_checkbox.isChecked(),
+                       self.config_manager.get_config_dir(), self.diff_options.diffOptions(),
+                       on_result=self.onBranchDiffGenerated)
+
+    @staticmethod
+    def branchDiffTask(task, repo_dir, branch_name, base_branch, output_dir, cache, compression, max_bytes,
+                       pathspecs, chunk_bytes, incremental, index_dir, diff_options):
+        """ Worker: diff a branch against its merge-base with the base branch, returns a BranchDiff. """
+        return diff_branch(repo_dir, branch_name, base_branch, output_dir, cache=cache, compression=compression,
+                           max_bytes=max_bytes, pathspecs=pathspecs, chunk_bytes=chunk_bytes,
+                           incremental=incremental, index_dir=index_dir, diff_options=diff_options,
+                           token=task.token, progress=task.report)
+
+    def showChangedFilesForSelectedBranch(self):
+        branch_name = self.selectedBranch()
+        repo_dir = self.repo_input.text().strip()
+        base_branch = self.base_branch_input.text().strip()
+        if not branch_name:
+            QMessageBox.warning(self, "Error", "No branch selected.")
+            return
+        if not repo_dir or not base_branch:
+            QMessageBox.warning(self, "Input Error", "Repository path and base branch must be specified.")
+            return
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"An error occurred: {str(e)}")
+        self.startTask(self.branchRangeTask, repo_dir, branch_name, base_branch,
+                       on_result=lambda branch_diff: self.openChangedFiles(repo_dir, branch_diff))
+
+    @staticmethod
+    def branchRangeTask(task, repo_dir, branch_name, base_branch):
+        return branch_range(repo_dir, branch_name, base_branch, token=task.token, progress=task.report)
+
+    def openChangedFiles(self, repo_dir, branch_diff):
+        dialog = ChangedFilesDialog(self.task_runner, repo_dir, branch_diff.merge_base, branch_diff.tip,
+                                    f"Changed files of {branch_diff.branch} since {branch_diff.base_branch}",
+                                    self.path_filter.pathspecs(), self.diff_cache, self.diff_options.diffOptions(),
+                                    self)
+        dialog.setAttribute(Qt.WA_DeleteOnClose)
+        dialog.show()
+
+    def onBranchDiffGenerated(self, branch_diff):
+        stats = branch_diff.stats
+        if branch_diff.mode == DIFF_UNCHANGED:
+            summary = f"No new commits on {branch_diff.branch} since the last extraction, {stats.path}."
+        elif branch_diff.mode == DIFF_INCREMENTAL:
+            summary = (f"Commits pushed to {branch_diff.branch} since {branch_diff.since[:10]} saved to {stats.path}.\n"
+                       f"The extraction before is {branch_diff.previous}.")
+        else:
+            summary = f"All diffs for branch {branch_diff.branch} saved to {stats.path}."
+        # Inform the user and open the file
+        QMessageBox.information(self, "Success",
+                                f"{summary}\n{describe_stats(stats)}\n{self.diff_cache.describe_stats()}")
+        self.openFile(stats.path)
+
+    def startTask(self, fn, *args, on_result=None, error_title="An error occurred", **kwargs):
+        """ Run fn in the background, with progress in the status bar and errors in a dialog. """
+        self.cancel_button.setEnabled(True)
+        return self.task_runner.submit(
+            fn, *args, owner=self, on_result=on_result,
+            on_error=lambda message: QMessageBox.critical(self, "Error", f"{error_title}: {message}"),
+            on_progress=self.status_label.setText,
+            on_cancelled=lambda: self.status_label.setText("Cancelled."),
+            on_finished=self.onTaskFinished, **kwargs)
+
+    def onTaskFinished(self):
+        running = self.task_runner.activeCount(self)
+        self.cancel_button.setEnabled(running > 0)
+        if not running and not self.status_label.text().endswith("Cancelled."):
+            self.status_label.setText("Ready.")
+
+    def cancelTasks(self):
+        self.task_runner.cancelAll(self)
 
     def openFile(self, file_path):
         if not os.path.exists(file_path):
             QMessageBox.critical(self, "File Error", f"File does not exist: {file_path}")
             return
+        if self.open_file is not None:
+            self.open_file(file_path)
+            return
 
         try:
             if platform.system() == "Darwin":
@@ -166,12 +358,16 @@ class BranchCommitViewer(QWidget):
             QMessageBox.critical(self, "Error", f"Failed to open file: {str(e)}")
 
     def setSelectedBranchAsOrigin(self):
-        selected_items = self.branch_list.selectedItems()
-        if not selected_items:
+        selected_branch = self.selectedBranch()
+        if not selected_branch:
             QMessageBox.warning(self, "Error", "No branch selected.")
             return
 
         # Set the selected branch as the base/origin branch
-        selected_branch = selected_items[0].text().strip()
         self.base_branch_input.setText(selected_branch)
-        self.default_base_branch = self.config_manager.set_origin_branch(selected_branch)
+        self.default_base_branch = selected_branch
+        repo_dir = self.repo_input.text().strip()
+        if repo_dir:
+            self.config_manager.set_repo_base_branch(repo_dir, selected_branch)
+        else:
+            self.config_manager.set_origin_branch(selected_branch)
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from GitProcess import run_git
+
+HISTORY_DIR_NAME = 'branch_history'
+
+
+def is_ancestor(repo_dir, ancestor, commit, token=None):
+    """ Whether ancestor is reachable from commit; False too if ancestor no longer exists (force-push + gc). """
+    return run_git(repo_dir, ['merge-base', '--is-ancestor', ancestor, commit], token, check=False).returncode == 0
+
+
+class BranchHistory:
+    """
+    The last diff extracted per (branch, base branch) of a repository: merge-base and tip it covered,
+    the file it went to and its OutputStats. Persisted in config_dir (if given), so the next
+    extraction can diff only what was pushed since.
+    """
+
+    def __init__(self, repo_dir, config_dir=None):
+        self.repo_dir = repo_dir
+        self.path = None
+        if config_dir is not None:
+            repo_key = hashlib.sha1(os.path.abspath(repo_dir).encode('utf-8')).hexdigest()[:16]
+            self.path = os.path.join(config_dir, HISTORY_DIR_NAME, f'{repo_key}.json')
+        self._lock = threading.Lock()
+        self.extractions = self.load()  # 'base..branch' -> last extraction
+
+    @staticmethod
+    def key(branch_name, base_branch):
+        return f'{base_branch}..{branch_name}'
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as history_file:
+                return json.load(history_file).get('extractions', {})
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading branch history: {e}")
+            return {}
+
+    def save(self):
+        """ Atomically write the history. """
+        if self.path is None:
+            return
+        with self._lock:
+            data = json.dumps({'saved': time.time(), 'extractions': self.extractions})
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', delete=False, dir=os.path.dirname(self.path)) as temp_file:
+                temp_file.write(data)
+            os.replace(temp_file.name, self.path)
+        except OSError as e:
+            print(f"Error saving branch history: {e}")
+
+    def last(self, branch_name, base_branch):
+        """ The last extraction of branch_name against base_branch as a dict, or None. """
+        with self._lock:
+            return self.extractions.get(self.key(branch_name, base_branch))
+
+    def record(self, branch_diff, pathspecs=(), full_path=None, diff_options=()):
+        """
+        Remember a written BranchDiff (with stats) as the starting point of the next incremental diff.
+        full_path is the last full diff the chain of deltas starts from, diff_options the engine
+        arguments it was diffed with (see DiffOptions.diff_engine_args). Paths are stored absolute, as
+        later extractions may run from another working directory.
+        """
+        stats = branch_diff.stats._replace(path=os.path.abspath(branch_diff.stats.path))
+        with self._lock:
+            self.extractions[self.key(branch_diff.branch, branch_diff.base_branch)] = {
+                'merge_base': branch_diff.merge_base,
+                'tip': branch_diff.tip,
+                'since': branch_diff.since,
+                'previous': branch_diff.previous and os.path.abspath(branch_diff.previous),
+                'full': os.path.abspath(full_path or stats.path),
+                'pathspecs': list(pathspecs),
+                'diff_options': list(diff_options),
+                'stats': stats._asdict(),
+                'time': time.time(),
+            }
+        self.save()
+
+    def forget(self, branch_name, base_branch):
+        with self._lock:
+            if self.extractions.pop(self.key(branch_name, base_branch), None) is None:
+                return
+        self.save()
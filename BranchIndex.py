@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from GitObjectReader import GitObjectReader
+from GitProcess import run_git
+
+INDEX_DIR_NAME = 'branch_index'
+REMOTE_REFS = 'refs/remotes/origin'
+# NUL separated, so subjects may contain anything; symref is set for origin/HEAD, which is skipped
+BRANCH_FORMAT = '%(refname:short)%00%(objectname)%00%(committerdate:unix)%00%(symref)%00%(subject)'
+DEFAULT_WORKERS = 8
+# Counts are published in batches of this many branches
+COUNT_BATCH_SIZE = 100
+
+# ahead/behind are None until counted against a base branch
+BranchInfo = namedtuple('BranchInfo', ['name', 'tip', 'date', 'subject', 'ahead', 'behind'],
+                        defaults=[None, None])
+
+
+def list_branch_refs(repo_dir, token=None, pattern=REMOTE_REFS):
+    """ BranchInfos (without counts) of the branches under pattern, from one `git for-each-ref` pass. """
+    result = run_git(repo_dir, ['for-each-ref', f'--format={BRANCH_FORMAT}', pattern], token)
+    branches = []
+    for line in result.stdout.splitlines():
+        name, tip, date, symref, subject = line.split('\0', 4)
+        if not symref:
+            branches.append(BranchInfo(name, tip, int(date or 0), subject))
+    return branches
+
+
+def ahead_behind(repo_dir, base_tip, tip, token=None):
+    """ (commits on tip not on base_tip, commits on base_tip not on tip). """
+    result = run_git(repo_dir, ['rev-list', '--left-right', '--count', f'{tip}...{base_tip}', '--'], token)
+    ahead, behind = result.stdout.split()
+    return int(ahead), int(behind)
+
+
+class BranchIndex:
+    """
+    Branch metadata of a repository plus ahead/behind counts against base branches.
+    Counts are cached per branch tip (for the current tip of the base) and persisted in config_dir
+    (if given), so a reload only counts the branches that moved; a moved base invalidates its counts.
+    """
+
+    def __init__(self, repo_dir, config_dir=None):
+        self.repo_dir = repo_dir
+        self.path = None
+        if config_dir is not None:
+            repo_key = hashlib.sha1(os.path.abspath(repo_dir).encode('utf-8')).hexdigest()[:16]
+            self.path = os.path.join(config_dir, INDEX_DIR_NAME, f'{repo_key}.json')
+        self._lock = threading.Lock()
+        self.bases = self.load()  # base branch -> {'tip': base tip, 'counts': {tip: [ahead, behind]}}
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as index_file:
+                return json.load(index_file).get('bases', {})
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading branch index: {e}")
+            return {}
+
+    def save(self):
+        """ Atomically write the cached counts. """
+        if self.path is None:
+            return
+        with self._lock:
+            data = json.dumps({'saved': time.time(), 'bases': self.bases})
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', delete=False, dir=os.path.dirname(self.path)) as temp_file:
+                temp_file.write(data)
+            os.replace(temp_file.name, self.path)
+        except OSError as e:
+            print(f"Error saving branch index: {e}")
+
+    def cachedCounts(self, base_branch, base_tip):
+        """ {branch tip: [ahead, behind]} counted against base_tip; reset when the base moved. """
+        with self._lock:
+            base = self.bases.get(base_branch)
+            if base is None or base['tip'] != base_tip:
+                base = self.bases[base_branch] = {'tip': base_tip, 'counts': {}}
+            return base['counts']
+
+    def iter_counts(self, branches, base_branch, token=None, progress=None, max_workers=DEFAULT_WORKERS):
+        """
+        Count ahead/behind for every branch against base_branch on a pool of git processes.
+        Yields {branch name: (ahead, behind)} batches: first everything cached, then the rest as
+        it is counted. Raises ValueError if base_branch does not exist.
+        """
+        progress = progress or (lambda message: None)
+        base_tip = GitObjectReader.shared(self.repo_dir).resolve(base_branch)
+        counts = self.cachedCounts(base_branch, base_tip)
+
+        cached = {branch.name: tuple(counts[branch.tip]) for branch in branches if branch.tip in counts}
+        if cached:
+            yield cached
+        # Branches sharing a tip are counted once
+        pending = {}
+        for branch in branches:
+            if branch.tip not in counts:
+                pending.setdefault(branch.tip, []).append(branch.name)
+        if not pending:
+            return
+
+        progress(f"Counting ahead/behind of {len(pending)} branches against {base_branch}...")
+        batch = {}
+        done = 0
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            futures = {executor.submit(ahead_behind, self.repo_dir, base_tip, tip, token): tip for tip in pending}
+            try:
+                for future in as_completed(futures):
+                    tip = futures[future]
+                    result = future.result()
+                    with self._lock:
+                        counts[tip] = list(result)
+                    for name in pending[tip]:
+                        batch[name] = result
+                    done += 1
+                    if len(batch) >= COUNT_BATCH_SIZE:
+                        progress(f"Counted {done}/{len(pending)} branches...")
+                        yield batch
+                        batch = {}
+            except BaseException:
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+            finally:
+                self.save()
+        if batch:
+            yield batch
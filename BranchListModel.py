@@ -0,0 +1,194 @@
+from array import array
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from CommitListModel import CompactStringColumn, FETCH_BATCH_SIZE
+from GitLogReader import format_commit_date
+
+COLUMN_NAME = 0
+COLUMN_AHEAD = 1
+COLUMN_BEHIND = 2
+COLUMN_DATE = 3
+COLUMN_SUBJECT = 4
+HEADERS = ['Branch', 'Ahead', 'Behind', 'Last Commit', 'Subject']
+UNKNOWN_COUNT = -1
+
+
+class BranchListModel(QAbstractTableModel):
+    """
+    Columnar table of branches (name, ahead/behind counts, last commit date and subject).
+    Sorting and searching only rearrange an array of row ids; the columns are never copied.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.names = CompactStringColumn()
+        self.subjects = CompactStringColumn()
+        self.lowered = []  # lowercased names for searching
+        self.tips = []
+        self.dates = array('q')
+        self.ahead = array('l')
+        self.behind = array('l')
+        self.ids = {}  # name -> branch id
+        self.search_term = ''
+        self.sort_column = COLUMN_NAME
+        self.sort_order = Qt.AscendingOrder
+        self.rows = array('l')  # branch ids shown, filtered and sorted
+        self.loaded = 0
+
+    def setBranches(self, branches):
+        """ Replace the content with BranchInfos; counts they lack show as empty until setCounts. """
+        self.beginResetModel()
+        self.names.clear()
+        self.subjects.clear()
+        self.tips = []
+        self.dates = array('q')
+        self.ahead = array('l')
+        self.behind = array('l')
+        for branch in branches:
+            self.names.append(branch.name)
+            self.subjects.append(branch.subject)
+            self.tips.append(branch.tip)
+            self.dates.append(branch.date)
+            self.ahead.append(UNKNOWN_COUNT if branch.ahead is None else branch.ahead)
+            self.behind.append(UNKNOWN_COUNT if branch.behind is None else branch.behind)
+        self.lowered = [branch.name.lower() for branch in branches]
+        self.ids = {branch.name: branch_id for branch_id, branch in enumerate(branches)}
+        self.updateRows()
+        self.endResetModel()
+
+    def updateBranches(self, branches):
+        """
+        Take the BranchInfos of a later listing. If only tips moved (same branches in the same
+        order) the rows are updated in place, keeping selection and scroll position, and returns
+        True; moved branches lose their counts until setCounts. Otherwise it is setBranches.
+        """
+        if len(branches) != len(self.names) or any(branch.name != self.names[branch_id]
+                                                    for branch_id, branch in enumerate(branches)):
+            self.setBranches(branches)
+            return False
+        self.subjects.clear()
+        for branch_id, branch in enumerate(branches):
+            self.subjects.append(branch.subject)
+            self.dates[branch_id] = branch.date
+            if branch.tip != self.tips[branch_id]:
+                self.ahead[branch_id] = UNKNOWN_COUNT if branch.ahead is None else branch.ahead
+                self.behind[branch_id] = UNKNOWN_COUNT if branch.behind is None else branch.behind
+        self.tips = [branch.tip for branch in branches]
+        if self.loaded:
+            self.dataChanged.emit(self.index(0, 0), self.index(self.loaded - 1, len(HEADERS) - 1))
+        return True
+
+    def rowOf(self, name):
+        """ Row showing branch name, or None if it is filtered out. """
+        branch_id = self.ids.get(name)
+        if branch_id is None:
+            return None
+        try:
+            return self.rows.index(branch_id)
+        except ValueError:
+            return None
+
+    def setCounts(self, counts):
+        """ Fill in {branch name: (ahead, behind)} as counts arrive; the rows keep their places. """
+        for name, (ahead, behind) in counts.items():
+            branch_id = self.ids.get(name)
+            if branch_id is not None:
+                self.ahead[branch_id] = ahead
+                self.behind[branch_id] = behind
+        if self.loaded:
+            self.dataChanged.emit(self.index(0, COLUMN_AHEAD), self.index(self.loaded - 1, COLUMN_BEHIND))
+
+    def setFilterText(self, search_term):
+        """ Show only branches containing search_term (case-insensitive). """
+        self.beginResetModel()
+        self.search_term = search_term.strip().lower()
+        self.updateRows()
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.beginResetModel()
+        self.sort_column = column
+        self.sort_order = order
+        self.updateRows()
+        self.endResetModel()
+
+    def resort(self):
+        """ Apply the current sort again, e.g. once all counts arrived. """
+        self.sort(self.sort_column, self.sort_order)
+
+    def sortKey(self):
+        if self.sort_column == COLUMN_AHEAD:
+            return self.ahead.__getitem__
+        if self.sort_column == COLUMN_BEHIND:
+            return self.behind.__getitem__
+        if self.sort_column == COLUMN_DATE:
+            return self.dates.__getitem__
+        if self.sort_column == COLUMN_SUBJECT:
+            return lambda branch_id: self.subjects[branch_id].lower()
+        return None  # names: for-each-ref already lists them sorted
+
+    def updateRows(self):
+        branch_ids = range(len(self.names))
+        if self.search_term:
+            branch_ids = [branch_id for branch_id in branch_ids if self.search_term in self.lowered[branch_id]]
+        key = self.sortKey()
+        if key is not None:
+            branch_ids = sorted(branch_ids, key=key)
+        rows = array('l', branch_ids)
+        if self.sort_order == Qt.DescendingOrder:
+            rows.reverse()
+        self.rows = rows
+        self.loaded = min(FETCH_BATCH_SIZE, len(self.rows))
+
+    def availableRows(self):
+        return len(self.rows)
+
+    def branchAt(self, row):
+        return self.names[self.rows[row]]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self.loaded < self.availableRows()
+
+    def fetchMore(self, parent):
+        if parent.isValid():
+            return
+        count = min(FETCH_BATCH_SIZE, self.availableRows() - self.loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self.loaded:
+            return None
+        branch_id = self.rows[index.row()]
+        column = index.column()
+        if role == Qt.UserRole:
+            return self.names[branch_id]
+        if role == Qt.ToolTipRole:
+            return f"{self.tips[branch_id][:10]} {self.subjects[branch_id]}"
+        if role == Qt.TextAlignmentRole and column in (COLUMN_AHEAD, COLUMN_BEHIND):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role != Qt.DisplayRole:
+            return None
+        if column == COLUMN_NAME:
+            return self.names[branch_id]
+        if column in (COLUMN_AHEAD, COLUMN_BEHIND):
+            count = (self.ahead if column == COLUMN_AHEAD else self.behind)[branch_id]
+            return '' if count == UNKNOWN_COUNT else str(count)
+        if column == COLUMN_DATE:
+            return format_commit_date(self.dates[branch_id])
+        return self.subjects[branch_id]
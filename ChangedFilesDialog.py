@@ -0,0 +1,124 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QFontDatabase
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QLabel, QTreeWidget, QTreeWidgetItem, QPlainTextEdit, QSplitter,
+                             QHeaderView)
+
+from DiffExtractorCore import changed_files
+from DiffStat import describe_file_stats, file_patch
+from Tracing import TRACER
+
+# Longer patches are cut in the preview; the written diff files are never limited by this
+MAX_PREVIEW_CHARS = 2 * 1024 * 1024
+STATUS_NAMES = {'A': 'added', 'D': 'deleted', 'M': 'modified', 'R': 'renamed', 'C': 'copied', 'T': 'type changed'}
+
+
+class ChangedFilesDialog(QDialog):
+    """
+    Overview of a diff: the changed files with their added/deleted line counts come from one cheap
+    `git diff --numstat`, and a file's patch is only generated when it is selected.
+    """
+
+    def __init__(self, task_runner, repo_dir, base, target, title, pathspecs=(), cache=None, diff_options=None,
+                 parent=None):
+        super().__init__(parent)
+        self.task_runner = task_runner
+        self.repo_dir = repo_dir
+        self.base = base
+        self.target = target
+        self.cache = cache
+        self.diff_options = diff_options
+        self.file_stats = []
+        self.patches = {}  # path -> patch text of the files loaded so far
+
+        self.setWindowTitle(title)
+        self.resize(1000, 700)
+        layout = QVBoxLayout(self)
+        self.summary_label = QLabel(f"Listing changed files of {base[:10]}..{target[:10]}...", self)
+        layout.addWidget(self.summary_label)
+
+        splitter = QSplitter(Qt.Vertical, self)
+        self.file_tree = QTreeWidget(splitter)
+        self.file_tree.setHeaderLabels(['Status', '+', '-', 'Path'])
+        self.file_tree.setRootIsDecorated(False)
+        self.file_tree.setUniformRowHeights(True)
+        self.file_tree.setSortingEnabled(True)
+        self.file_tree.header().setSectionResizeMode(3, QHeaderView.Stretch)
+        self.file_tree.currentItemChanged.connect(self.showPatch)
+        self.patch_view = QPlainTextEdit(splitter)
+        self.patch_view.setReadOnly(True)
+        self.patch_view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.patch_view.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.patch_view.setPlaceholderText('Select a file to load its patch.')
+        splitter.setSizes([300, 400])
+        layout.addWidget(splitter)
+
+        self.task_runner.submit(self.listTask, repo_dir, base, target, list(pathspecs), diff_options, owner=self,
+                                on_result=self.displayFiles, on_error=self.onTaskError)
+
+    @staticmethod
+    def listTask(task, repo_dir, base, target, pathspecs, diff_options):
+        return changed_files(repo_dir, base, target, pathspecs, task.token, diff_options)
+
+    def displayFiles(self, file_stats):
+        with TRACER.span('displayFiles', rows=len(file_stats)):
+            self.populateFiles(file_stats)
+
+    def populateFiles(self, file_stats):
+        self.file_stats = file_stats
+        self.summary_label.setText(f"{self.base[:10]}..{self.target[:10]}: {describe_file_stats(file_stats)}")
+        self.file_tree.setSortingEnabled(False)
+        items = []
+        for index, file_stat in enumerate(file_stats):
+            path = f"{file_stat.old_path} -> {file_stat.path}" if file_stat.old_path else file_stat.path
+            item = QTreeWidgetItem([STATUS_NAMES.get(file_stat.status, file_stat.status),
+                                    'bin' if file_stat.added is None else str(file_stat.added),
+                                    'bin' if file_stat.deleted is None else str(file_stat.deleted), path])
+            for column in (1, 2):
+                item.setTextAlignment(column, Qt.AlignRight)
+                if file_stat.added is not None:
+                    item.setData(column, Qt.DisplayRole, file_stat.added if column == 1 else file_stat.deleted)
+            item.setData(0, Qt.UserRole, index)
+            items.append(item)
+        self.file_tree.addTopLevelItems(items)
+        self.file_tree.setSortingEnabled(True)
+        for column in range(3):
+            self.file_tree.resizeColumnToContents(column)
+
+    def showPatch(self, item, previous=None):
+        if item is None:
+            return
+        file_stat = self.file_stats[item.data(0, Qt.UserRole)]
+        if file_stat.path in self.patches:
+            self.setPatchText(self.patches[file_stat.path])
+            return
+        self.patch_view.setPlainText(f"Loading patch of {file_stat.path}...")
+        self.task_runner.submit(self.patchTask, self.repo_dir, self.base, self.target, file_stat, self.cache,
+                                self.diff_options, owner=self, on_result=self.onPatchLoaded, on_error=self.onTaskError)
+
+    @staticmethod
+    def patchTask(task, repo_dir, base, target, file_stat, cache, diff_options):
+        patch = file_patch(repo_dir, base, target, file_stat, cache, task.token, diff_options)
+        if cache is not None:
+            cache.save_index()
+        return file_stat.path, patch
+
+    def onPatchLoaded(self, result):
+        path, patch = result
+        self.patches[path] = patch
+        # Only show it if the user has not moved on to another file meanwhile
+        item = self.file_tree.currentItem()
+        if item is not None and self.file_stats[item.data(0, Qt.UserRole)].path == path:
+            self.setPatchText(patch)
+
+    def setPatchText(self, patch):
+        if len(patch) > MAX_PREVIEW_CHARS:
+            patch = patch[:MAX_PREVIEW_CHARS] + f"\n... [preview cut after {MAX_PREVIEW_CHARS} characters] ..."
+        with TRACER.span('showPatch', bytes=len(patch)):
+            self.patch_view.setPlainText(patch or "No textual changes.")
+
+    def onTaskError(self, message):
+        self.summary_label.setText(f"Error: {message}")
+
+    def done(self, result):
+        self.task_runner.cancelAll(self)
+        super().done(result)
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import re
+import sqlite3
+from collections import namedtuple
+
+from GitLogReader import CommitRecord, GitLogReader
+from GitObjectReader import GitObjectReader
+from GitProcess import run_git
+
+INDEX_DIR_NAME = 'commit_index'
+PR_NUMBER_REGEX = re.compile(r'#(\d+)')
+
+# List filters: SQL condition over the index and the same check for a freshly parsed record
+FILTER_ALL = 'all'
+FILTER_MERGES = 'merges'
+FILTER_PRS = 'prs'
+FILTERS = {
+    FILTER_ALL: ('1', lambda record: True),
+    FILTER_MERGES: ('is_merge = 1', lambda record: len(record.parents) > 1),
+    FILTER_PRS: ("is_merge = 1 AND instr(subject, 'pull request') > 0",
+                 lambda record: len(record.parents) > 1 and 'pull request' in record.subject),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commits (
+    hash TEXT PRIMARY KEY,
+    parents TEXT NOT NULL,
+    is_merge INTEGER NOT NULL,
+    pr_number INTEGER,
+    author TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    subject TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS commits_order ON commits (generation DESC, position);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+RefreshResult = namedtuple('RefreshResult', ['new_commits', 'rebuilt', 'generation'])
+
+
+def extract_pr_number(subject):
+    match = PR_NUMBER_REGEX.search(subject)
+    return int(match.group(1)) if match else None
+
+
+class CommitIndex:
+    """
+    Per-repository SQLite index of commit metadata, in `git log` order.
+    refresh() only walks the commits between the last indexed tip and HEAD; history rewrites
+    (the old tip is no longer an ancestor) fall back to a full rebuild.
+    """
+
+    def __init__(self, repo_dir, config_dir):
+        self.repo_dir = repo_dir
+        repo_key = hashlib.sha1(os.path.abspath(repo_dir).encode('utf-8')).hexdigest()[:16]
+        self.path = os.path.join(config_dir, INDEX_DIR_NAME, f'{repo_key}.sqlite')
+
+    def connect(self):
+        """ Open a connection; each thread uses its own. """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        connection.executescript(SCHEMA)
+        return connection
+
+    @staticmethod
+    def getMeta(connection, key):
+        row = connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def refresh(self, token=None, progress=None):
+        """ Bring the index up to HEAD and return a RefreshResult. """
+        pages = self.iter_refresh(token, progress)
+        while True:
+            try:
+                next(pages)
+            except StopIteration as stop:
+                return stop.value
+
+    def iter_refresh(self, token=None, progress=None):
+        """
+        Bring the index up to HEAD, yielding every newly indexed page of CommitRecords as it is stored.
+        Returns (as the generator's value) a RefreshResult; generation tags the rows added (None if none).
+        """
+        progress = progress or (lambda message: None)
+        head = GitObjectReader.shared(self.repo_dir).resolve('HEAD')
+
+        connection = self.connect()
+        try:
+            last_tip = self.getMeta(connection, 'tip')
+            if last_tip == head:
+                return RefreshResult(0, False, None)
+
+            rebuild = not last_tip or not self.isAncestor(last_tip, head, token)
+            rev_args = [head] if rebuild else [f'{last_tip}..{head}']
+            progress("Indexing all commits..." if rebuild else f"Indexing commits since {last_tip[:10]}...")
+
+            with connection:
+                if rebuild:
+                    connection.execute('DELETE FROM commits')
+                generation = connection.execute('SELECT COALESCE(MAX(generation), 0) + 1 FROM commits').fetchone()[0]
+                count = 0
+                for page in GitLogReader(self.repo_dir, rev_args, token).iter_pages():
+                    connection.executemany(
+                        'INSERT OR REPLACE INTO commits VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        [(record.hash, ' '.join(record.parents), int(len(record.parents) > 1),
+                          extract_pr_number(record.subject), record.author, record.date, record.subject,
+                          generation, count + offset) for offset, record in enumerate(page)])
+                    count += len(page)
+                    progress(f"Indexed {count} commits...")
+                    yield page
+                connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('tip', head))
+            return RefreshResult(count, rebuild, generation)
+        finally:
+            connection.close()
+
+    def isAncestor(self, ancestor, descendant, token=None):
+        result = run_git(self.repo_dir, ['merge-base', '--is-ancestor', ancestor, descendant], token, check=False)
+        if result.returncode not in (0, 1):
+            # Unknown object (e.g. garbage collected after a rewrite)
+            return False
+        return result.returncode == 0
+
+    def iter_pages(self, list_filter=FILTER_ALL, page_size=500, before_generation=None):
+        """ Yield pages of CommitRecords matching list_filter, newest first, optionally older rows only. """
+        condition = FILTERS[list_filter][0]
+        connection = self.connect()
+        try:
+            cursor = connection.execute(
+                f'SELECT hash, parents, author, timestamp, subject FROM commits '
+                f'WHERE {condition} AND generation < ? ORDER BY generation DESC, position',
+                (before_generation if before_generation is not None else 2 ** 62,))
+            while True:
+                rows = cursor.fetchmany(page_size)
+                if not rows:
+                    break
+                yield [CommitRecord(commit_hash, tuple(parents.split()), author, timestamp, subject)
+                       for commit_hash, parents, author, timestamp, subject in rows]
+        finally:
+            connection.close()
+
+    def count(self, list_filter=FILTER_ALL):
+        connection = self.connect()
+        try:
+            return connection.execute(f'SELECT COUNT(*) FROM commits WHERE {FILTERS[list_filter][0]}').fetchone()[0]
+        finally:
+            connection.close()
+
+    @staticmethod
+    def matches(record, list_filter):
+        return FILTERS[list_filter][1](record)
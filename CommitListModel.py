@@ -0,0 +1,212 @@
+from array import array
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize
+from PyQt5.QtGui import QFont, QFontMetrics, QPen
+from PyQt5.QtWidgets import QStyle, QStyledItemDelegate
+
+from GitLogReader import format_commit_date
+
+# Rows handed to the view per fetchMore; the rest stay in the columns until scrolled to
+FETCH_BATCH_SIZE = 200
+
+HashRole = Qt.UserRole
+AuthorRole = Qt.UserRole + 1
+DateRole = Qt.UserRole + 2
+SubjectRole = Qt.UserRole + 3
+
+
+class CompactStringColumn:
+    """ Stores many strings in one UTF-8 buffer plus an offsets array instead of one object each. """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offsets = array('Q', [0])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def append(self, value):
+        self.buffer += value.encode('utf-8')
+        self.offsets.append(len(self.buffer))
+
+    def __getitem__(self, index):
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]].decode('utf-8')
+
+    def clear(self):
+        self.buffer = bytearray()
+        self.offsets = array('Q', [0])
+
+
+class CommitListModel(QAbstractListModel):
+    """
+    Columnar list model of commits. Hashes live in one fixed-width buffer, authors and subjects in
+    CompactStringColumns, and rows are only exposed to the view in batches via fetchMore.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.hashes = bytearray()
+        self.hash_length = 40  # SHA-1; SHA-256 repositories switch to 64 on the first record
+        self.authors = CompactStringColumn()
+        self.subjects = CompactStringColumn()
+        self.dates = array('q')
+        self.filtered_ids = None  # record ids matching the active filter, None when unfiltered
+        self.order = None  # record ids in display order once newer records were prepended, else None
+        self.positions = None  # record id -> position in order, built when a filter needs it
+        self.loaded = 0  # rows exposed to the view so far
+
+    def recordCount(self):
+        return len(self.dates)
+
+    def availableRows(self):
+        return self.recordCount() if self.filtered_ids is None else len(self.filtered_ids)
+
+    def recordId(self, row):
+        if self.filtered_ids is not None:
+            return self.filtered_ids[row]
+        return row if self.order is None else self.order[row]
+
+    def hashAt(self, record_id):
+        start = record_id * self.hash_length
+        return self.hashes[start:start + self.hash_length].decode('ascii')
+
+    def clear(self):
+        self.beginResetModel()
+        self.hashes = bytearray()
+        self.authors.clear()
+        self.subjects.clear()
+        self.dates = array('q')
+        self.filtered_ids = None
+        self.order = None
+        self.positions = None
+        self.loaded = 0
+        self.endResetModel()
+
+    def appendRecords(self, records, matching_ids=None):
+        """
+        Append CommitRecords to the columns. matching_ids lists the new record ids that pass
+        the active filter, so they can be added to it without re-filtering everything.
+        """
+        first_id = self.storeRecords(records)
+        if self.order is not None:
+            self.order.extend(range(first_id, self.recordCount()))
+            self.positions = None
+        if self.filtered_ids is not None and matching_ids:
+            self.filtered_ids.extend(matching_ids)
+        # Fill the first screen right away; later rows are fetched as the user scrolls
+        if self.loaded < FETCH_BATCH_SIZE and self.canFetchMore(QModelIndex()):
+            self.fetchMore(QModelIndex())
+
+    def prependRecords(self, records, matching_ids=None):
+        """
+        Add CommitRecords newer than everything listed (e.g. pulled since): stored like
+        appendRecords but shown first. matching_ids are the new ids passing the active filter.
+        """
+        if not records:
+            return
+        first_id = self.storeRecords(records)
+        new_ids = array('l', range(first_id, self.recordCount()))
+        self.order = new_ids + (self.order if self.order is not None else array('l', range(first_id)))
+        self.positions = None
+        shown = len(records)
+        if self.filtered_ids is not None:
+            self.filtered_ids = array('l', matching_ids or []) + self.filtered_ids
+            shown = len(matching_ids or [])
+        if shown:
+            self.beginInsertRows(QModelIndex(), 0, shown - 1)
+            self.loaded += shown
+            self.endInsertRows()
+
+    def storeRecords(self, records):
+        """ Append CommitRecords to the columns, returns the id of the first. """
+        first_id = self.recordCount()
+        if records and not self.dates:
+            self.hash_length = len(records[0].hash)
+        for record in records:
+            self.hashes += record.hash.encode('ascii')
+            self.authors.append(record.author)
+            self.subjects.append(record.subject)
+            self.dates.append(record.date)
+        return first_id
+
+    def setFilter(self, record_ids):
+        """ Show only the given record ids (in id order), or everything when record_ids is None. """
+        if record_ids is not None and self.order is not None:
+            # Prepended records have higher ids than the ones shown after them
+            if self.positions is None:
+                self.positions = {record_id: position for position, record_id in enumerate(self.order)}
+            record_ids = sorted(record_ids, key=self.positions.__getitem__)
+        self.beginResetModel()
+        self.filtered_ids = None if record_ids is None else array('l', record_ids)
+        self.loaded = min(FETCH_BATCH_SIZE, self.availableRows())
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self.loaded < self.availableRows()
+
+    def fetchMore(self, parent):
+        if parent.isValid():
+            return
+        count = min(FETCH_BATCH_SIZE, self.availableRows() - self.loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self.loaded:
+            return None
+        record_id = self.recordId(index.row())
+        if role == HashRole:
+            return self.hashAt(record_id)
+        if role == AuthorRole:
+            return self.authors[record_id]
+        if role == DateRole:
+            return format_commit_date(self.dates[record_id])
+        if role == SubjectRole or role == Qt.ToolTipRole:
+            return self.subjects[record_id]
+        if role == Qt.DisplayRole:
+            return f"PR: {self.hashAt(record_id)} - {self.subjects[record_id]}"
+        return None
+
+
+class CommitItemDelegate(QStyledItemDelegate):
+    """ Paints a commit row (hash, author and date, subject, separator) without per-row widgets. """
+    PADDING = 6
+
+    def rowHeight(self, option):
+        return QFontMetrics(option.font).lineSpacing() * 3 + self.PADDING * 2 + 1
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.rowHeight(option))
+
+    def paint(self, painter, option, index):
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+            painter.setPen(option.palette.highlightedText().color())
+        else:
+            painter.setPen(option.palette.text().color())
+
+        line_height = QFontMetrics(option.font).lineSpacing()
+        rect = option.rect.adjusted(self.PADDING, self.PADDING, -self.PADDING, 0)
+
+        bold_font = QFont(option.font)
+        bold_font.setBold(True)
+        painter.setFont(bold_font)
+        painter.drawText(QRect(rect.left(), rect.top(), rect.width(), line_height), Qt.AlignLeft,
+                         f"PR: {index.data(HashRole)}")
+        painter.setFont(option.font)
+        painter.drawText(QRect(rect.left(), rect.top() + line_height, rect.width(), line_height), Qt.AlignLeft,
+                         f"{index.data(AuthorRole)} | {index.data(DateRole)}")
+        subject = QFontMetrics(option.font).elidedText(index.data(SubjectRole), Qt.ElideRight, rect.width())
+        painter.drawText(QRect(rect.left(), rect.top() + line_height * 2, rect.width(), line_height), Qt.AlignLeft,
+                         subject)
+
+        painter.setPen(QPen(option.palette.mid().color()))
+        painter.drawLine(option.rect.left(), option.rect.bottom(), option.rect.right(), option.rect.bottom())
+        painter.restore()
@@ -1,24 +1,110 @@
+import atexit
+import copy
 import json
 import os
-
-import json
-import os
-import shutil
 import tempfile
+import threading
+
+from DiffOptions import diff_options_from_settings
+
+DEFAULT_CONFIG_FILE = 'diff_extractor_default_config.json'
+# Changes are written at most once per interval, and once more at exit
+FLUSH_INTERVAL_SECONDS = 1.0
+MAX_RECENT_REPOS = 10
+DEFAULT_CONFIG = {
+    "last_repo_dir": "",
+    "last_output_dir": "",
+    "origin_branch": "",
+    "diff_cache_max_mb": 512,
+    "output_compression": "",
+    "output_max_mb": 0,
+    "output_chunk_ktokens": 0,
+    "fetch_freshness_seconds": 300,
+    "path_include": "",
+    "path_exclude": "",
+    "last_workspace_file": "",
+    "incremental_branch_diffs": False,
+    "recent_repos": [],
+    "repos": {}
+}
+# Key listeners receive for per-repository settings, with (repository, setting, value)
+REPO_SETTINGS_KEY = "repos"
 
 
 class ConfigManager:
-    def __init__(self, config_file='diff_extractor_default_config.json'):
+    """
+    The app settings, kept in memory and shared by every tab (see shared()). Setters only update
+    the memory and notify listeners; the file is rewritten atomically at most once per
+    FLUSH_INTERVAL_SECONDS, and on exit.
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, config_file=DEFAULT_CONFIG_FILE, flush_interval=FLUSH_INTERVAL_SECONDS):
         self.config_file = config_file
-        self.config = {
-            "last_repo_dir": "",
-            "last_output_dir": "",
-            "origin_branch": ""
-        }
+        self.flush_interval = flush_interval
+        self.config = copy.deepcopy(DEFAULT_CONFIG)
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()  # serializes writes; taken before _lock, never while holding it
+        self._listeners = []
+        self._dirty = False
+        self._flush_timer = None
         self.load_config()
+        atexit.register(self.flush)
+
+    @classmethod
+    def shared(cls, config_file=DEFAULT_CONFIG_FILE):
+        """ One instance per config file for the whole process, so tabs never hold diverging copies. """
+        path = os.path.abspath(config_file)
+        with cls._instances_lock:
+            if path not in cls._instances:
+                cls._instances[path] = cls(config_file)
+            return cls._instances[path]
+
+    def addListener(self, listener):
+        """
+        Call listener(key, value) after every change, on the thread that made it (the GUI thread
+        for widgets). Per-repository settings arrive as (REPO_SETTINGS_KEY, (repo, setting, value)).
+        """
+        self._listeners.append(listener)
+
+    def removeListener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, key, value):
+        for listener in list(self._listeners):
+            listener(key, value)
+
+    def _set(self, key, value):
+        with self._lock:
+            if self.config.get(key) == value:
+                return
+            self.config[key] = value
+            self._markDirty()
+        self._notify(key, value)
+
+    def _markDirty(self):
+        """ Schedule a flush unless one is pending; later changes within the interval ride along. """
+        self._dirty = True
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """ Write pending changes now. """
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+        self.save_config()
 
     def save_config(self):
-        """ Save the current configuration to the file in a more robust way. """
+        """ Atomically write the current configuration to the file. """
         try:
             # Ensure the directory for the config file exists
             config_dir = os.path.dirname(self.config_file)
@@ -29,16 +115,14 @@ class ConfigManager:
             if config_dir and not os.access(config_dir, os.W_OK):
                 raise PermissionError(f"Cannot write to directory: {config_dir}")
 
-            # Write to a temporary file first
-            with tempfile.NamedTemporaryFile('w', delete=False, dir=config_dir) as temp_file:
-                json.dump(self.config, temp_file, indent=4)
-                temp_file_path = temp_file.name
-
-            # Explicitly close the temporary file
-            temp_file.close()
-
-            # Replace the old config file with the new one
-            shutil.move(temp_file_path, self.config_file)
+            # Write to a temporary file first, then replace the old config file with it. The state is
+            # read once the write lock is held, so the last write always has the newest state.
+            with self._write_lock:
+                with self._lock:
+                    data = json.dumps(self.config, indent=4)
+                with tempfile.NamedTemporaryFile('w', delete=False, dir=config_dir or None) as temp_file:
+                    temp_file.write(data)
+                os.replace(temp_file.name, self.config_file)
 
         except PermissionError as e:
             print(f"Permission error: {e}")
@@ -46,39 +130,146 @@ class ConfigManager:
             print(f"Error saving config: {e}")
 
     def load_config(self):
-        """ Load the configuration from the file if it exists. """
+        """ Load the configuration from the file if it exists; missing keys keep their defaults. """
         if os.path.exists(self.config_file):
             try:
                 with open(self.config_file, 'r') as file:
-                    self.config = json.load(file)
+                    self.config.update(json.load(file))
             except json.JSONDecodeError as e:
                 print(f"Error loading JSON: {e}")
             except Exception as e:
                 print(f"Error reading config file: {e}")
+
+    @staticmethod
+    def repo_key(repo_dir):
+        return os.path.abspath(os.path.expanduser(repo_dir))
+
     def set_repo_dir(self, repo_dir):
-        """ Set the last repository directory and save the config. """
-        self.config["last_repo_dir"] = repo_dir
-        self.save_config()
+        """ Set the last repository directory and move it to the front of the recent repositories. """
+        self._set("last_repo_dir", repo_dir)
+        if repo_dir:
+            key = self.repo_key(repo_dir)
+            recent = [key] + [path for path in self.get_recent_repos() if path != key]
+            self._set("recent_repos", recent[:MAX_RECENT_REPOS])
 
     def set_output_dir(self, output_dir):
-        """ Set the last output directory and save the config. """
-        self.config["last_output_dir"] = output_dir
-        self.save_config()
+        """ Set the last output directory. """
+        self._set("last_output_dir", output_dir)
 
     def set_origin_branch(self, origin_branch):
-        """ Set the origin branch and save the config. """
-        self.config["origin_branch"] = origin_branch
-        self.save_config()
+        """ Set the origin branch. """
+        self._set("origin_branch", origin_branch)
+
+    def set_repo_setting(self, repo_dir, setting, value):
+        """ Set a setting of one repository (see get_repo_setting). """
+        key = self.repo_key(repo_dir)
+        with self._lock:
+            settings = self.config.setdefault("repos", {}).setdefault(key, {})
+            if settings.get(setting) == value:
+                return
+            settings[setting] = value
+            self._markDirty()
+        self._notify(REPO_SETTINGS_KEY, (key, setting, value))
+
+    def set_repo_base_branch(self, repo_dir, base_branch):
+        """ Set the base branch of a repository; it also becomes the default of repositories without one. """
+        self.set_repo_setting(repo_dir, "base_branch", base_branch)
+        self.set_origin_branch(base_branch)
+
+    def set_repo_filter(self, repo_dir, list_filter):
+        """ Set the commit filter last used to list a repository. """
+        self.set_repo_setting(repo_dir, "filter", list_filter)
+
+    def set_repo_diff_options(self, repo_dir, diff_options):
+        """ Set the DiffOptions (merge mode and diff engine knobs) a repository is diffed with. """
+        self.set_repo_setting(repo_dir, "diff_options", diff_options._asdict())
+
+    def set_output_compression(self, compression):
+        """ Set the compression of written diffs ("", "gzip" or "zstd"). """
+        self._set("output_compression", compression)
+
+    def set_output_max_mb(self, max_mb):
+        """ Set the size limit of written diffs in MB (0 = unlimited). """
+        self._set("output_max_mb", max_mb)
+
+    def set_output_chunk_ktokens(self, ktokens):
+        """ Set the chunk size of split diffs in thousands of tokens (0 = no split). """
+        self._set("output_chunk_ktokens", ktokens)
+
+    def set_path_filters(self, include, exclude):
+        """ Set the include/exclude pathspecs applied to diffs. """
+        self._set("path_include", include)
+        self._set("path_exclude", exclude)
+
+    def set_workspace_file(self, path):
+        """ Set the workspace file opened in the Workspace tab. """
+        self._set("last_workspace_file", path)
+
+    def set_incremental_branch_diffs(self, enabled):
+        """ Set whether branch diffs only cover the commits pushed since the last extraction. """
+        self._set("incremental_branch_diffs", enabled)
 
     def get_repo_dir(self):
         return self.config.get("last_repo_dir", "")
 
+    def get_recent_repos(self):
+        """ Repositories last used, most recent first. """
+        return list(self.config.get("recent_repos", []))
+
     def get_output_dir(self):
         return self.config.get("last_output_dir", "")
 
     def get_origin_branch(self):
         return self.config.get("origin_branch", "")
 
-    def __del__(self):
-        """ Ensure config is saved on application exit. """
-        self.save_config()
+    def get_repo_setting(self, repo_dir, setting, default=None):
+        """ A setting of one repository ("base_branch", "filter", "diff_options"), or default if it was never set. """
+        with self._lock:
+            return self.config.get("repos", {}).get(self.repo_key(repo_dir), {}).get(setting, default)
+
+    def get_repo_base_branch(self, repo_dir):
+        """ Base branch of a repository; the last base branch used anywhere if it has none. """
+        return self.get_repo_setting(repo_dir, "base_branch") or self.get_origin_branch()
+
+    def get_repo_filter(self, repo_dir, default=None):
+        return self.get_repo_setting(repo_dir, "filter", default)
+
+    def get_repo_diff_options(self, repo_dir):
+        """ DiffOptions of a repository; the defaults (merges against their first parent) if never set. """
+        return diff_options_from_settings(self.get_repo_setting(repo_dir, "diff_options"))
+
+    def get_config_dir(self):
+        """ Directory holding the config file; caches and indexes live next to it. """
+        return os.path.dirname(os.path.abspath(self.config_file))
+
+    def get_output_compression(self):
+        return self.config.get("output_compression", "")
+
+    def get_output_max_mb(self):
+        return int(self.config.get("output_max_mb", 0))
+
+    def get_output_max_bytes(self):
+        """ Size limit of written diffs in bytes, or None when unlimited. """
+        return self.get_output_max_mb() * 1024 * 1024 or None
+
+    def get_output_chunk_ktokens(self):
+        return int(self.config.get("output_chunk_ktokens", 0))
+
+    def get_path_include(self):
+        return self.config.get("path_include", "")
+
+    def get_path_exclude(self):
+        return self.config.get("path_exclude", "")
+
+    def get_workspace_file(self):
+        return self.config.get("last_workspace_file", "")
+
+    def get_incremental_branch_diffs(self):
+        return bool(self.config.get("incremental_branch_diffs", False))
+
+    def get_fetch_freshness_seconds(self):
+        """ How long a fetch of origin is reused before actions fetch again (0 = always fetch). """
+        return int(self.config.get("fetch_freshness_seconds", 300))
+
+    def get_diff_cache_max_bytes(self):
+        return int(self.config.get("diff_cache_max_mb", 512)) * 1024 * 1024
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR_NAME = 'diff_cache'
+INDEX_FILE_NAME = 'diff_cache_index.json'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class DiffCache:
+    """
+    Persistent diff cache keyed by (base object id, target object id, diff options).
+    Object ids are immutable, so an entry never goes stale; the cache is only bounded by size,
+    evicting the least recently used diffs first.
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, config_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = os.path.join(config_dir, CACHE_DIR_NAME)
+        self.index_path = os.path.join(config_dir, INDEX_FILE_NAME)
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load_index()
+
+    @classmethod
+    def shared(cls, config_dir, max_bytes=DEFAULT_MAX_BYTES):
+        """ One cache per config directory, shared by every tab and worker thread. """
+        config_dir = os.path.abspath(config_dir)
+        with cls._instances_lock:
+            if config_dir not in cls._instances:
+                cls._instances[config_dir] = cls(config_dir, max_bytes)
+            return cls._instances[config_dir]
+
+    @staticmethod
+    def make_key(base, target, options=()):
+        """ Key for the diff of base..target; base and target must be resolved object ids. """
+        raw = '\0'.join([base, target, *options])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def load_index(self):
+        """ Load the index, dropping entries whose blob disappeared. """
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r') as index_file:
+                index = json.load(index_file)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading diff cache index: {e}")
+            return
+
+        for key, entry in sorted(index.get('entries', {}).items(), key=lambda item: item[1]['last_used']):
+            if os.path.exists(self.entry_path(key)):
+                self.entries[key] = entry['size']
+                self.total_bytes += entry['size']
+
+    def save_index(self):
+        """ Atomically write the index if it changed since the last save. """
+        with self._lock:
+            if not self._dirty:
+                return
+            # The index stores a relative recency only; order is what LRU needs
+            entries = {key: {'size': size, 'last_used': position} for position, (key, size)
+                       in enumerate(self.entries.items())}
+            self._dirty = False
+
+        try:
+            os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', delete=False, dir=os.path.dirname(self.index_path)) as temp_file:
+                json.dump({'saved': time.time(), 'entries': entries}, temp_file)
+            os.replace(temp_file.name, self.index_path)
+        except OSError as e:
+            print(f"Error saving diff cache index: {e}")
+
+    def lookup(self, key):
+        """ Return the cached file for key, or None. Counts a hit or a miss. """
+        with self._lock:
+            if key in self.entries and os.path.exists(self.entry_path(key)):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                self._dirty = True
+                return self.entry_path(key)
+            self.misses += 1
+            return None
+
+    def temp_path(self, key):
+        """ Scratch file on the cache's filesystem, so store(move=True) is a rename. """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return os.path.join(self.cache_dir, f'{key}.{threading.get_ident()}.tmp')
+
+    def store(self, key, source_path, move=False):
+        """
+        Copy (or move) a freshly generated diff into the cache and evict down to the size cap.
+        The index is persisted by save_index(), which callers run once per batch.
+        """
+        size = os.path.getsize(source_path)
+        if size > self.max_bytes:
+            return
+
+        target_path = self.entry_path(key)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        if move:
+            os.replace(source_path, target_path)
+        else:
+            temp_path = self.temp_path(key)
+            shutil.copyfile(source_path, temp_path)
+            os.replace(temp_path, target_path)
+
+        with self._lock:
+            self.total_bytes += size - self.entries.pop(key, 0)
+            self.entries[key] = size
+            evicted = []
+            while self.total_bytes > self.max_bytes and self.entries:
+                old_key, old_size = self.entries.popitem(last=False)
+                self.total_bytes -= old_size
+                self.evictions += 1
+                evicted.append(old_key)
+            self._dirty = True
+
+        for old_key in evicted:
+            try:
+                os.remove(self.entry_path(old_key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self.entries), 'bytes': self.total_bytes, 'max_bytes': self.max_bytes}
+
+    def describe_stats(self):
+        stats = self.stats()
+        return (f"Diff cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries "
+                f"({stats['bytes'] / (1024 * 1024):.1f} of {stats['max_bytes'] / (1024 * 1024):.0f} MB)")
@@ -0,0 +1,175 @@
+import json
+import os
+
+# Rough size of a token in diff text; good enough to keep chunks under an LLM context budget
+BYTES_PER_TOKEN = 4
+# Smaller budgets would split nearly every hunk
+MIN_CHUNK_BYTES = 1024
+FILE_MARKERS = (b'diff --git ', b'diff --cc ', b'diff --combined ')
+HUNK_MARKER = b'@@'
+
+
+def tokens_to_bytes(tokens):
+    return tokens * BYTES_PER_TOKEN
+
+
+def estimate_tokens(size):
+    return -(-size // BYTES_PER_TOKEN)
+
+
+def diff_file_name(line):
+    """ Path a `diff --git a/x b/y` (or --cc) header line is about. """
+    text = line.decode('utf-8', errors='replace').rstrip('\n')
+    for marker in FILE_MARKERS:
+        if text.startswith(marker.decode()):
+            text = text[len(marker):]
+            break
+    return text.rsplit(' b/', 1)[-1] if ' b/' in text else text
+
+
+class DiffChunker:
+    """
+    Splits a streamed diff into numbered chunk files of at most budget bytes, cutting only between
+    files and hunks (a hunk larger than the budget is cut between lines). A file that continues in
+    the next chunk gets its header repeated there. On close a JSON manifest lists every chunk with
+    its size, estimated tokens and files. Memory use is bounded by the budget, never by the diff.
+    """
+
+    def __init__(self, chunk_path, manifest_path, budget_bytes, open_file=None, source=None):
+        self.chunk_path = chunk_path  # callable: chunk number -> path
+        self.manifest_path = manifest_path
+        self.budget = max(budget_bytes, MIN_CHUNK_BYTES)
+        self.open_file = open_file or (lambda path: open(path, 'wb'))
+        self.source = source
+        self.chunks = []
+        self.sink = None
+        self.chunk = None  # manifest entry of the open chunk
+        self.pending = b''  # incomplete last line of the previous write
+        self.file_path = None
+        self.header = []
+        self.header_bytes = 0
+        self.header_written = False
+        self.file_entry = None
+        self.hunk = []
+        self.hunk_bytes = 0
+
+    def write(self, data):
+        # Only '\n' ends a line: git passes a lone '\r' through inside content lines, which splitlines() would cut
+        *lines, self.pending = (self.pending + data).split(b'\n')
+        for line in lines:
+            self.addLine(line + b'\n')
+
+    def addLine(self, line):
+        if line.startswith(FILE_MARKERS):
+            self.flushFile()
+            self.file_path = diff_file_name(line)
+            self.header = [line]
+            self.header_bytes = len(line)
+        elif line.startswith(HUNK_MARKER) and self.file_path is not None:
+            self.flushHunk()
+            self.hunk = [line]
+            self.hunk_bytes = len(line)
+        elif self.hunk:
+            if self.header_bytes + self.hunk_bytes + len(line) > self.budget and len(self.hunk) > 1:
+                # Oversized hunk: emit what fits and continue under a repeated hunk header
+                hunk_header = self.hunk[0]
+                self.flushHunk()
+                self.hunk = [hunk_header]
+                self.hunk_bytes = len(hunk_header)
+            self.hunk.append(line)
+            self.hunk_bytes += len(line)
+        else:
+            self.header.append(line)
+            self.header_bytes += len(line)
+
+    def flushHunk(self):
+        if self.hunk:
+            self.emit(self.hunk, self.hunk_bytes)
+        self.hunk = []
+        self.hunk_bytes = 0
+
+    def flushFile(self):
+        self.flushHunk()
+        if not self.header_written and self.header:
+            # Files without hunks (binary, renames, mode changes) and text before the first file
+            self.emit([], 0)
+        self.file_path = None
+        self.header = []
+        self.header_bytes = 0
+        self.header_written = False
+        self.file_entry = None
+
+    def emit(self, lines, size):
+        needed = size + (0 if self.header_written else self.header_bytes)
+        if self.chunk is not None and self.chunk['bytes'] and self.chunk['bytes'] + needed > self.budget:
+            self.closeChunk()
+        if self.chunk is None:
+            self.openChunk()
+        if not self.header_written:
+            self.writeLines(self.header, self.header_bytes)
+            self.header_written = True
+            if self.file_path is not None:
+                entry = {'path': self.file_path, 'bytes': self.header_bytes}
+                if self.file_entry is not None:
+                    # The file started in an earlier chunk
+                    self.file_entry['split'] = entry['split'] = True
+                self.file_entry = entry
+                self.chunk['files'].append(entry)
+        self.writeLines(lines, size)
+        if self.file_entry is not None:
+            self.file_entry['bytes'] += size
+
+    def writeLines(self, lines, size):
+        for line in lines:
+            self.sink.write(line)
+        self.chunk['bytes'] += size
+
+    def openChunk(self):
+        path = self.chunk_path(len(self.chunks) + 1)
+        self.sink = self.open_file(path)
+        self.chunk = {'path': os.path.basename(path), 'bytes': 0, 'tokens': 0, 'files': []}
+
+    def closeChunk(self):
+        if self.chunk is None:
+            return
+        self.sink.close()
+        self.chunk['tokens'] = estimate_tokens(self.chunk['bytes'])
+        self.chunks.append(self.chunk)
+        self.sink = None
+        self.chunk = None
+        # Whatever follows in the current file needs its header again in the next chunk
+        self.header_written = False
+
+    def chunkPaths(self):
+        directory = os.path.dirname(self.manifest_path)
+        return [os.path.join(directory, chunk['path']) for chunk in self.chunks]
+
+    def close(self):
+        if self.pending:
+            self.addLine(self.pending)
+            self.pending = b''
+        self.flushFile()
+        self.closeChunk()
+        manifest = {
+            'source': self.source,
+            'budget_bytes': self.budget,
+            'budget_tokens': estimate_tokens(self.budget),
+            'bytes_per_token': BYTES_PER_TOKEN,
+            'total_bytes': sum(chunk['bytes'] for chunk in self.chunks),
+            'chunks': self.chunks,
+        }
+        with open(self.manifest_path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        self.removeStaleChunks()
+
+    def removeStaleChunks(self):
+        """ Delete higher-numbered chunks left over from an earlier, longer run into the same files. """
+        number = len(self.chunks) + 1
+        while os.path.exists(self.chunk_path(number)):
+            os.remove(self.chunk_path(number))
+            number += 1
+
+    def abort(self):
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
@@ -0,0 +1,325 @@
+# GUI-free operations of the Git Diff Extractor, shared by the Qt widgets and the command line.
+# Nothing here may import Qt, so headless runs start without loading it.
+import json
+import os
+import subprocess
+import tempfile
+import time
+from collections import namedtuple
+
+from BatchDiffGenerator import BatchDiffGenerator, plan_diff, resolve_parents, write_cached_diff, write_index
+from BranchHistory import BranchHistory, is_ancestor
+from BranchIndex import BranchIndex, list_branch_refs
+from CommitIndex import CommitIndex, FILTER_ALL
+from DiffOptions import (MERGE_FIRST_PARENT, SINGLE_COMMIT_MERGE_MODES, describe_diff_options, diff_command,
+                         diff_engine_args)
+from DiffOutputPipeline import COMPRESSION_NONE, OutputStats, output_path, write_git_output
+from DiffStat import diff_stat
+from FetchCoordinator import FetchCoordinator, branch_refspec
+from GitLogReader import GitLogReader
+from GitObjectReader import GitObjectReader
+from GitProcess import run_git
+from PRPatchExtractor import PRPatchExtractor
+
+DEFAULT_PAGE_SIZE = 500
+
+# Outcome of a diff operation: DiffResults (each with OutputStats), batch index file, wall time
+DiffRun = namedtuple('DiffRun', ['results', 'index_path', 'elapsed'])
+# mode says what stats.path holds: the full merge_base..tip diff, only since..tip (previous is the artifact
+# of the extraction before), or nothing new (stats are those of the last extraction, which covered tip)
+BranchDiff = namedtuple('BranchDiff', ['branch', 'base_branch', 'merge_base', 'tip', 'stats', 'mode', 'since',
+                                       'previous'], defaults=[None, None, None])
+DIFF_FULL = 'full'
+DIFF_INCREMENTAL = 'incremental'
+DIFF_UNCHANGED = 'unchanged'
+# Time one set of DiffOptions took to diff a batch of commits uncached, and how large the result was
+# (files: file sections in the diffs); error is set when git rejected the options
+OptionsTiming = namedtuple('OptionsTiming', ['options', 'elapsed', 'bytes', 'files', 'error'], defaults=[None])
+
+
+def _noop(message):
+    pass
+
+
+def fetch_origin(repo_dir, token=None, progress=_noop, refspecs=(), force=False):
+    """
+    Fetch origin (only refspecs if given) through the repository's FetchCoordinator: skipped while
+    the last fetch is fresh, joined when one is already running. Returns True if a fetch ran.
+    """
+    return FetchCoordinator.shared(repo_dir).fetch(refspecs, token, progress, force)
+
+
+def _matching_pages(pages, list_filter):
+    """ Filter a generator of pages, passing its return value through. """
+    while True:
+        try:
+            page = next(pages)
+        except StopIteration as stop:
+            return stop.value
+        matching = [record for record in page if CommitIndex.matches(record, list_filter)]
+        if matching:
+            yield matching
+
+
+def iter_commit_pages(repo_dir, list_filter=FILTER_ALL, index_dir=None, page_size=DEFAULT_PAGE_SIZE, token=None,
+                      progress=_noop):
+    """
+    Yield pages of CommitRecords (newest first) matching list_filter.
+    With index_dir the persistent commit index is refreshed first: newly indexed commits stream out
+    as they are read and the rest comes from the index. Without it the log is streamed directly.
+    """
+    if index_dir is None:
+        yield from _matching_pages(GitLogReader(repo_dir, token=token).iter_pages(page_size), list_filter)
+        return
+
+    commit_index = CommitIndex(repo_dir, index_dir)
+    refresh = yield from _matching_pages(commit_index.iter_refresh(token, progress), list_filter)
+    yield from commit_index.iter_pages(list_filter, page_size, before_generation=refresh.generation)
+
+
+def refresh_commits(repo_dir, list_filter=FILTER_ALL, index_dir=None, token=None, progress=_noop):
+    """
+    Bring the commit index in index_dir up to HEAD, reading only the commits since the tip it last
+    saw. Returns (RefreshResult, the new CommitRecords matching list_filter, newest first); when
+    RefreshResult.rebuilt, history was rewritten and earlier listings are stale.
+    """
+    pages = _matching_pages(CommitIndex(repo_dir, index_dir).iter_refresh(token, progress), list_filter)
+    records = []
+    while True:
+        try:
+            records.extend(next(pages))
+        except StopIteration as stop:
+            return stop.value, records
+
+
+def list_commits(repo_dir, list_filter=FILTER_ALL, index_dir=None, token=None, progress=_noop):
+    """ Yield the CommitRecords matching list_filter one by one. """
+    for page in iter_commit_pages(repo_dir, list_filter, index_dir, token=token, progress=progress):
+        yield from page
+
+
+def diff_commit(repo_dir, commit_hashes, output_dir, cache=None, compression=COMPRESSION_NONE, max_bytes=None,
+                max_workers=None, pathspecs=(), chunk_bytes=None, diff_options=None, token=None, progress=_noop):
+    """
+    Diff each commit against its parent (merges: the way diff_options.merge_mode says, by default
+    against the first parent). Returns a DiffRun.
+    With chunk_bytes each diff is split into chunks of at most that size plus a manifest.
+    """
+    started = time.perf_counter()
+    generator = BatchDiffGenerator(repo_dir, output_dir, max_workers=max_workers, token=token, progress=progress,
+                                   cache=cache, compression=compression, max_bytes=max_bytes, pathspecs=pathspecs,
+                                   chunk_bytes=chunk_bytes, diff_options=diff_options)
+    results = generator.run(commit_hashes)
+    elapsed = time.perf_counter() - started
+    index_path = generator.writeIndex(results, elapsed) if len(results) > 1 else None
+    return DiffRun(results, index_path, elapsed)
+
+
+def _count_file_sections(path):
+    with open(path, 'rb') as diff_file:
+        return sum(1 for line in diff_file if line.startswith(b'diff --'))
+
+
+def time_diff_options(repo_dir, commit_hashes, variants, pathspecs=(), token=None, progress=_noop):
+    """
+    Diff commit_hashes once per DiffOptions of variants (see DiffOptions.diff_options_variants), one
+    git process at a time and bypassing the diff cache, so the timings compare. Returns an
+    OptionsTiming per variant, for picking the fastest options whose diffs are still usable.
+    """
+    resolved = resolve_parents(repo_dir, commit_hashes, token)
+    timings = []
+    with tempfile.TemporaryDirectory(prefix='diff_options_') as scratch_dir:
+        diff_file_path = os.path.join(scratch_dir, 'diff.txt')
+        for number, diff_options in enumerate(variants, 1):
+            progress(f"Timing {number}/{len(variants)}: {describe_diff_options(diff_options)}...")
+            elapsed = written = files = 0
+            error = None
+            for commit_hash, parents in resolved.items():
+                revisions, _ = plan_diff(commit_hash, parents, diff_options.merge_mode)
+                if revisions is None:
+                    continue
+                started = time.perf_counter()
+                try:
+                    stats = write_git_output(repo_dir, [*diff_command(*revisions, diff_options), *pathspecs],
+                                             diff_file_path, token=token)
+                except subprocess.CalledProcessError as e:
+                    # e.g. --remerge-diff before git 2.36
+                    error = (e.stderr or str(e)).strip()
+                    break
+                elapsed += time.perf_counter() - started
+                written += stats.bytes_in
+                files += _count_file_sections(diff_file_path)
+            timings.append(OptionsTiming(diff_options, elapsed, written, files, error))
+    return timings
+
+
+def diff_pr(repo_dir, merge_commit, output_dir, combined=False, cache=None, compression=COMPRESSION_NONE,
+            diff_options=None, token=None, progress=_noop):
+    """
+    Write the patches of the commits a PR merge introduced. Returns a DiffRun. Of diff_options only
+    the engine knobs apply; every commit is diffed against its first parent.
+    """
+    started = time.perf_counter()
+    extractor = PRPatchExtractor(repo_dir, output_dir, cache=cache, token=token, progress=progress,
+                                 compression=compression, diff_options=diff_options)
+    results = extractor.run(merge_commit, combined=combined)
+    elapsed = time.perf_counter() - started
+    index_path = write_index(output_dir, results, elapsed) if len(results) > 1 else None
+    return DiffRun(results, index_path, elapsed)
+
+
+def remote_branch_name(branch_name):
+    """ Branch names are remote branches; ensure the origin/ prefix. """
+    return branch_name if branch_name.startswith('origin/') else f'origin/{branch_name}'
+
+
+def commit_range(repo_dir, commit_hash, token=None, merge_mode=MERGE_FIRST_PARENT):
+    """
+    (base, target) object ids diff_commit would diff for a commit; ValueError for root commits.
+    The merge modes git diffs from the merge commit alone list the first parent's changes.
+    """
+    if merge_mode in SINGLE_COMMIT_MERGE_MODES:
+        merge_mode = MERGE_FIRST_PARENT
+    parents = resolve_parents(repo_dir, [commit_hash], token)[commit_hash]
+    revisions, warning = plan_diff(commit_hash, parents, merge_mode)
+    if revisions is None:
+        raise ValueError(warning)
+    return revisions
+
+
+def branch_range(repo_dir, branch_name, base_branch, fetch=True, token=None, progress=_noop):
+    """
+    Resolve the diff of a branch against the point where it diverged from base_branch.
+    Returns a BranchDiff without stats.
+    """
+    branch_name = remote_branch_name(branch_name)
+    base_branch = remote_branch_name(base_branch)
+
+    if fetch:
+        # Ensure both branches are up to date, without fetching every other ref
+        fetch_origin(repo_dir, token, progress, refspecs=(branch_refspec(branch_name), branch_refspec(base_branch)))
+
+    # Find the common ancestor (where the branch diverged from the base branch)
+    progress(f"Finding merge-base of {base_branch} and {branch_name}...")
+    merge_base_result = run_git(repo_dir, ['merge-base', base_branch, branch_name], token, check=False)
+    merge_base = merge_base_result.stdout.strip()
+
+    if not merge_base:
+        raise ValueError(f"Unable to find common ancestor between {base_branch} and {branch_name}.")
+
+    # The branch moves, so diffs are keyed by its current tip rather than its name
+    branch_tip = GitObjectReader.shared(repo_dir).resolve(branch_name)
+    return BranchDiff(branch_name, base_branch, merge_base, branch_tip, None)
+
+
+def _incremental_start(repo_dir, last, branch_diff, pathspecs, diff_options, token, progress):
+    """ The last extraction if the branch only gained commits since, else None (with the reason as progress). """
+    name = branch_diff.branch
+    if last is None:
+        progress(f"No earlier extraction of {name}, writing the full diff...")
+    elif last['pathspecs'] != list(pathspecs):
+        progress(f"Path filters changed since the last extraction of {name}, writing the full diff...")
+    elif last.get('diff_options', []) != diff_engine_args(diff_options):
+        progress(f"Diff options changed since the last extraction of {name}, writing the full diff...")
+    elif not os.path.exists(last['stats']['path']):
+        progress(f"The last diff of {name} was removed, writing the full diff...")
+    elif last['merge_base'] != branch_diff.merge_base:
+        progress(f"{name} was rebased or merged {branch_diff.base_branch}, writing the full diff...")
+    elif last['tip'] != branch_diff.tip and not is_ancestor(repo_dir, last['tip'], branch_diff.tip, token):
+        progress(f"{name} was force-pushed, writing the full diff...")
+    else:
+        return last
+    return None
+
+
+def _write_delta_pointer(branch_diff, pointer_path, full_path):
+    """ Small JSON next to a delta naming the range it covers and the artifacts it continues. """
+    with open(pointer_path, 'w') as pointer_file:
+        json.dump({'branch': branch_diff.branch, 'base_branch': branch_diff.base_branch,
+                   'merge_base': branch_diff.merge_base, 'from': branch_diff.since, 'to': branch_diff.tip,
+                   'path': branch_diff.stats.path, 'previous': branch_diff.previous, 'full': full_path},
+                  pointer_file, indent=2)
+
+
+def diff_branch(repo_dir, branch_name, base_branch, output_dir, cache=None, compression=COMPRESSION_NONE,
+                max_bytes=None, fetch=True, pathspecs=(), chunk_bytes=None, incremental=False, index_dir=None,
+                diff_options=None, token=None, progress=_noop):
+    """
+    Diff a branch against the point where it diverged from base_branch. Returns a BranchDiff.
+    With index_dir every extraction is remembered there, and incremental only diffs the commits
+    pushed since the last one (see BranchDiff.mode); a rebase, force-push or changed path filter
+    or diff options fall back to the full diff. Of diff_options only the engine knobs apply.
+    """
+    # The history and delta pointers outlive this working directory, so every path in them is absolute
+    output_dir = os.path.abspath(output_dir)
+    branch_diff = branch_range(repo_dir, branch_name, base_branch, fetch, token, progress)
+    file_name = f'all_commits_on_{branch_diff.branch.replace("/", "_")}'
+    history = BranchHistory(repo_dir, index_dir) if index_dir is not None else None
+    last = None
+    if incremental and history is not None:
+        last = _incremental_start(repo_dir, history.last(branch_diff.branch, branch_diff.base_branch), branch_diff,
+                                  pathspecs, diff_options, token, progress)
+
+    if last is not None and last['tip'] == branch_diff.tip:
+        progress(f"{branch_diff.branch} did not change since the last extraction.")
+        return branch_diff._replace(stats=OutputStats(**last['stats']), mode=DIFF_UNCHANGED, since=last['since'],
+                                    previous=last['previous'])
+    if last is not None:
+        # Only the commits pushed since the last extraction
+        base = last['tip']
+        file_name += f'.{base[:10]}..{branch_diff.tip[:10]}'
+        branch_diff = branch_diff._replace(mode=DIFF_INCREMENTAL, since=base, previous=last['stats']['path'])
+        full_path = last['full']
+    else:
+        # Generate diff from the point where the branch diverged from the base
+        base = branch_diff.merge_base
+        branch_diff = branch_diff._replace(mode=DIFF_FULL)
+        full_path = None
+    diff_file_path = output_path(os.path.join(output_dir, f'{file_name}.diff'), compression)
+
+    progress(f"Writing diff for {branch_diff.branch}...")
+    try:
+        stats = write_cached_diff(repo_dir, base, branch_diff.tip, diff_file_path, cache, token,
+                                  compression, max_bytes, pathspecs, chunk_bytes, diff_options)
+    finally:
+        if cache is not None:
+            cache.save_index()
+    branch_diff = branch_diff._replace(stats=stats)
+    if branch_diff.mode == DIFF_INCREMENTAL:
+        _write_delta_pointer(branch_diff, os.path.join(output_dir, f'{file_name}.delta.json'), full_path)
+    if history is not None:
+        # A truncated diff misses changes, so the next extraction must not continue from it
+        if stats.truncated:
+            history.forget(branch_diff.branch, branch_diff.base_branch)
+        else:
+            history.record(branch_diff, pathspecs, full_path or stats.path, diff_engine_args(diff_options))
+    return branch_diff
+
+
+def changed_files(repo_dir, base, target, pathspecs=(), token=None, diff_options=None):
+    """ FileStats of base..target: the cheap overview that patches can then be loaded from file by file. """
+    return diff_stat(repo_dir, base, target, pathspecs, token, diff_options)
+
+
+def list_remote_branches(repo_dir, fetch=True, token=None, progress=_noop):
+    """ Return the names of all remote branches. """
+    return [branch.name for branch in list_branches(repo_dir, fetch=fetch, token=token, progress=progress)]
+
+
+def list_branches(repo_dir, base_branch=None, index_dir=None, fetch=True, token=None, progress=_noop):
+    """
+    BranchInfos (name, tip, committer date, subject) of all remote branches, from one for-each-ref
+    pass. With base_branch their ahead/behind counts are filled in, reusing the counts cached in
+    index_dir for branches that did not move.
+    """
+    if fetch:
+        # Ensure the local repo is up to date with the remote
+        fetch_origin(repo_dir, token, progress)
+    branches = list_branch_refs(repo_dir, token)
+    if base_branch is None:
+        return branches
+    counts = {}
+    for batch in BranchIndex(repo_dir, index_dir).iter_counts(branches, remote_branch_name(base_branch), token,
+                                                             progress):
+        counts.update(batch)
+    return [branch._replace(ahead=counts[branch.name][0], behind=counts[branch.name][1]) for branch in branches]
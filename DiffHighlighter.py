@@ -0,0 +1,197 @@
+import gzip
+import hashlib
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+from pygments.lexers import get_lexer_for_filename
+from pygments.styles import get_style_by_name
+from pygments.util import ClassNotFound
+
+from DiffChunker import FILE_MARKERS, diff_file_name
+from DiffOutputPipeline import COMPRESSION_EXTENSIONS, COMPRESSION_GZIP, COMPRESSION_ZSTD, zstandard
+
+STYLE_NAME = 'default'
+# Cached token arrays are bounded by their total number of entries (3 per token)
+MAX_CACHED_TOKEN_ENTRIES = 20 * 1000 * 1000
+FILE_MARKER_TEXT = tuple(marker.decode() for marker in FILE_MARKERS)
+
+
+def read_diff_text(path):
+    """ Read a (possibly gzip/zstd compressed) diff file as text. """
+    if path.endswith(COMPRESSION_EXTENSIONS[COMPRESSION_GZIP]):
+        with gzip.open(path, 'rb') as diff_file:
+            data = diff_file.read()
+    elif path.endswith(COMPRESSION_EXTENSIONS[COMPRESSION_ZSTD]):
+        if zstandard is None:
+            raise RuntimeError("Reading zstd files requires the 'zstandard' package (pip install zstandard).")
+        with open(path, 'rb') as diff_file:
+            data = zstandard.ZstdDecompressor().stream_reader(diff_file).read()
+    else:
+        with open(path, 'rb') as diff_file:
+            data = diff_file.read()
+    return data.decode('utf-8', errors='replace')
+
+
+class StyleTable:
+    """ Interns the Pygments styles of token types as small ids the viewer turns into text formats. """
+
+    def __init__(self, style_name=STYLE_NAME):
+        self.style = get_style_by_name(style_name)
+        self._lock = threading.Lock()
+        self._ids = {}  # token type -> style id, None for unstyled tokens
+        self.styles = []  # style id -> (hex color or None, bold, italic)
+
+    def styleId(self, token_type):
+        with self._lock:
+            if token_type in self._ids:
+                return self._ids[token_type]
+            style = self.style.style_for_token(token_type)
+            key = (style['color'], style['bold'], style['italic'])
+            if key == (None, False, False):
+                style_id = None
+            elif key in self.styles:
+                style_id = self.styles.index(key)
+            else:
+                self.styles.append(key)
+                style_id = len(self.styles) - 1
+            self._ids[token_type] = style_id
+            return style_id
+
+
+class TokenCache:
+    """ LRU of highlighted file sections keyed by (section text, lexer), shared by every open diff. """
+
+    def __init__(self, max_entries=MAX_CACHED_TOKEN_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, line_tokens):
+        size = sum(len(tokens) for tokens in line_tokens)
+        with self._lock:
+            if key in self.entries:
+                return
+            self.entries[key] = line_tokens
+            self.size += size
+            while self.size > self.max_entries and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= sum(len(tokens) for tokens in evicted)
+
+
+STYLES = StyleTable()
+TOKEN_CACHE = TokenCache()
+_lexers = {}
+_lexers_lock = threading.Lock()
+
+
+def lexer_for_path(path):
+    """ Pygments lexer for a file name (cached per extension), or None if there is none. """
+    extension = path.rsplit('.', 1)[-1] if '.' in path.rsplit('/', 1)[-1] else path.rsplit('/', 1)[-1]
+    with _lexers_lock:
+        if extension not in _lexers:
+            try:
+                _lexers[extension] = get_lexer_for_filename(path, stripnl=False, ensurenl=False)
+            except ClassNotFound:
+                _lexers[extension] = None
+        return _lexers[extension]
+
+
+def split_sections(lines):
+    """ Yield (first line number, path, section lines) for every file of a diff. """
+    start = None
+    for number, line in enumerate(lines):
+        if line.startswith(FILE_MARKER_TEXT):
+            if start is not None:
+                yield start, path, lines[start:number]
+            start = number
+            path = diff_file_name(line.encode('utf-8', errors='replace'))
+    if start is not None:
+        yield start, path, lines[start:]
+
+
+def section_key(section, lexer):
+    """
+    Cache key of a file section: its content. The same blob pair diffs to different lines with other
+    context, whitespace or merge options, so the blob ids of the `index` line are not enough.
+    """
+    return f"{hashlib.sha1(''.join(section).encode('utf-8', errors='replace')).hexdigest()}:{lexer.name}"
+
+
+def hunk_prefix_width(header):
+    """ Prefix columns of the lines of a hunk: 1 for `@@` headers, one per parent for combined `@@@` ones. """
+    return max(len(header) - len(header.lstrip('@')) - 1, 1)
+
+
+def highlight_section(section, lexer):
+    """
+    Tokenize the code lines of one file section (hunk lines without their +/-/space prefix columns) and
+    return, per section line, an array of (column, length, style id) triples. Headers get no tokens.
+    """
+    code_lines = []  # (section line number, prefix width) of the lines holding code
+    prefix_width = None  # None until the first hunk header; the file headers before it are no code
+    for number, line in enumerate(section):
+        if line.startswith('@@'):
+            prefix_width = hunk_prefix_width(line)
+        elif prefix_width is not None and len(line) >= prefix_width and \
+                all(character in '+- ' for character in line[:prefix_width]):
+            code_lines.append((number, prefix_width))
+    line_tokens = [array('I') for _ in section]
+    if not code_lines:
+        return line_tokens
+
+    code = '\n'.join(section[number][width:].rstrip('\n') for number, width in code_lines)
+    starts = [0]
+    for number, width in code_lines[:-1]:
+        starts.append(starts[-1] + len(section[number][width:].rstrip('\n')) + 1)
+
+    for index, token_type, value in lexer.get_tokens_unprocessed(code):
+        style_id = STYLES.styleId(token_type)
+        if style_id is None or not value:
+            continue
+        code_line = bisect_right(starts, index) - 1
+        column = index - starts[code_line]
+        for part in value.split('\n'):
+            if part and code_line < len(code_lines):
+                number, width = code_lines[code_line]
+                # Columns count from the start of the line, past the diff prefix
+                line_tokens[number].extend((column + width, len(part), style_id))
+            code_line += 1
+            column = 0
+    return line_tokens
+
+
+def highlight_diff(lines, token=None, publish=None, batch_lines=2000):
+    """
+    Highlight every file section of a diff, serving sections from TOKEN_CACHE when possible.
+    publish({line number: array}) receives the tokens of about batch_lines lines at a time.
+    """
+    batch = {}
+    for start, path, section in split_sections(lines):
+        if token is not None:
+            token.raise_if_cancelled()
+        lexer = lexer_for_path(path)
+        if lexer is None:
+            continue
+        key = section_key(section, lexer)
+        line_tokens = TOKEN_CACHE.get(key)
+        if line_tokens is None:
+            line_tokens = highlight_section(section, lexer)
+            TOKEN_CACHE.put(key, line_tokens)
+        for offset, tokens in enumerate(line_tokens):
+            if tokens:
+                batch[start + offset] = tokens
+        if publish is not None and len(batch) >= batch_lines:
+            publish(batch)
+            batch = {}
+    if publish is not None and batch:
+        publish(batch)
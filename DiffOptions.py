@@ -0,0 +1,109 @@
+from collections import namedtuple
+
+# How a merge commit is diffed. first-parent: what the merge brought into the branch it was merged
+# into; cc: git's combined diff, only the hunks that differ from every parent (conflict resolutions);
+# remerge: the merge as committed against git's own re-merge of the parents (git 2.36+); parents:
+# parent 1 against parent 2, two whole trees that have usually diverged far apart.
+MERGE_FIRST_PARENT = 'first-parent'
+MERGE_COMBINED = 'cc'
+MERGE_REMERGE = 'remerge'
+MERGE_PARENTS = 'parents'
+MERGE_MODES = {
+    MERGE_FIRST_PARENT: 'First parent',
+    MERGE_COMBINED: 'Combined (--cc)',
+    MERGE_REMERGE: 'Remerge (--remerge-diff)',
+    MERGE_PARENTS: 'Parent 1 vs parent 2',
+}
+# Merge modes git diffs from the merge commit alone rather than from two trees
+SINGLE_COMMIT_MERGE_MODES = {MERGE_COMBINED: '--cc', MERGE_REMERGE: '--remerge-diff'}
+# '' leaves the choice to git (and the repository's diff.algorithm)
+DIFF_ALGORITHMS = ['', 'myers', 'minimal', 'patience', 'histogram']
+WHITESPACE_MODES = {
+    '': 'Keep whitespace changes',
+    'ignore-space-at-eol': 'Ignore at line ends',
+    'ignore-space-change': 'Ignore amount',
+    'ignore-all-space': 'Ignore all',
+}
+
+# rename_limit 0 keeps git's default (diff.renameLimit); copies also detects files copied from modified
+# ones (-C). renames False skips rename and copy detection entirely, so rename_limit and copies then
+# do not apply.
+DiffOptions = namedtuple('DiffOptions', ['merge_mode', 'algorithm', 'renames', 'rename_limit', 'whitespace',
+                                         'copies'],
+                         defaults=[MERGE_FIRST_PARENT, '', True, 0, '', False])
+DEFAULT_DIFF_OPTIONS = DiffOptions()
+
+
+def diff_options_from_settings(settings):
+    """ DiffOptions from a stored dict (see DiffOptions._asdict); unknown or invalid values fall back to defaults. """
+    settings = settings or {}
+    options = DEFAULT_DIFF_OPTIONS._replace(**{field: settings[field] for field in DiffOptions._fields
+                                               if field in settings})
+    if options.merge_mode not in MERGE_MODES:
+        options = options._replace(merge_mode=DEFAULT_DIFF_OPTIONS.merge_mode)
+    if options.algorithm not in DIFF_ALGORITHMS:
+        options = options._replace(algorithm=DEFAULT_DIFF_OPTIONS.algorithm)
+    if options.whitespace not in WHITESPACE_MODES:
+        options = options._replace(whitespace=DEFAULT_DIFF_OPTIONS.whitespace)
+    return options._replace(renames=bool(options.renames), rename_limit=max(int(options.rename_limit or 0), 0),
+                            copies=bool(options.copies))
+
+
+def diff_engine_args(options):
+    """ git diff arguments for the engine knobs of options (none for the defaults). """
+    options = options or DEFAULT_DIFF_OPTIONS
+    args = []
+    if options.algorithm:
+        args.append(f'--diff-algorithm={options.algorithm}')
+    if not options.renames:
+        args.append('--no-renames')
+    else:
+        if options.copies:
+            args.append('-C')
+        if options.rename_limit:
+            args.append(f'-l{options.rename_limit}')
+    if options.whitespace:
+        args.append(f'--{options.whitespace}')
+    return args
+
+
+def diff_command(base, target, options=None):
+    """
+    git arguments (pathspecs go after them) diffing base..target. A base of None diffs the merge
+    commit target against its parents the way options.merge_mode says (see plan_diff).
+    """
+    options = options or DEFAULT_DIFF_OPTIONS
+    if base is None:
+        return ['show', '--format=', SINGLE_COMMIT_MERGE_MODES[options.merge_mode], *diff_engine_args(options), target]
+    return ['diff', *diff_engine_args(options), base, target]
+
+
+def describe_diff_options(options):
+    """ Short summary such as 'first-parent, histogram, no renames'. """
+    parts = [options.merge_mode, options.algorithm or 'default algorithm']
+    if not options.renames:
+        parts.append('no renames')
+    else:
+        if options.copies:
+            parts.append('copies')
+        if options.rename_limit:
+            parts.append(f'rename limit {options.rename_limit}')
+    if options.whitespace:
+        parts.append(options.whitespace)
+    return ', '.join(parts)
+
+
+def diff_options_variants(options=None):
+    """
+    options followed by every variation of one knob from it (each merge mode, algorithm and
+    whitespace mode, and rename and copy detection toggled), for timing the choices against each other.
+    """
+    options = options or DEFAULT_DIFF_OPTIONS
+    variants = [options]
+    variants.extend(options._replace(merge_mode=merge_mode) for merge_mode in MERGE_MODES)
+    variants.extend(options._replace(algorithm=algorithm) for algorithm in DIFF_ALGORITHMS)
+    variants.append(options._replace(renames=not options.renames))
+    if options.renames:
+        variants.append(options._replace(copies=not options.copies))
+    variants.extend(options._replace(whitespace=whitespace) for whitespace in WHITESPACE_MODES)
+    return list(dict.fromkeys(variants))
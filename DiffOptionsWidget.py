@@ -0,0 +1,109 @@
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QLabel, QComboBox, QCheckBox, QSpinBox
+
+from ConfigManager import REPO_SETTINGS_KEY
+from DiffOptions import DIFF_ALGORITHMS, MERGE_MODES, WHITESPACE_MODES, DiffOptions
+
+MAX_RENAME_LIMIT = 1000000
+
+
+class DiffOptionsWidget(QWidget):
+    """
+    Merge diff mode and diff engine knobs (algorithm, rename and copy detection, whitespace), persisted per
+    repository: setRepository() shows a repository's options, changes are saved to it.
+    """
+
+    def __init__(self, config_manager, parent=None, merge_mode=True):
+        super().__init__(parent)
+        self.config_manager = config_manager
+        self.repo_dir = None
+        self.loading = False
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        # Branch diffs are a single range, so only the commit diffs offer a merge mode
+        self.merge_mode_combo = QComboBox(self)
+        for mode, label in MERGE_MODES.items():
+            self.merge_mode_combo.addItem(label, mode)
+        self.merge_mode_combo.setToolTip("How merge commits are diffed: against their first parent (what the merge "
+                                         "brought in), only the conflict resolutions (--cc), against git's own "
+                                         "re-merge (--remerge-diff, git 2.36+), or parent 1 against parent 2")
+        if merge_mode:
+            layout.addWidget(QLabel('Merges:', self))
+            layout.addWidget(self.merge_mode_combo)
+        else:
+            self.merge_mode_combo.hide()
+
+        layout.addWidget(QLabel('Algorithm:', self))
+        self.algorithm_combo = QComboBox(self)
+        for algorithm in DIFF_ALGORITHMS:
+            self.algorithm_combo.addItem(algorithm or 'default', algorithm)
+        layout.addWidget(self.algorithm_combo)
+
+        self.renames_checkbox = QCheckBox('Detect renames', self)
+        layout.addWidget(self.renames_checkbox)
+        self.rename_limit_spin = QSpinBox(self)
+        self.rename_limit_spin.setRange(0, MAX_RENAME_LIMIT)
+        self.rename_limit_spin.setPrefix('limit ')
+        self.rename_limit_spin.setSpecialValueText('default limit')
+        self.rename_limit_spin.setToolTip("Files compared for rename and copy detection (-l); above it git skips "
+                                          "the detection")
+        layout.addWidget(self.rename_limit_spin)
+        self.copies_checkbox = QCheckBox('Copies', self)
+        self.copies_checkbox.setToolTip("Also detect files copied from modified files (-C)")
+        layout.addWidget(self.copies_checkbox)
+
+        layout.addWidget(QLabel('Whitespace:', self))
+        self.whitespace_combo = QComboBox(self)
+        for whitespace, label in WHITESPACE_MODES.items():
+            self.whitespace_combo.addItem(label, whitespace)
+        layout.addWidget(self.whitespace_combo)
+        layout.addStretch(1)
+
+        self.merge_mode_combo.currentIndexChanged.connect(self.saveOptions)
+        self.algorithm_combo.currentIndexChanged.connect(self.saveOptions)
+        self.renames_checkbox.toggled.connect(self.saveOptions)
+        self.rename_limit_spin.editingFinished.connect(self.saveOptions)
+        self.whitespace_combo.currentIndexChanged.connect(self.saveOptions)
+        self.copies_checkbox.toggled.connect(self.saveOptions)
+        self.config_manager.addListener(self.onConfigChanged)
+        self.setRepository(self.config_manager.get_repo_dir())
+
+    def setRepository(self, repo_dir):
+        """ Show (and from now on save to) the options of repo_dir. """
+        self.repo_dir = repo_dir or None
+        self.showOptions(self.config_manager.get_repo_diff_options(repo_dir or ''))
+
+    def showOptions(self, diff_options):
+        self.loading = True
+        try:
+            self.merge_mode_combo.setCurrentIndex(max(self.merge_mode_combo.findData(diff_options.merge_mode), 0))
+            self.algorithm_combo.setCurrentIndex(max(self.algorithm_combo.findData(diff_options.algorithm), 0))
+            self.renames_checkbox.setChecked(diff_options.renames)
+            self.rename_limit_spin.setValue(diff_options.rename_limit)
+            self.rename_limit_spin.setEnabled(diff_options.renames)
+            self.copies_checkbox.setChecked(diff_options.copies)
+            self.copies_checkbox.setEnabled(diff_options.renames)
+            self.whitespace_combo.setCurrentIndex(max(self.whitespace_combo.findData(diff_options.whitespace), 0))
+        finally:
+            self.loading = False
+
+    def diffOptions(self):
+        return DiffOptions(self.merge_mode_combo.currentData(), self.algorithm_combo.currentData(),
+                           self.renames_checkbox.isChecked(), self.rename_limit_spin.value(),
+                           self.whitespace_combo.currentData(), self.copies_checkbox.isChecked())
+
+    def saveOptions(self):
+        # Without rename detection there is no copy detection, and no limit for either
+        self.rename_limit_spin.setEnabled(self.renames_checkbox.isChecked())
+        self.copies_checkbox.setEnabled(self.renames_checkbox.isChecked())
+        if not self.loading and self.repo_dir:
+            self.config_manager.set_repo_diff_options(self.repo_dir, self.diffOptions())
+
+    def onConfigChanged(self, key, value):
+        """ Follow the repository chosen in any tab, and option changes made in other tabs. """
+        if key == 'last_repo_dir':
+            self.setRepository(value)
+        elif key == REPO_SETTINGS_KEY and self.repo_dir:
+            repo, setting, _ = value
+            if setting == 'diff_options' and repo == self.config_manager.repo_key(self.repo_dir):
+                self.showOptions(self.config_manager.get_repo_diff_options(self.repo_dir))
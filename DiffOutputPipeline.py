@@ -0,0 +1,203 @@
+import gzip
+import os
+import subprocess
+import time
+from collections import namedtuple
+
+from DiffChunker import DiffChunker
+from GitProcess import StderrDrain, finish_git, popen_git
+from Tracing import CATEGORY_IO, TRACER
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, only needed for zstd output
+    zstandard = None
+
+COMPRESSION_NONE = ''
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_ZSTD = 'zstd'
+COMPRESSION_EXTENSIONS = {COMPRESSION_NONE: '', COMPRESSION_GZIP: '.gz', COMPRESSION_ZSTD: '.zst'}
+
+# Large binary reads keep syscall and Python overhead negligible next to the I/O itself
+CHUNK_SIZE = 1024 * 1024
+TRUNCATION_MARKER = "\n\n... [diff truncated after {limit} bytes by the output size limit] ...\n"
+
+OutputStats = namedtuple('OutputStats', ['path', 'bytes_in', 'bytes_written', 'elapsed', 'truncated'])
+
+
+def available_compressions():
+    compressions = [COMPRESSION_NONE, COMPRESSION_GZIP]
+    if zstandard is not None:
+        compressions.append(COMPRESSION_ZSTD)
+    return compressions
+
+
+def output_path(path, compression):
+    """ Path with the extension of the chosen compression appended. """
+    return path + COMPRESSION_EXTENSIONS.get(compression or COMPRESSION_NONE, '')
+
+
+def open_sink(path, compression=COMPRESSION_NONE):
+    """ Open path for binary writing, compressing on the fly if requested. """
+    if compression == COMPRESSION_GZIP:
+        return gzip.open(path, 'wb', compresslevel=6)
+    if compression == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstd output requires the 'zstandard' package (pip install zstandard).")
+        return zstandard.ZstdCompressor().stream_writer(open(path, 'wb'), closefd=True)
+    return open(path, 'wb')
+
+
+class DiffOutput:
+    """
+    Destination of a diff: writes raw chunks through optional compression, stops at max_bytes
+    with a truncation marker, and can tee the raw bytes into a second file (e.g. for the cache).
+    """
+
+    def __init__(self, path, compression=COMPRESSION_NONE, max_bytes=None, tee_path=None):
+        self.path = path
+        self.max_bytes = max_bytes or None
+        self.sink = self.openSink(path, compression)
+        self.tee = open(tee_path, 'wb') if tee_path else None
+        self.bytes_in = 0
+        self.truncated = False
+        self.started = time.perf_counter()
+
+    def openSink(self, path, compression):
+        return open_sink(path, compression)
+
+    def write(self, chunk):
+        """ Write a chunk; returns False once the size limit is reached and input should stop. """
+        if self.truncated:
+            return False
+        if self.max_bytes is not None and self.bytes_in + len(chunk) > self.max_bytes:
+            chunk = chunk[:self.max_bytes - self.bytes_in]
+            self.truncated = True
+        self.sink.write(chunk)
+        if self.tee is not None:
+            self.tee.write(chunk)
+        self.bytes_in += len(chunk)
+        if self.truncated:
+            self.sink.write(TRUNCATION_MARKER.format(limit=self.max_bytes).encode('utf-8'))
+        return not self.truncated
+
+    def copyFrom(self, source):
+        """ Stream a binary file object into the output until EOF or the size limit. """
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk or not self.write(chunk):
+                break
+
+    def close(self):
+        self.sink.close()
+        if self.tee is not None:
+            self.tee.close()
+        return OutputStats(self.path, self.bytes_in, os.path.getsize(self.path),
+                           time.perf_counter() - self.started, self.truncated)
+
+    def abort(self):
+        self.sink.close()
+        if self.tee is not None:
+            self.tee.close()
+
+
+class ChunkedDiffOutput(DiffOutput):
+    """
+    DiffOutput that splits the diff into chunk files of at most chunk_bytes at file and hunk
+    boundaries (see DiffChunker). The chunks are named after path with a part number, and
+    OutputStats.path is the JSON manifest listing them.
+    """
+
+    def __init__(self, path, compression=COMPRESSION_NONE, max_bytes=None, tee_path=None, chunk_bytes=None):
+        self.chunk_bytes = chunk_bytes
+        super().__init__(path, compression, max_bytes, tee_path)
+        self.path = self.sink.manifest_path
+
+    def openSink(self, path, compression):
+        stem = path[:len(path) - len(COMPRESSION_EXTENSIONS.get(compression or COMPRESSION_NONE, ''))]
+        stem, extension = os.path.splitext(stem)
+        return DiffChunker(lambda number: output_path(f'{stem}.part{number:03d}{extension}', compression),
+                           f'{stem}.manifest.json', self.chunk_bytes,
+                           open_file=lambda chunk_path: open_sink(chunk_path, compression),
+                           source=os.path.basename(stem + extension))
+
+    def close(self):
+        self.sink.close()
+        if self.tee is not None:
+            self.tee.close()
+        return OutputStats(self.path, self.bytes_in, sum(os.path.getsize(path) for path in self.sink.chunkPaths()),
+                           time.perf_counter() - self.started, self.truncated)
+
+    def abort(self):
+        self.sink.abort()
+        if self.tee is not None:
+            self.tee.close()
+
+
+def open_output(path, compression=COMPRESSION_NONE, max_bytes=None, tee_path=None, chunk_bytes=None):
+    """ A DiffOutput for path, split into chunks when chunk_bytes is set. """
+    if chunk_bytes:
+        return ChunkedDiffOutput(path, compression, max_bytes, tee_path, chunk_bytes)
+    return DiffOutput(path, compression, max_bytes, tee_path)
+
+
+def copy_to_output(source_path, path, compression=COMPRESSION_NONE, max_bytes=None, chunk_bytes=None):
+    """ Stream an existing file into an output, returns OutputStats. """
+    with TRACER.span('copy to output', CATEGORY_IO, path=os.path.basename(path)) as trace:
+        output = open_output(path, compression, max_bytes, chunk_bytes=chunk_bytes)
+        try:
+            with open(source_path, 'rb') as source:
+                output.copyFrom(source)
+        except BaseException:
+            output.abort()
+            raise
+        stats = output.close()
+        trace['bytes'] = stats.bytes_written
+        return stats
+
+
+def write_git_output(repo_dir, args, path, compression=COMPRESSION_NONE, max_bytes=None, token=None,
+                     tee_path=None, chunk_bytes=None):
+    """
+    Stream the stdout of `git <args>` straight into an output without intermediate buffering.
+    When the size limit is hit git is stopped early. Returns OutputStats.
+    """
+    output = open_output(path, compression, max_bytes, tee_path, chunk_bytes)
+    process = popen_git(repo_dir, args, token, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr_drain = StderrDrain(process)
+    try:
+        output.copyFrom(process.stdout)
+        if output.truncated and process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+    except BaseException:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        output.abort()
+        raise
+    finally:
+        stderr = stderr_drain.finish()
+        if token is not None:
+            token.unregister(process)
+        finish_git(process, output.bytes_in)
+
+    stats = output.close()
+    if token is not None:
+        token.raise_if_cancelled()
+    if process.returncode != 0 and not output.truncated:
+        raise subprocess.CalledProcessError(process.returncode, ['git', *args],
+                                            stderr=stderr.decode('utf-8', errors='replace'))
+    return stats
+
+
+def describe_stats(stats):
+    """ One-line summary of an OutputStats for dialogs and index files. """
+    summary = f"{stats.bytes_written / (1024 * 1024):.1f} MB written"
+    if stats.bytes_written != stats.bytes_in:
+        summary += f" ({stats.bytes_in / (1024 * 1024):.1f} MB of diff)"
+    summary += f" in {stats.elapsed:.2f}s"
+    if stats.truncated:
+        summary += ", truncated"
+    return summary
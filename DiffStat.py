@@ -0,0 +1,98 @@
+import os
+import shlex
+from collections import namedtuple
+
+from DiffCache import DiffCache
+from DiffOptions import diff_engine_args
+from GitProcess import run_git
+
+# One changed file of a diff; added/deleted are None for binary files, old_path is set for renames and copies
+FileStat = namedtuple('FileStat', ['path', 'old_path', 'status', 'added', 'deleted'])
+
+
+def split_pathspecs(text):
+    """ Split a user-entered, space-separated pathspec list (quotes allowed for paths with spaces). """
+    return shlex.split(text) if text.strip() else []
+
+
+def pathspec_args(include=(), exclude=()):
+    """
+    Pathspec arguments (including the leading `--`) limiting a diff to include and skipping exclude.
+    Only exclusions means everything else; nothing at all means no limit.
+    """
+    include = list(include)
+    exclude = [f':(exclude){pattern}' for pattern in exclude]
+    if not include and not exclude:
+        return []
+    return ['--', *include, *exclude]
+
+
+def parse_diff_stat(output):
+    """ Parse `git diff -z --raw --numstat` output into FileStats. """
+    tokens = output.split('\0')
+    raw_entries = []
+    counts = []
+    position = 0
+    while position < len(tokens):
+        token = tokens[position]
+        position += 1
+        if not token:
+            continue
+        if token.startswith(':'):
+            status = token.split()[-1]
+            if status[0] in 'RC':
+                raw_entries.append((status, tokens[position], tokens[position + 1]))
+                position += 2
+            else:
+                raw_entries.append((status, None, tokens[position]))
+                position += 1
+        else:
+            added, deleted, path = token.split('\t', 2)
+            if not path:
+                # Renames list the source and destination as separate fields
+                position += 2
+            counts.append((None if added == '-' else int(added), None if deleted == '-' else int(deleted)))
+
+    # Both sections list the files in the same order
+    return [FileStat(path, old_path, status[0], added, deleted)
+            for (status, old_path, path), (added, deleted) in zip(raw_entries, counts)]
+
+
+def diff_stat(repo_dir, base, target, pathspecs=(), token=None, diff_options=None):
+    """
+    List the files changed between base and target with their added/deleted line counts, detecting
+    renames and copies and counting whitespace the way diff_options (DiffOptions) say.
+    """
+    result = run_git(repo_dir, ['diff', '-z', '--raw', '--numstat', *diff_engine_args(diff_options), base, target,
+                                *pathspecs], token)
+    return parse_diff_stat(result.stdout)
+
+
+def file_patch(repo_dir, base, target, file_stat, cache=None, token=None, diff_options=None):
+    """ Patch of one changed file (served from the diff cache when possible), as text. """
+    paths = [file_stat.old_path, file_stat.path] if file_stat.old_path else [file_stat.path]
+    engine_args = diff_engine_args(diff_options)
+    key = DiffCache.make_key(base, target, (*engine_args, 'file', *paths))
+    cached_path = cache.lookup(key) if cache is not None else None
+    if cached_path is not None:
+        with open(cached_path, 'rb') as cached_file:
+            return cached_file.read().decode('utf-8', errors='replace')
+
+    patch = run_git(repo_dir, ['diff', *engine_args, base, target, '--', *paths], token, text=False).stdout
+    if cache is not None:
+        temp_path = cache.temp_path(key)
+        try:
+            with open(temp_path, 'wb') as temp_file:
+                temp_file.write(patch)
+            cache.store(key, temp_path, move=True)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return patch.decode('utf-8', errors='replace')
+
+
+def describe_file_stats(file_stats):
+    """ Totals line for a list of FileStats, e.g. '12 files, +340 -25'. """
+    added = sum(file_stat.added or 0 for file_stat in file_stats)
+    deleted = sum(file_stat.deleted or 0 for file_stat in file_stats)
+    return f"{len(file_stats)} files, +{added} -{deleted}"
@@ -0,0 +1,217 @@
+import os
+import time
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QColor, QFont, QFontDatabase, QTextCharFormat, QTextLayout
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QPlainTextEdit, QFileDialog,
+                             QMessageBox)
+
+from DiffHighlighter import STYLES, highlight_diff, read_diff_text
+from TaskRunner import TaskRunner
+from Tracing import CATEGORY_IO, CATEGORY_UI, TRACER
+
+# Blocks formatted beyond the bottom of the viewport, so short scrolls find them ready
+LOOKAHEAD_BLOCKS = 50
+ADDED_BACKGROUND = QColor('#e6ffec')
+REMOVED_BACKGROUND = QColor('#ffebe9')
+HUNK_COLOR = QColor('#0550ae')
+
+# Per-block formatting state
+UNFORMATTED = 0
+DIFF_FORMATTED = 1  # line colors applied, syntax tokens not yet available
+FULLY_FORMATTED = 2
+
+
+class DiffViewerWidget(QWidget):
+    """
+    In-app diff viewer. The text is shown as soon as it is read; Pygments tokenizes it on a worker
+    thread, and formats are only applied to the blocks in (or just below) the viewport, when they
+    are scrolled to, so multi-MB diffs never wait for a full highlighting pass.
+    """
+
+    def __init__(self, task_runner=None, parent=None):
+        super().__init__(parent)
+        self.task_runner = task_runner or TaskRunner(parent=self)
+        self.path = None
+        self.load_task = None
+        self.load_generation = 0  # identifies the file current partial results belong to
+        self.highlighting = False
+        self.tokens = {}  # block number -> array of (column, length, style id) triples
+        self.block_state = bytearray()
+        self.formats = {}  # (line kind, style id) -> QTextCharFormat
+
+        layout = QVBoxLayout(self)
+        top_layout = QHBoxLayout()
+        self.path_label = QLabel('No diff opened.', self)
+        self.path_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        top_layout.addWidget(self.path_label, 1)
+        self.open_button = QPushButton('Open File...', self)
+        self.open_button.clicked.connect(self.browseFile)
+        top_layout.addWidget(self.open_button)
+        self.external_button = QPushButton('Open Externally', self)
+        self.external_button.setEnabled(False)
+        self.external_button.clicked.connect(lambda: self.open_externally(self.path))
+        top_layout.addWidget(self.external_button)
+        layout.addLayout(top_layout)
+
+        self.text_view = QPlainTextEdit(self)
+        self.text_view.setReadOnly(True)
+        self.text_view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.text_view.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.text_view.setUndoRedoEnabled(False)
+        self.text_view.updateRequest.connect(lambda rect, dy: self.format_timer.start())
+        layout.addWidget(self.text_view)
+
+        self.status_label = QLabel('', self)
+        layout.addWidget(self.status_label)
+
+        # Coalesce the many update requests of a scroll into one formatting pass
+        self.format_timer = QTimer(self)
+        self.format_timer.setSingleShot(True)
+        self.format_timer.setInterval(0)
+        self.format_timer.timeout.connect(self.formatVisibleBlocks)
+
+        # Set by the owner to open files outside the app
+        self.open_externally = lambda path: None
+
+    def browseFile(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Diff", os.path.dirname(self.path or ''),
+                                              "Diffs (*.diff *.txt *.patch *.gz *.zst *.json);;All files (*)")
+        if path:
+            self.openDiff(path)
+
+    def openDiff(self, path):
+        """ Show a diff file, reading and highlighting it in the background. """
+        if self.load_task is not None:
+            self.load_task.cancel()
+        self.load_generation += 1
+        self.highlighting = True
+        self.path = path
+        self.path_label.setText(path)
+        self.external_button.setEnabled(True)
+        self.text_view.clear()
+        self.tokens = {}
+        self.block_state = bytearray()
+        self.status_label.setText(f"Loading {os.path.basename(path)}...")
+        self.load_task = self.task_runner.submit(
+            self.loadTask, path, self.load_generation, owner=self, on_partial=self.onPartial,
+            on_result=self.onHighlighted,
+            on_error=lambda message: QMessageBox.critical(self, "Error", f"Unable to open {path}: {message}"))
+
+    @staticmethod
+    def loadTask(task, path, generation):
+        """ Worker: publish the text, then its syntax tokens batch by batch. """
+        with TRACER.span('read diff', CATEGORY_IO, path=os.path.basename(path)) as trace:
+            text = read_diff_text(path)
+            trace['bytes'] = len(text)
+        lines = text.split('\n')
+        task.publish((generation, 'text', text))
+        with TRACER.span('highlight diff', lines=len(lines)):
+            highlight_diff(lines, task.token, lambda batch: task.publish((generation, 'tokens', batch)))
+        return generation, len(lines)
+
+    def onPartial(self, value):
+        generation, kind, data = value
+        if generation != self.load_generation:
+            return  # a previous file's task
+        if kind == 'text':
+            with TRACER.span('show diff text', bytes=len(data)):
+                self.text_view.setPlainText(data)
+            self.block_state = bytearray(self.text_view.blockCount())
+            self.status_label.setText(f"{self.text_view.blockCount()} lines, highlighting...")
+        else:
+            self.tokens.update(data)
+            # Blocks shown with line colors only can now get their syntax tokens
+            for number in data:
+                if number < len(self.block_state) and self.block_state[number] == DIFF_FORMATTED:
+                    self.block_state[number] = UNFORMATTED
+            self.format_timer.start()
+
+    def onHighlighted(self, result):
+        generation, line_count = result
+        if generation != self.load_generation:
+            return
+        self.highlighting = False
+        # No more tokens will come; blocks shown with line colors only are final
+        self.block_state = self.block_state.replace(bytes([DIFF_FORMATTED]), bytes([FULLY_FORMATTED]))
+        self.status_label.setText(f"{line_count} lines.")
+
+    @staticmethod
+    def lineKind(text):
+        if text.startswith(('+++ ', '--- ', 'diff ', 'index ')):
+            return 'header'
+        if text.startswith('@@'):
+            return 'hunk'
+        if text.startswith('+'):
+            return 'added'
+        if text.startswith('-'):
+            return 'removed'
+        return 'context'
+
+    def textFormat(self, kind, style_id=None):
+        key = (kind, style_id)
+        if key not in self.formats:
+            text_format = QTextCharFormat()
+            if kind == 'added':
+                text_format.setBackground(ADDED_BACKGROUND)
+            elif kind == 'removed':
+                text_format.setBackground(REMOVED_BACKGROUND)
+            elif kind == 'hunk':
+                text_format.setForeground(HUNK_COLOR)
+            elif kind == 'header':
+                text_format.setFontWeight(QFont.Bold)
+            if style_id is not None:
+                color, bold, italic = STYLES.styles[style_id]
+                if color:
+                    text_format.setForeground(QColor(f'#{color}'))
+                if bold:
+                    text_format.setFontWeight(QFont.Bold)
+                if italic:
+                    text_format.setFontItalic(True)
+            self.formats[key] = text_format
+        return self.formats[key]
+
+    def formatVisibleBlocks(self):
+        """ Apply line colors and syntax tokens to the blocks on screen that do not have them yet. """
+        started = time.perf_counter()
+        formatted = 0
+        document = self.text_view.document()
+        block = self.text_view.firstVisibleBlock()
+        offset = self.text_view.contentOffset()
+        bottom = self.text_view.viewport().height()
+        extra = LOOKAHEAD_BLOCKS
+        while block.isValid() and extra > 0:
+            if self.text_view.blockBoundingGeometry(block).translated(offset).top() > bottom:
+                extra -= 1
+            number = block.blockNumber()
+            if number < len(self.block_state) and self.block_state[number] == UNFORMATTED:
+                self.formatBlock(block, number)
+                document.markContentsDirty(block.position(), block.length())
+                formatted += 1
+            block = block.next()
+        if formatted:
+            TRACER.record('format visible blocks', CATEGORY_UI, started, blocks=formatted)
+
+    def formatBlock(self, block, number):
+        text = block.text()
+        kind = self.lineKind(text)
+        ranges = []
+        if kind != 'context' and text:
+            ranges.append(self.formatRange(0, len(text), self.textFormat(kind)))
+        tokens = self.tokens.get(number)
+        if tokens is not None:
+            for index in range(0, len(tokens), 3):
+                column, length, style_id = tokens[index:index + 3]
+                ranges.append(self.formatRange(column, length, self.textFormat(kind, style_id)))
+        block.layout().setFormats(ranges)
+        # Lines that can still receive tokens are formatted again once they arrive
+        done = tokens is not None or kind in ('header', 'hunk') or not self.highlighting
+        self.block_state[number] = FULLY_FORMATTED if done else DIFF_FORMATTED
+
+    @staticmethod
+    def formatRange(start, length, text_format):
+        format_range = QTextLayout.FormatRange()
+        format_range.start = start
+        format_range.length = length
+        format_range.format = text_format
+        return format_range
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+
+from GitProcess import GitCancelled, run_git
+
+DEFAULT_FRESHNESS_SECONDS = 300
+REMOTE = 'origin'
+
+
+def branch_refspec(branch_name):
+    """ Refspec updating just one remote-tracking branch, e.g. origin/feature -> its refs/remotes ref. """
+    prefix = f'{REMOTE}/'
+    name = branch_name[len(prefix):] if branch_name.startswith(prefix) else branch_name
+    return f'+refs/heads/{name}:refs/remotes/{REMOTE}/{name}'
+
+
+class _Fetch:
+    """ A fetch in flight; other callers wanting the same refs wait for it instead of starting their own. """
+
+    def __init__(self, refspecs):
+        self.refspecs = refspecs  # empty: full fetch
+        self.done = threading.Event()
+        self.error = None
+
+    def covers(self, refspecs):
+        return not self.refspecs or (refspecs and set(refspecs) <= set(self.refspecs))
+
+
+class FetchCoordinator:
+    """
+    Decides when `git fetch origin` actually has to run for a repository. Fetches younger than the
+    freshness window are reused, concurrent requests join the fetch already in flight, and callers can
+    limit a fetch to the refspecs they need. A full fetch counts as fresh for every refspec.
+    Only one fetch runs per repository at a time: two would race for the same remote-tracking ref
+    locks, so a request the running fetch does not cover waits for it to end before fetching.
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+    default_freshness = DEFAULT_FRESHNESS_SECONDS
+
+    def __init__(self, repo_dir):
+        self.repo_dir = repo_dir
+        self.freshness = None  # seconds; None follows default_freshness
+        self.last_error = None  # error of the last background fetch
+        self._lock = threading.Lock()
+        self._fetched = {}  # refspec ('' for a full fetch) -> monotonic time of the last successful fetch
+        self._running = None  # the _Fetch in flight
+
+    @classmethod
+    def shared(cls, repo_dir):
+        """ One coordinator per repository, shared by every tab and worker thread. """
+        repo_dir = os.path.abspath(repo_dir)
+        with cls._instances_lock:
+            if repo_dir not in cls._instances:
+                cls._instances[repo_dir] = cls(repo_dir)
+            return cls._instances[repo_dir]
+
+    @classmethod
+    def set_default_freshness(cls, seconds):
+        cls.default_freshness = max(0, seconds)
+
+    def freshnessWindow(self):
+        return self.default_freshness if self.freshness is None else self.freshness
+
+    def isFresh(self, refspecs=()):
+        """ True if the refs were fetched (fully or by refspec) within the freshness window. """
+        now = time.monotonic()
+        window = self.freshnessWindow()
+
+        def fresh(key):
+            fetched = self._fetched.get(key)
+            return fetched is not None and now - fetched < window
+
+        with self._lock:
+            return fresh('') or (bool(refspecs) and all(fresh(refspec) for refspec in refspecs))
+
+    def fetch(self, refspecs=(), token=None, progress=None, force=False):
+        """
+        Fetch origin (only refspecs if given) unless it is still fresh; joins a matching fetch in flight.
+        Returns True if a fetch ran or was joined, False if the refs were fresh already.
+        """
+        progress = progress or (lambda message: None)
+        refspecs = tuple(refspecs)
+        while True:
+            if not force and self.isFresh(refspecs):
+                return False
+            with self._lock:
+                running = self._running
+                owner = running is None
+                if owner:
+                    running = self._running = _Fetch(refspecs)
+
+            if owner:
+                self.runFetch(running, token, progress)
+                return True
+
+            joined = running.covers(refspecs)
+            progress("Waiting for the running fetch..." if joined else "Waiting for another fetch to finish...")
+            while not running.done.wait(0.1):
+                if token is not None:
+                    token.raise_if_cancelled()
+            if not joined:
+                # It fetched other refs; ours may be fresh now, else fetch them
+                continue
+            if running.error is None:
+                return True
+            if not isinstance(running.error, GitCancelled):
+                raise running.error
+            # Whoever started it cancelled; fetch on our own behalf
+
+    def runFetch(self, fetch, token, progress):
+        branches = [refspec.rsplit(':', 1)[-1].replace('refs/remotes/', '', 1) for refspec in fetch.refspecs]
+        progress(f"Fetching {', '.join(branches) or REMOTE}...")
+        try:
+            run_git(self.repo_dir, ['fetch', REMOTE, *fetch.refspecs], token)
+            with self._lock:
+                now = time.monotonic()
+                for key in fetch.refspecs or ('',):
+                    self._fetched[key] = now
+        except BaseException as e:
+            fetch.error = e
+            with self._lock:
+                # Whatever was fetched before, these refs are not known to be current now
+                for key in fetch.refspecs or ('',):
+                    self._fetched.pop(key, None)
+            raise
+        finally:
+            with self._lock:
+                self._running = None
+            fetch.done.set()
+
+    def fetchInBackground(self, refspecs=(), on_error=None):
+        """
+        Start a fetch on a daemon thread (if one is needed) so later actions find fresh refs.
+        on_error(exception) is called on that thread if the fetch fails (auth, network, refspec).
+        """
+        def run():
+            try:
+                self.fetch(refspecs)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+                if on_error is not None:
+                    on_error(e)
+
+        thread = threading.Thread(target=run, name=f'fetch {self.repo_dir}', daemon=True)
+        thread.start()
+        return thread
+
+    def invalidate(self):
+        """ Forget earlier fetches so the next request goes to the network. """
+        with self._lock:
+            self._fetched.clear()
@@ -0,0 +1,562 @@
+import os
+import platform
+import subprocess
+from functools import partial
+
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QLabel, QLineEdit,
+                             QPushButton, QFileDialog, QMessageBox, QHBoxLayout, QListView,
+                             QTabWidget, QCheckBox, QRadioButton, QButtonGroup, QCompleter)
+
+from BranchCommitViewer import BranchCommitViewer
+from ChangedFilesDialog import ChangedFilesDialog
+from CommitListModel import CommitListModel, CommitItemDelegate, HashRole
+from CommitIndex import FILTER_ALL, FILTER_MERGES, FILTER_PRS
+from ConfigManager import ConfigManager
+from DiffCache import DiffCache
+from DiffExtractorCore import (commit_range, diff_commit, diff_pr, iter_commit_pages, refresh_commits,
+                               time_diff_options)
+from DiffOptions import describe_diff_options, diff_options_variants
+from DiffOptionsWidget import DiffOptionsWidget
+from DiffViewerWidget import DiffViewerWidget
+from FetchCoordinator import FetchCoordinator
+from OutputOptionsWidget import OutputOptionsWidget
+from PathFilterWidget import PathFilterWidget
+from PerformancePanel import PerformancePanel
+from RefWatcher import REFRESH_RETRY_MS, RefWatcher
+from SearchIndex import CommitSearchIndex
+from TaskRunner import TaskRunner
+from Tracing import TRACER
+from WorkspaceWidget import WorkspaceWidget
+
+# CONSTS:
+INPUT_ERROR = "Input Error"
+PR_PAGE_SIZE = 500
+MAX_SUMMARY_WARNINGS = 10
+SEARCH_DEBOUNCE_MS = 150
+
+
+class GitDiffExtractor(QWidget):
+    # Emitted from the background fetch thread; queued to the GUI thread
+    fetchFailed = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        # Initialize the ConfigManager
+        self.run_button = None
+        self.search_input = None
+        self.all_diffs_radio = None
+        self.only_merges_radio = None
+        self.only_pr_radio = None
+        self.radio_group = None
+        self.only_merges_checkbox = None
+        self.pr_button = None
+        # Shared with the other tabs; they follow each other's repository and output directory
+        self.config_manager = ConfigManager.shared()
+        FetchCoordinator.set_default_freshness(self.config_manager.get_fetch_freshness_seconds())
+        self.default_output_dir = self.config_manager.get_output_dir()
+        self.diff_cache = DiffCache.shared(self.config_manager.get_config_dir(),
+                                           self.config_manager.get_diff_cache_max_bytes())
+        self.pr_model = CommitListModel(self)  # Columnar storage of the listed PRs
+        self.search_index = CommitSearchIndex()
+        # Debounce typing so the list is filtered once per pause, not per keystroke
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.searchPRs)
+        self.list_task = None  # Background task of the log currently being listed
+        self.list_generation = 0
+        self.listed = None  # (repository, filter) of the current list, kept current by the ref watcher
+        self.refresh_task = None
+        self.ref_watcher = RefWatcher(self)
+        self.ref_watcher.headChanged.connect(self.refreshPRs)
+        self.fetch_warning = None  # shown instead of "Ready." while the last background fetch failed
+        self.fetchFailed.connect(self.onBackgroundFetchFailed)
+        # Shared by both tabs so git work never runs on the GUI thread
+        self.task_runner = TaskRunner(parent=self)
+        # Initialize the QTabWidget
+        self.tabs = QTabWidget()
+
+        # Create the PR Diff Extractor UI and Branch Commit Viewer UI as separate widgets
+        self.initUI()
+
+        # Add both tabs to the QTabWidget
+        self.tabs.addTab(self.prExtractDiffWidget(), "PR Diff Extractor")  # Default tab
+        self.tabs.addTab(BranchCommitViewer(self.task_runner, open_file=self.openFile), "Branch Commit Viewer")
+        # Generated diffs open here instead of in an external program
+        self.diff_viewer = DiffViewerWidget(self.task_runner)
+        self.diff_viewer.open_externally = self.openExternally
+        self.tabs.addTab(self.diff_viewer, "Diff Viewer")
+        self.tabs.addTab(WorkspaceWidget(self.task_runner, self.config_manager, open_file=self.openFile), "Workspace")
+
+        # Set the layout for the main window
+        main_layout = QVBoxLayout()
+        main_layout.addWidget(self.tabs)
+        # Where the time of slow extractions went: git processes, UI population, file I/O
+        self.performance_panel = PerformancePanel(parent=self)
+        main_layout.addWidget(self.performance_panel)
+        self.setLayout(main_layout)
+
+    def initUI(self):
+        self.setWindowTitle('Git Diff Extractor')
+        self.setGeometry(500, 500, 800, 900)
+
+    def prExtractDiffWidget(self):
+        """Create the widget for PR Extract Diff functionality."""
+        pr_widget = QWidget()
+        layout = QVBoxLayout(pr_widget)
+
+        # Repository Directory
+        repo_layout = QHBoxLayout()
+        self.repo_label = QLabel('Repository Directory:')
+        repo_layout.addWidget(self.repo_label)
+        self.repo_input = QLineEdit(self)
+        self.repo_input.setText(self.config_manager.get_repo_dir())  # Load last used repo dir
+        self.repo_input.setCompleter(QCompleter(self.config_manager.get_recent_repos(), self))
+        self.repo_input.editingFinished.connect(self.onRepoDirEdited)
+        repo_layout.addWidget(self.repo_input)
+        self.repo_button = QPushButton('Browse', self)
+        self.repo_button.clicked.connect(self.browseRepo)
+        repo_layout.addWidget(self.repo_button)
+        layout.addLayout(repo_layout)
+
+        # Commit Hashes
+        commit_layout = QHBoxLayout()
+        self.commit_label = QLabel('Commit Hashes (comma or space-separated):')
+        commit_layout.addWidget(self.commit_label)
+        self.commit_input = QLineEdit(self)
+        commit_layout.addWidget(self.commit_input)
+        layout.addLayout(commit_layout)
+
+        # Output Directory
+        output_layout = QHBoxLayout()
+        self.output_label = QLabel('Output Directory:')
+        output_layout.addWidget(self.output_label)
+        self.output_input = QLineEdit(self)
+        self.output_input.setText(self.config_manager.get_output_dir())  # Load last used output dir
+        output_layout.addWidget(self.output_input)
+        self.output_button = QPushButton('Browse', self)
+        self.output_button.clicked.connect(self.browseOutput)
+        output_layout.addWidget(self.output_button)
+        layout.addLayout(output_layout)
+
+        # Search Bar for PRs
+        self.search_input = QLineEdit(self)
+        self.search_input.setPlaceholderText("Search PRs")
+        self.search_input.textChanged.connect(lambda: self.search_timer.start())
+        layout.addWidget(self.search_input)
+
+        # List of Pull Requests; rows are painted by the delegate, never materialized as widgets
+        self.pr_list = QListView(self)
+        self.pr_list.setModel(self.pr_model)
+        self.pr_list.setItemDelegate(CommitItemDelegate(self.pr_list))
+        self.pr_list.setUniformItemSizes(True)
+        self.pr_list.clicked.connect(self.onPRClick)
+        if (self.repo_input.text and self.output_input.text):
+            self.pr_list.doubleClicked.connect(self.generateDiff)
+        layout.addWidget(self.pr_list)
+
+        # Load PRs Button
+        self.pr_button = QPushButton('List Diffs', self)
+        self.pr_button.clicked.connect(self.listPRs)
+        layout.addWidget(self.pr_button)
+
+        # Add a radio for filtering merge commits
+        self.only_pr_radio = QRadioButton('Only Pull Requests')
+        self.only_merges_radio = QRadioButton('Only Merges')
+        self.all_diffs_radio = QRadioButton('All Diffs')
+
+        # The filter last used for this repository, all diffs by default
+        self.setListFilter(self.config_manager.get_repo_filter(self.repo_input.text(), FILTER_ALL))
+
+        # Group the radio buttons to ensure only one can be selected
+        self.radio_group = QButtonGroup()
+        self.radio_group.addButton(self.only_pr_radio)
+        self.radio_group.addButton(self.only_merges_radio)
+        self.radio_group.addButton(self.all_diffs_radio)
+
+        # Add the radio buttons to the layout
+        layout.addWidget(self.only_pr_radio)
+        layout.addWidget(self.only_merges_radio)
+        layout.addWidget(self.all_diffs_radio)
+
+        # Open the generated diff (or the index of a batch) when done
+        self.open_files_checkbox = QCheckBox('Open generated files', self)
+        self.open_files_checkbox.setChecked(True)
+        layout.addWidget(self.open_files_checkbox)
+
+        # Compression and size limit of written diffs
+        self.output_options = OutputOptionsWidget(self.config_manager, self)
+        layout.addWidget(self.output_options)
+        self.path_filter = PathFilterWidget(self.config_manager, self)
+        layout.addWidget(self.path_filter)
+        # How merges are diffed and the diff engine knobs, per repository
+        self.diff_options = DiffOptionsWidget(self.config_manager, self)
+        layout.addWidget(self.diff_options)
+
+        # Generate Diff Button, or just list the changed files and load patches on demand
+        run_layout = QHBoxLayout()
+        self.run_button = QPushButton('Generate Diff', self)
+        self.run_button.clicked.connect(self.generateDiff)
+        run_layout.addWidget(self.run_button, 1)
+        self.changed_files_button = QPushButton('Show Changed Files', self)
+        self.changed_files_button.clicked.connect(self.showChangedFiles)
+        run_layout.addWidget(self.changed_files_button)
+        self.time_options_button = QPushButton('Time Diff Options', self)
+        self.time_options_button.setToolTip("Diff the commits with each merge mode, algorithm, rename and whitespace "
+                                            "setting in turn, uncached, and compare the time and size")
+        self.time_options_button.clicked.connect(self.timeDiffOptions)
+        run_layout.addWidget(self.time_options_button)
+        layout.addLayout(run_layout)
+
+        # Per-commit patches of the PR merged by the given commit
+        pr_commits_layout = QHBoxLayout()
+        self.pr_commits_button = QPushButton('Generate PR Commit Diffs', self)
+        self.pr_commits_button.clicked.connect(self.getPRDiffs)
+        pr_commits_layout.addWidget(self.pr_commits_button, 1)
+        self.combine_pr_checkbox = QCheckBox('Combine into one file', self)
+        pr_commits_layout.addWidget(self.combine_pr_checkbox)
+        layout.addLayout(pr_commits_layout)
+
+        # Background task status and cancellation
+        status_layout = QHBoxLayout()
+        self.status_label = QLabel('Ready.', self)
+        status_layout.addWidget(self.status_label, 1)
+        self.cancel_button = QPushButton('Cancel', self)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancelTasks)
+        status_layout.addWidget(self.cancel_button)
+        layout.addLayout(status_layout)
+
+        pr_widget.setLayout(layout)  # Set the layout for the pr_widget
+        self.config_manager.addListener(self.onConfigChanged)
+        return pr_widget
+
+    def setListFilter(self, list_filter):
+        {FILTER_PRS: self.only_pr_radio, FILTER_MERGES: self.only_merges_radio}.get(
+            list_filter, self.all_diffs_radio).setChecked(True)
+
+    def onRepoDirEdited(self):
+        repo_dir = self.repo_input.text().strip()
+        if repo_dir:
+            self.config_manager.set_repo_dir(repo_dir)
+
+    def onConfigChanged(self, key, value):
+        """ Follow the repository and output directory chosen in other tabs. """
+        if key == 'last_repo_dir':
+            if value != self.repo_input.text():
+                self.repo_input.setText(value)
+            self.setListFilter(self.config_manager.get_repo_filter(value, FILTER_ALL))
+        elif key == 'last_output_dir' and value != self.output_input.text():
+            self.output_input.setText(value)
+        elif key == 'recent_repos':
+            self.repo_input.completer().model().setStringList(value)
+
+    def getPRDiffs(self):
+        repo_dir = self.repo_input.text()
+        pr_merge_commit = self.commit_input.text().strip()
+        output_dir = self.output_input.text()
+
+        if not repo_dir or not pr_merge_commit or not output_dir:
+            QMessageBox.warning(self, INPUT_ERROR, "All fields must be filled out.")
+            return
+
+        self.startTask(self.prDiffsTask, repo_dir, pr_merge_commit, output_dir, self.diff_cache,
+                       self.combine_pr_checkbox.isChecked(), self.output_options.compression(),
+                       self.diff_options.diffOptions(), on_result=self.onPRDiffsGenerated)
+
+    @staticmethod
+    def prDiffsTask(task, repo_dir, pr_merge_commit, output_dir, cache, combined, compression, diff_options):
+        """ Worker: write the patches of the commits the PR merge introduced. """
+        return diff_pr(repo_dir, pr_merge_commit, output_dir, combined=combined, cache=cache,
+                       compression=compression, diff_options=diff_options, token=task.token, progress=task.report)
+
+    def onPRDiffsGenerated(self, result):
+        self.onDiffsGenerated(result)
+
+    def browseRepo(self):
+        directory = self.selectDirectory("Select Repository Directory")
+        if directory:
+            self.repo_input.setText(directory)
+            self.config_manager.set_repo_dir(directory)  # Save to config
+
+    def browseOutput(self):
+        directory = self.selectDirectory("Select Output Directory")
+        if directory:
+            self.output_input.setText(directory)
+            self.config_manager.set_output_dir(directory)  # Save to config
+
+    def selectDirectory(self, title):
+        """ Open a standard directory selection dialog using QFileDialog. """
+        return QFileDialog.getExistingDirectory(self, title)
+
+    def generateDiff(self):
+        repo_dir = self.repo_input.text()
+        commit_hashes = self.commit_input.text().replace(',', ' ').split()
+        output_dir = self.output_input.text()
+
+        if not repo_dir or not commit_hashes or not output_dir:
+            QMessageBox.warning(self, INPUT_ERROR, "All fields must be filled out.")
+            return
+
+        self.startTask(self.generateDiffTask, repo_dir, commit_hashes, output_dir, self.diff_cache,
+                       self.output_options.compression(), self.output_options.maxBytes(), self.path_filter.pathspecs(),
+                       self.output_options.chunkBytes(), self.diff_options.diffOptions(),
+                       on_result=self.onDiffsGenerated)
+
+    @staticmethod
+    def generateDiffTask(task, repo_dir, commit_hashes, output_dir, cache, compression, max_bytes, pathspecs,
+                         chunk_bytes, diff_options):
+        """ Worker: generate all diffs as one batch, returns a DiffRun. """
+        return diff_commit(repo_dir, commit_hashes, output_dir, cache=cache, compression=compression,
+                           max_bytes=max_bytes, pathspecs=pathspecs, chunk_bytes=chunk_bytes,
+                           diff_options=diff_options, token=task.token, progress=task.report)
+
+    def timeDiffOptions(self):
+        repo_dir = self.repo_input.text()
+        commit_hashes = self.commit_input.text().replace(',', ' ').split()
+        if not repo_dir or not commit_hashes:
+            QMessageBox.warning(self, INPUT_ERROR, "Repository and commit hash must be filled out.")
+            return
+
+        self.startTask(self.timeDiffOptionsTask, repo_dir, commit_hashes,
+                       diff_options_variants(self.diff_options.diffOptions()), self.path_filter.pathspecs(),
+                       on_result=self.onDiffOptionsTimed)
+
+    @staticmethod
+    def timeDiffOptionsTask(task, repo_dir, commit_hashes, variants, pathspecs):
+        """ Worker: diff the commits once per variant of the diff options, returns OptionsTimings. """
+        return time_diff_options(repo_dir, commit_hashes, variants, pathspecs, task.token, task.report)
+
+    def onDiffOptionsTimed(self, timings):
+        """ Fastest first; the current options are the first variant. """
+        current = timings[0].options
+        lines = []
+        for timing in sorted(timings, key=lambda timing: (timing.error is not None, timing.elapsed)):
+            marker = '*' if timing.options == current else ' '
+            if timing.error:
+                lines.append(f"{marker} failed    {describe_diff_options(timing.options)}: {timing.error}")
+            else:
+                lines.append(f"{marker} {timing.elapsed:6.2f}s  {timing.bytes / (1024 * 1024):8.1f} MB  "
+                             f"{timing.files:6} files  {describe_diff_options(timing.options)}")
+        QMessageBox.information(self, "Diff Option Timings",
+                                "Uncached diff time per setting, fastest first (* current):\n\n" + "\n".join(lines))
+
+    def showChangedFiles(self):
+        repo_dir = self.repo_input.text()
+        commit_hashes = self.commit_input.text().replace(',', ' ').split()
+        if not repo_dir or not commit_hashes:
+            QMessageBox.warning(self, INPUT_ERROR, "Repository and commit hash must be filled out.")
+            return
+
+        commit_hash = commit_hashes[0]
+        self.startTask(self.commitRangeTask, repo_dir, commit_hash, self.diff_options.diffOptions().merge_mode,
+                       on_result=lambda revisions: self.openChangedFiles(repo_dir, commit_hash, revisions))
+
+    @staticmethod
+    def commitRangeTask(task, repo_dir, commit_hash, merge_mode):
+        return commit_range(repo_dir, commit_hash, task.token, merge_mode)
+
+    def openChangedFiles(self, repo_dir, commit_hash, revisions):
+        base, target = revisions
+        dialog = ChangedFilesDialog(self.task_runner, repo_dir, base, target, f"Changed files of {commit_hash}",
+                                    self.path_filter.pathspecs(), self.diff_cache, self.diff_options.diffOptions(),
+                                    self)
+        dialog.setAttribute(Qt.WA_DeleteOnClose)
+        dialog.show()
+
+    def onDiffsGenerated(self, result):
+        results, index_path, elapsed = result
+        diff_files = [diff.path for diff in results if diff.path]
+        warnings = [diff.warning for diff in results if diff.warning]
+
+        # Open either the single diff or the index of the batch, never one window per commit
+        if self.open_files_checkbox.isChecked():
+            if index_path:
+                self.openFile(index_path)
+            elif diff_files:
+                self.openFile(diff_files[0])
+
+        summary = f"Generated {len(diff_files)} of {len(results)} diff files in {elapsed:.1f}s."
+        written = [diff.stats for diff in results if diff.stats is not None]
+        if written:
+            summary += (f"\n{sum(stats.bytes_written for stats in written) / (1024 * 1024):.1f} MB written"
+                        f" ({sum(stats.bytes_in for stats in written) / (1024 * 1024):.1f} MB of diff)")
+            truncated = sum(1 for stats in written if stats.truncated)
+            if truncated:
+                summary += f", {truncated} truncated by the size limit"
+        summary += f"\n{self.diff_cache.describe_stats()}"
+        if index_path:
+            summary += f"\nIndex: {index_path}"
+        if warnings:
+            shown = warnings[:MAX_SUMMARY_WARNINGS]
+            summary += "\n\n" + "\n".join(shown)
+            if len(warnings) > len(shown):
+                summary += f"\n... and {len(warnings) - len(shown)} more warnings (see the index file)."
+        QMessageBox.information(self, "Success", summary)
+
+    def listPRs(self):
+        repo_dir = self.repo_input.text()
+
+        if not repo_dir:
+            QMessageBox.warning(self, INPUT_ERROR, "Repository directory must be filled out.")
+            return
+
+        # Check which radio button is selected
+        if self.only_pr_radio.isChecked():
+            # Show only pull requests (merges mentioning "pull request")
+            list_filter = FILTER_PRS
+        elif self.only_merges_radio.isChecked():
+            # Show only merge commits
+            list_filter = FILTER_MERGES
+        else:
+            list_filter = FILTER_ALL
+        self.config_manager.set_repo_dir(repo_dir)
+        self.config_manager.set_repo_filter(repo_dir, list_filter)
+
+        # Only one listing at a time: pages of a superseded listing are dropped
+        if self.list_task is not None:
+            self.list_task.cancel()
+        self.list_generation += 1
+        self.search_index = CommitSearchIndex()
+        self.pr_model.clear()
+        if self.search_input.text().strip():
+            # Pages are appended into the active search rather than unfiltered
+            self.pr_model.setFilter([])
+        self.fetch_warning = None
+        self.list_task = self.startTask(self.listPRsTask, repo_dir, list_filter, self.config_manager.get_config_dir(),
+                                        self.onBackgroundFetchError,
+                                        on_partial=partial(self.appendPRPage, self.list_generation))
+        self.listed = (repo_dir, list_filter)
+        self.ref_watcher.setRepository(repo_dir)
+
+    @staticmethod
+    def listPRsTask(task, repo_dir, list_filter, index_dir, on_fetch_error):
+        """
+        Worker: bring the commit index up to date and publish the filtered list page by page.
+        Newly indexed commits are published while they stream in; the rest comes from the index.
+        The list comes from the local history, so the fetch runs in the background instead of blocking it.
+        """
+        FetchCoordinator.shared(repo_dir).fetchInBackground(on_error=on_fetch_error)
+
+        count = 0
+        for page in iter_commit_pages(repo_dir, list_filter, index_dir, PR_PAGE_SIZE, task.token, task.report):
+            task.token.raise_if_cancelled()
+            task.publish(page)
+            count += len(page)
+            task.report(f"Loaded {count} commits...")
+        return count
+
+    def onBackgroundFetchError(self, error):
+        """ Fetch thread: pass the failure on to the GUI thread. """
+        message = (getattr(error, 'stderr', None) or str(error)).strip()
+        self.fetchFailed.emit(message.splitlines()[0] if message else type(error).__name__)
+
+    def onBackgroundFetchFailed(self, message):
+        self.fetch_warning = f"Fetching origin failed, remote changes may be missing: {message}"
+        self.status_label.setText(self.fetch_warning)
+        self.status_label.setToolTip(message)
+
+    def refreshPRs(self):
+        """ HEAD moved: list the commits since the listed tip instead of listing everything again. """
+        if self.listed is None:
+            return
+        if any(task is not None and self.task_runner.isActive(task) for task in (self.list_task, self.refresh_task)):
+            # The running listing or refresh may have read HEAD before it moved
+            QTimer.singleShot(REFRESH_RETRY_MS, self.refreshPRs)
+            return
+        repo_dir, list_filter = self.listed
+        self.refresh_task = self.task_runner.submit(
+            self.refreshPRsTask, repo_dir, list_filter, self.config_manager.get_config_dir(), owner=self,
+            on_result=partial(self.onPRsRefreshed, self.list_generation),
+            on_error=lambda message: self.status_label.setText(f"Refreshing the list failed: {message}"),
+            on_finished=lambda: self.cancel_button.setEnabled(self.task_runner.activeCount(self) > 0))
+
+    @staticmethod
+    def refreshPRsTask(task, repo_dir, list_filter, index_dir):
+        """ Worker: index the commits since the last indexed tip; returns (RefreshResult, matching new records). """
+        return refresh_commits(repo_dir, list_filter, index_dir, task.token)
+
+    def onPRsRefreshed(self, generation, result):
+        if generation != self.list_generation:
+            return
+        refresh, records = result
+        if refresh.rebuilt:
+            # History was rewritten (reset, rebase, other branch checked out): the listed commits are stale
+            self.listPRs()
+            return
+        if not records:
+            return
+        with TRACER.span('prependPRs', rows=len(records)):
+            query = self.search_input.text().strip().lower()
+            record_ids = [self.search_index.add(self.searchText(record)) for record in records]
+            matching_ids = [record_id for record_id in record_ids
+                            if query and self.search_index.matches(record_id, query)]
+            self.pr_model.prependRecords(records, matching_ids)
+        self.status_label.setText(f"Listed {len(records)} new commits.")
+
+    def appendPRPage(self, generation, page):
+        if generation != self.list_generation:
+            return
+        self.displayPRs(page)
+
+    def displayPRs(self, records):
+        """ Append PRs to the model and the search index, keeping the current search applied. """
+        with TRACER.span('displayPRs', rows=len(records)):
+            query = self.search_input.text().strip().lower()
+            record_ids = [self.search_index.add(self.searchText(record)) for record in records]
+            matching_ids = [record_id for record_id in record_ids
+                            if query and self.search_index.matches(record_id, query)]
+            self.pr_model.appendRecords(records, matching_ids)
+
+    @staticmethod
+    def searchText(record):
+        return f"{record.hash} {record.author} {record.subject}"
+
+    def searchPRs(self):
+        """ Filter PRs based on search input by swapping the model's row mapping. """
+        query = self.search_input.text().strip()
+        with TRACER.span('searchPRs', query=query) as trace:
+            self.pr_model.setFilter(self.search_index.search(query) if query else None)
+            trace['rows'] = self.pr_model.availableRows()
+
+    def startTask(self, fn, *args, on_result=None, **kwargs):
+        """ Run fn in the background, with progress in the status bar and errors in a dialog. """
+        self.cancel_button.setEnabled(True)
+        return self.task_runner.submit(fn, *args, owner=self, on_result=on_result,
+                                       on_error=self.onTaskError, on_progress=self.status_label.setText,
+                                       on_cancelled=lambda: self.status_label.setText("Cancelled."),
+                                       on_finished=self.onTaskFinished, **kwargs)
+
+    def onTaskError(self, message):
+        QMessageBox.critical(self, "Error", f"An error occurred: {message}")
+
+    def onTaskFinished(self):
+        running = self.task_runner.activeCount(self)
+        self.cancel_button.setEnabled(running > 0)
+        if not running and not self.status_label.text().endswith("Cancelled."):
+            self.status_label.setText(self.fetch_warning or "Ready.")
+
+    def cancelTasks(self):
+        self.task_runner.cancelAll(self)
+
+    def onPRClick(self, index):
+        """ When a PR is clicked, insert the commit hash into the commit input box. """
+        commit_hash = index.data(HashRole)  # Retrieve the stored commit hash
+        self.commit_input.setText(commit_hash)
+
+    def openFile(self, file_path):
+        """ Show a generated file in the Diff Viewer tab. """
+        with TRACER.span('openFile', path=os.path.basename(file_path)):
+            self.diff_viewer.openDiff(file_path)
+            self.tabs.setCurrentWidget(self.diff_viewer)
+
+    @staticmethod
+    def openExternally(file_path):
+        if platform.system() == "Darwin":
+            subprocess.run(['open', file_path])
+        elif platform.system() == "Windows":
+            os.startfile(file_path)
+        else:
+            subprocess.run(['xdg-open', file_path])
+
@@ -0,0 +1,88 @@
+import subprocess
+from collections import namedtuple
+from datetime import datetime
+
+from GitProcess import StderrDrain, finish_git, popen_git
+
+# Fields are separated by the ASCII unit separator and records are NUL-terminated (-z),
+# so subjects containing newlines or "commit " can never break the parsing.
+FIELD_SEPARATOR = b'\x1f'
+RECORD_SEPARATOR = b'\x00'
+LOG_FORMAT = '%H%x1f%P%x1f%an%x1f%at%x1f%s'
+
+# Bytes read from the git pipe per syscall and commits handed out per page
+READ_CHUNK_SIZE = 64 * 1024
+DEFAULT_PAGE_SIZE = 500
+
+CommitRecord = namedtuple('CommitRecord', ['hash', 'parents', 'author', 'date', 'subject'])
+
+
+def parse_commit_record(raw):
+    """ Parse a single raw log record (bytes) into a CommitRecord. """
+    commit_hash, parents, author, date, subject = raw.decode('utf-8', errors='replace').split('\x1f', 4)
+    return CommitRecord(commit_hash, tuple(parents.split()), author, int(date or 0), subject)
+
+
+def format_commit_date(timestamp):
+    """ Format a unix timestamp the way it is shown in the commit lists. """
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M')
+
+
+class GitLogReader:
+    """ Streams `git log` output as CommitRecords without buffering the whole history. """
+
+    def __init__(self, repo_dir, rev_args=None, token=None):
+        self.repo_dir = repo_dir
+        self.rev_args = list(rev_args or [])
+        self.token = token
+
+    def args(self):
+        return ['log', '-z', f'--pretty=tformat:{LOG_FORMAT}', *self.rev_args]
+
+    def iter_commits(self):
+        """ Yield CommitRecords as soon as git writes them to the pipe. """
+        process = popen_git(self.repo_dir, self.args(), self.token,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stderr_drain = StderrDrain(process)
+        buffer = b''
+        bytes_read = 0
+        try:
+            while True:
+                chunk = process.stdout.read1(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                bytes_read += len(chunk)
+                buffer += chunk
+                *records, buffer = buffer.split(RECORD_SEPARATOR)
+                for raw in records:
+                    if raw:
+                        yield parse_commit_record(raw)
+            if buffer.strip():
+                yield parse_commit_record(buffer)
+        finally:
+            # The consumer may stop early (new listing, window closed); don't leave git running
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+            stderr = stderr_drain.finish()
+            if self.token is not None:
+                self.token.unregister(process)
+            finish_git(process, bytes_read)
+
+        if self.token is not None:
+            self.token.raise_if_cancelled()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, ['git', *self.args()],
+                                                stderr=stderr.decode('utf-8', errors='replace'))
+
+    def iter_pages(self, page_size=DEFAULT_PAGE_SIZE):
+        """ Yield lists of at most page_size CommitRecords. """
+        page = []
+        for record in self.iter_commits():
+            page.append(record)
+            if len(page) >= page_size:
+                yield page
+                page = []
+        if page:
+            yield page
@@ -0,0 +1,164 @@
+import atexit
+import os
+import subprocess
+import threading
+from collections import namedtuple
+
+from Tracing import CATEGORY_GIT, TRACER
+
+ObjectInfo = namedtuple('ObjectInfo', ['oid', 'type', 'size'])
+CommitHeader = namedtuple('CommitHeader', ['hash', 'tree', 'parents', 'author', 'author_date', 'committer',
+                                           'commit_date', 'subject'])
+
+
+class _BatchConnection:
+    """ One long-lived `git cat-file <mode>` process answering a query per line on its stdin. """
+
+    def __init__(self, repo_dir, mode):
+        self.repo_dir = repo_dir
+        self.mode = mode
+        self.process = None
+
+    def ensure_started(self):
+        if self.process is None or self.process.poll() is not None:
+            # Queries are too frequent and too cheap to trace one by one; starts are what cost
+            with TRACER.span(f'git cat-file {self.mode}', CATEGORY_GIT):
+                self.process = subprocess.Popen(['git', 'cat-file', self.mode], cwd=self.repo_dir,
+                                                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                                stderr=subprocess.DEVNULL)
+        return self.process
+
+    def query(self, name):
+        """ Send one object name; returns (ObjectInfo or None if missing, contents or None). """
+        process = self.ensure_started()
+        try:
+            process.stdin.write(name.encode('utf-8') + b'\n')
+            process.stdin.flush()
+            header = process.stdout.readline()
+            if not header:
+                raise OSError(f"git cat-file {self.mode} exited unexpectedly")
+            fields = header.decode('utf-8', errors='replace').split()
+            if fields[-1] in ('missing', 'ambiguous'):
+                return None, None
+            info = ObjectInfo(fields[0], fields[1], int(fields[2]))
+            if self.mode != '--batch':
+                return info, None
+            contents = process.stdout.read(info.size)
+            process.stdout.read(1)  # trailing newline after the contents
+            return info, contents
+        except BaseException:
+            # The stream may be out of step now; the next query starts a fresh process
+            self.close()
+            raise
+
+    def close(self):
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+
+class GitObjectReader:
+    """
+    Answers object-type, parent and commit-header lookups for one repository over persistent
+    `git cat-file --batch-check` / `--batch` pipes, instead of starting a git process per query.
+    Object names are anything `git rev-parse` accepts (e.g. `origin/main^{commit}`).
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, repo_dir):
+        self.repo_dir = repo_dir
+        self._lock = threading.Lock()
+        self._check = _BatchConnection(repo_dir, '--batch-check')
+        self._batch = _BatchConnection(repo_dir, '--batch')
+
+    @classmethod
+    def shared(cls, repo_dir):
+        """ One reader per repository, reused across UI actions and worker threads. """
+        repo_dir = os.path.abspath(repo_dir)
+        with cls._instances_lock:
+            if repo_dir not in cls._instances:
+                cls._instances[repo_dir] = cls(repo_dir)
+            return cls._instances[repo_dir]
+
+    @classmethod
+    def close_all(cls):
+        with cls._instances_lock:
+            readers = list(cls._instances.values())
+            cls._instances.clear()
+        for reader in readers:
+            reader.close()
+
+    @staticmethod
+    def checkName(name):
+        if not name or '\n' in name:
+            raise ValueError(f"Invalid object name {name!r}.")
+
+    def info(self, name):
+        """ ObjectInfo(oid, type, size) of an object, or None if it does not exist. """
+        self.checkName(name)
+        with self._lock:
+            return self._check.query(name)[0]
+
+    def read(self, name):
+        """ (ObjectInfo, raw contents) of an object, or (None, None) if it does not exist. """
+        self.checkName(name)
+        with self._lock:
+            return self._batch.query(name)
+
+    def resolve(self, name, object_type='commit'):
+        """ Full object id of name peeled to object_type; raises ValueError if there is none. """
+        info = self.info(f'{name}^{{{object_type}}}')
+        if info is None:
+            raise ValueError(f"Unable to resolve {object_type} {name}.")
+        return info.oid
+
+    def commitHeader(self, name):
+        """ Parse the commit name points to into a CommitHeader; raises ValueError if there is none. """
+        info, contents = self.read(f'{name}^{{commit}}')
+        if info is None:
+            raise ValueError(f"Unable to resolve commit {name}.")
+        header, _, message = contents.decode('utf-8', errors='replace').partition('\n\n')
+        tree = None
+        parents = []
+        author = author_date = committer = commit_date = None
+        for line in header.splitlines():
+            key, _, value = line.partition(' ')
+            if key == 'tree':
+                tree = value
+            elif key == 'parent':
+                parents.append(value)
+            elif key == 'author':
+                author, author_date = self.splitIdentity(value)
+            elif key == 'committer':
+                committer, commit_date = self.splitIdentity(value)
+        subject = message.split('\n', 1)[0]
+        return CommitHeader(info.oid, tree, tuple(parents), author, author_date, committer, commit_date, subject)
+
+    @staticmethod
+    def splitIdentity(value):
+        """ 'Name <email> 1700000000 +0100' -> ('Name <email>', 1700000000) """
+        identity, _, rest = value.rpartition('> ')
+        timestamp = rest.split(' ', 1)[0]
+        return identity + '>', int(timestamp) if timestamp.isdigit() else None
+
+    def parents(self, name):
+        return self.commitHeader(name).parents
+
+    def close(self):
+        with self._lock:
+            self._check.close()
+            self._batch.close()
+
+
+atexit.register(GitObjectReader.close_all)
@@ -0,0 +1,121 @@
+import subprocess
+import threading
+
+from Tracing import CATEGORY_GIT, TRACER
+
+# Commands longer than this are cut in trace spans (batches can pass thousands of hashes)
+MAX_TRACED_COMMAND = 200
+# The end of a streamed process's stderr that is kept for its error; warnings can run far longer
+MAX_STDERR_BYTES = 64 * 1024
+STDERR_CHUNK_SIZE = 64 * 1024
+
+
+class GitCancelled(Exception):
+    """ Raised inside a task when its work was cancelled. """
+
+
+class CancelToken:
+    """ Cancellation flag shared between a task and the git processes it spawns. """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = set()
+
+    @property
+    def is_cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """ Flag the token and kill every git process still running under it. """
+        self._event.set()
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise GitCancelled()
+
+    def register(self, process):
+        with self._lock:
+            self._processes.add(process)
+        # Cancelled between the check and the spawn: don't let the new process run
+        if self._event.is_set() and process.poll() is None:
+            process.kill()
+
+    def unregister(self, process):
+        with self._lock:
+            self._processes.discard(process)
+
+
+def popen_git(repo_dir, args, token=None, **kwargs):
+    """ Start `git <args>` in repo_dir and tie it to the cancel token. """
+    if token is not None:
+        token.raise_if_cancelled()
+    command = ' '.join(['git', *args])
+    trace = TRACER.begin(f'git {args[0]}', CATEGORY_GIT, command=command[:MAX_TRACED_COMMAND])
+    process = subprocess.Popen(['git', *args], cwd=repo_dir, **kwargs)
+    process.trace = trace
+    if token is not None:
+        token.register(process)
+    return process
+
+
+class StderrDrain:
+    """
+    Reads the stderr of a popen_git process on a thread while the caller streams its stdout. Reading
+    stderr only after stdout would deadlock once git writes more than a pipe buffer of warnings.
+    """
+
+    def __init__(self, process):
+        self.stream = process.stderr
+        self.tail = b''
+        self.thread = threading.Thread(target=self.run, name='git stderr', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            chunk = self.stream.read1(STDERR_CHUNK_SIZE)
+            if not chunk:
+                return
+            self.tail = (self.tail + chunk)[-MAX_STDERR_BYTES:]
+
+    def finish(self):
+        """ Wait until the process closed stderr (call after it exited or was killed); returns its end. """
+        self.thread.join()
+        self.stream.close()
+        return self.tail
+
+
+def finish_git(process, bytes_read=None):
+    """ Record the trace span of a finished popen_git process with its return code and output size. """
+    trace = getattr(process, 'trace', None)
+    if trace is not None:
+        if bytes_read is None:
+            trace.end(returncode=process.returncode)
+        else:
+            trace.end(returncode=process.returncode, bytes=bytes_read)
+
+
+def run_git(repo_dir, args, token=None, stdout=subprocess.PIPE, check=True, text=True):
+    """
+    Run `git <args>` with repo_dir as the working directory (the process cwd is never changed).
+    Output goes to stdout, which may be an open file; returns a CompletedProcess.
+    """
+    process = popen_git(repo_dir, args, token, stdout=stdout, stderr=subprocess.PIPE, text=text)
+    out = None
+    try:
+        out, err = process.communicate()
+    finally:
+        if token is not None:
+            token.unregister(process)
+        finish_git(process, len(out) if out is not None else None)
+
+    if token is not None and token.is_cancelled:
+        raise GitCancelled()
+    if check and process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, ['git', *args], output=out, stderr=err)
+    return subprocess.CompletedProcess(['git', *args], process.returncode, out, err)
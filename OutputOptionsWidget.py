@@ -0,0 +1,62 @@
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QLabel, QComboBox, QSpinBox
+
+from DiffChunker import tokens_to_bytes
+from DiffOutputPipeline import available_compressions, COMPRESSION_NONE
+
+
+class OutputOptionsWidget(QWidget):
+    """ Compression and size-limit choices for written diffs, persisted in the config. """
+
+    def __init__(self, config_manager, parent=None):
+        super().__init__(parent)
+        self.config_manager = config_manager
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(QLabel('Compression:', self))
+        self.compression_combo = QComboBox(self)
+        for compression in available_compressions():
+            self.compression_combo.addItem(compression or 'none', compression)
+        index = self.compression_combo.findData(self.config_manager.get_output_compression())
+        self.compression_combo.setCurrentIndex(max(index, 0))
+        self.compression_combo.currentIndexChanged.connect(self.saveCompression)
+        layout.addWidget(self.compression_combo)
+
+        layout.addWidget(QLabel('Size limit:', self))
+        self.max_size_spin = QSpinBox(self)
+        self.max_size_spin.setRange(0, 1024 * 1024)
+        self.max_size_spin.setSuffix(' MB')
+        self.max_size_spin.setSpecialValueText('unlimited')
+        self.max_size_spin.setValue(self.config_manager.get_output_max_mb())
+        self.max_size_spin.editingFinished.connect(self.saveMaxSize)
+        layout.addWidget(self.max_size_spin)
+
+        # Chunks sized for pasting into an LLM context window
+        layout.addWidget(QLabel('Split into chunks of:', self))
+        self.chunk_spin = QSpinBox(self)
+        self.chunk_spin.setRange(0, 10 * 1024)
+        self.chunk_spin.setSuffix('k tokens')
+        self.chunk_spin.setSpecialValueText('no split')
+        self.chunk_spin.setValue(self.config_manager.get_output_chunk_ktokens())
+        self.chunk_spin.editingFinished.connect(self.saveChunkSize)
+        layout.addWidget(self.chunk_spin)
+        layout.addStretch(1)
+
+    def compression(self):
+        return self.compression_combo.currentData() or COMPRESSION_NONE
+
+    def maxBytes(self):
+        return self.max_size_spin.value() * 1024 * 1024 or None
+
+    def chunkBytes(self):
+        """ Chunk budget in bytes, or None when diffs are written as single files. """
+        return tokens_to_bytes(self.chunk_spin.value() * 1000) or None
+
+    def saveCompression(self):
+        self.config_manager.set_output_compression(self.compression())
+
+    def saveMaxSize(self):
+        self.config_manager.set_output_max_mb(self.max_size_spin.value())
+
+    def saveChunkSize(self):
+        self.config_manager.set_output_chunk_ktokens(self.chunk_spin.value())
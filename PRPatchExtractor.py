@@ -0,0 +1,210 @@
+import os
+import shutil
+import subprocess
+
+from BatchDiffGenerator import DiffResult
+from DiffCache import DiffCache
+from DiffOptions import diff_engine_args
+from DiffOutputPipeline import COMPRESSION_NONE, copy_to_output, open_sink, output_path
+from GitObjectReader import GitObjectReader
+from GitProcess import StderrDrain, finish_git, popen_git, run_git
+
+# Marks the start of each commit in the `git log -p` stream
+COMMIT_MARKER = b'\x1e'
+EMPTY_TREE = '4b825dc642cb6eb9a060e54bf8d69288fbee4904'
+
+
+class PRPatchExtractor:
+    """
+    Extracts the patches of the commits a PR merge brought in (merge^1..merge^2) with a single
+    streaming `git log -p` invocation, split per commit on the fly.
+    """
+
+    def __init__(self, repo_dir, output_dir, cache=None, token=None, progress=None, compression=COMPRESSION_NONE,
+                 diff_options=None):
+        self.repo_dir = repo_dir
+        self.output_dir = output_dir
+        self.cache = cache
+        self.compression = compression
+        self.engine_args = diff_engine_args(diff_options)
+        self.token = token
+        self.progress = progress or (lambda message: None)
+
+    def pr_commits(self, merge_commit):
+        """ Return [(commit, first parent)] for the commits the merge introduced, newest first. """
+        if len(GitObjectReader.shared(self.repo_dir).commitHeader(merge_commit).parents) < 2:
+            raise ValueError(f"{merge_commit} is not a merge commit.")
+        result = run_git(self.repo_dir, ['rev-list', '--parents', f'{merge_commit}^1..{merge_commit}^2', '--'],
+                         self.token)
+        commits = []
+        for line in result.stdout.splitlines():
+            commit_hash, *parents = line.split()
+            commits.append((commit_hash, parents[0] if parents else EMPTY_TREE))
+        return commits
+
+    def run(self, merge_commit, combined=False):
+        """
+        Write <hash>_diff.txt per PR commit, or a single <merge>_pr_diff.txt when combined.
+        Returns a list of DiffResults.
+        """
+        self.progress(f"Listing commits of {merge_commit}...")
+        commits = self.pr_commits(merge_commit)
+        if not commits:
+            raise ValueError(f"No commits found for the specified merge commit {merge_commit}.")
+
+        cached = {}
+        if self.cache is not None:
+            for commit_hash, parent in commits:
+                cached_path = self.cache.lookup(self.cacheKey(commit_hash, parent))
+                if cached_path is not None:
+                    cached[commit_hash] = cached_path
+
+        try:
+            if combined:
+                combined_path = output_path(os.path.join(self.output_dir, f'{merge_commit}_pr_diff.txt'),
+                                            self.compression)
+                with open_sink(combined_path, self.compression) as combined_file:
+                    self.writeCombined(commits, cached, combined_file)
+                return [DiffResult(merge_commit, combined_path, None)]
+
+            for commit_hash, _ in commits:
+                if commit_hash in cached:
+                    copy_to_output(cached[commit_hash], self.outputPath(commit_hash), self.compression)
+            self.streamPatches(commits, cached,
+                               lambda commit_hash: open_sink(self.outputPath(commit_hash), self.compression))
+            return [DiffResult(commit_hash, self.outputPath(commit_hash), None) for commit_hash, _ in commits]
+        finally:
+            if self.cache is not None:
+                self.cache.save_index()
+
+    def writeCombined(self, commits, cached, combined_file):
+        """ Write every commit's patch into one file, keeping the commit order of the PR. """
+        pending = iter(commits)
+
+        def copy_cached_until(stop_hash):
+            # Cached commits are not in the git stream; copy them in as their turn comes
+            for commit_hash, _ in pending:
+                if commit_hash == stop_hash:
+                    return
+                combined_file.write(f'commit {commit_hash}\n'.encode())
+                with open(cached[commit_hash], 'rb') as cached_file:
+                    shutil.copyfileobj(cached_file, combined_file)
+
+        def open_section(commit_hash):
+            copy_cached_until(commit_hash)
+            combined_file.write(f'commit {commit_hash}\n'.encode())
+            return _UnclosedWriter(combined_file)
+
+        self.streamPatches(commits, cached, open_section)
+        copy_cached_until(None)
+
+    def streamPatches(self, commits, cached, open_destination):
+        """ Run one `git log -p` over the uncached commits and route each patch to open_destination(commit). """
+        parents = {commit_hash: parent for commit_hash, parent in commits if commit_hash not in cached}
+        if not parents:
+            return
+
+        # The hashes go through stdin: PRs of thousands of commits would overflow the command line (32K on Windows)
+        process = popen_git(self.repo_dir, ['log', '-p', '--diff-merges=first-parent', '--no-walk=unsorted',
+                                            *self.engine_args, '--format=%x1e%H', '--stdin', '--'], self.token,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stderr_drain = StderrDrain(process)
+        sink = None
+        bytes_read = 0
+        try:
+            try:
+                # git reads all of stdin before it writes anything, so this cannot block on a full stdout
+                process.stdin.write(''.join(f'{commit_hash}\n' for commit_hash in parents).encode())
+                process.stdin.close()
+            except BrokenPipeError:
+                # git exited early; its return code and stderr tell why
+                pass
+            first_line = False
+            for line in process.stdout:
+                bytes_read += len(line)
+                if line.startswith(COMMIT_MARKER):
+                    self.closeSink(sink)
+                    commit_hash = line[len(COMMIT_MARKER):].strip().decode()
+                    sink = _CachingSink(open_destination(commit_hash), commit_hash, parents[commit_hash], self)
+                    self.progress(f"Writing patch {commit_hash}")
+                    first_line = True
+                    continue
+                # git separates the header from the patch with a blank line
+                if first_line and line == b'\n':
+                    first_line = False
+                    continue
+                first_line = False
+                sink.write(line)
+            self.closeSink(sink)
+            sink = None
+        finally:
+            if sink is not None:
+                sink.abort()
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+            stderr = stderr_drain.finish()
+            if self.token is not None:
+                self.token.unregister(process)
+            finish_git(process, bytes_read)
+
+        if self.token is not None:
+            self.token.raise_if_cancelled()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, 'git log -p', stderr=stderr.decode())
+
+    @staticmethod
+    def closeSink(sink):
+        if sink is not None:
+            sink.close()
+
+    def outputPath(self, commit_hash):
+        return output_path(os.path.join(self.output_dir, f'{commit_hash}_diff.txt'), self.compression)
+
+    def cacheKey(self, commit_hash, parent):
+        return DiffCache.make_key(parent, commit_hash, tuple(self.engine_args))
+
+
+class _UnclosedWriter:
+    """ Hands a section of a shared file to a sink without letting it close the file. """
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, data):
+        self.file.write(data)
+
+    def close(self):
+        pass
+
+
+class _CachingSink:
+    """ Writes one commit's patch to its destination and tees it into the diff cache. """
+
+    def __init__(self, destination, commit_hash, parent, extractor):
+        self.destination = destination
+        self.key = extractor.cacheKey(commit_hash, parent)
+        self.cache = extractor.cache
+        self.cache_file = None
+        if self.cache is not None:
+            self.cache_file = open(self.cache.temp_path(self.key), 'wb')
+
+    def write(self, data):
+        self.destination.write(data)
+        if self.cache_file is not None:
+            self.cache_file.write(data)
+
+    def close(self):
+        self.destination.close()
+        if self.cache_file is not None:
+            self.cache_file.close()
+            self.cache.store(self.key, self.cache_file.name, move=True)
+            if os.path.exists(self.cache_file.name):
+                os.remove(self.cache_file.name)
+
+    def abort(self):
+        self.destination.close()
+        if self.cache_file is not None:
+            self.cache_file.close()
+            os.remove(self.cache_file.name)
@@ -0,0 +1,35 @@
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QLabel, QLineEdit
+
+from DiffStat import pathspec_args, split_pathspecs
+
+
+class PathFilterWidget(QWidget):
+    """ Include/exclude pathspecs applied to every diff, persisted in the config. """
+
+    def __init__(self, config_manager, parent=None):
+        super().__init__(parent)
+        self.config_manager = config_manager
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(QLabel('Only paths:', self))
+        self.include_input = QLineEdit(self)
+        self.include_input.setPlaceholderText('e.g. src/ docs/*.md (all when empty)')
+        self.include_input.setText(self.config_manager.get_path_include())
+        self.include_input.editingFinished.connect(self.saveFilters)
+        layout.addWidget(self.include_input)
+
+        layout.addWidget(QLabel('Skip paths:', self))
+        self.exclude_input = QLineEdit(self)
+        self.exclude_input.setPlaceholderText('e.g. *.lock package-lock.json')
+        self.exclude_input.setText(self.config_manager.get_path_exclude())
+        self.exclude_input.editingFinished.connect(self.saveFilters)
+        layout.addWidget(self.exclude_input)
+
+    def pathspecs(self):
+        """ Pathspec arguments for git diff, empty when nothing is filtered. """
+        return pathspec_args(split_pathspecs(self.include_input.text()),
+                             split_pathspecs(self.exclude_input.text()))
+
+    def saveFilters(self):
+        self.config_manager.set_path_filters(self.include_input.text().strip(), self.exclude_input.text().strip())
@@ -0,0 +1,105 @@
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QToolButton, QCheckBox,
+                             QTreeWidget, QTreeWidgetItem, QHeaderView, QFileDialog, QMessageBox)
+
+from Tracing import TRACER, describe_span
+
+# Newest spans listed in the panel; the export always has the whole ring buffer
+MAX_SHOWN_SPANS = 500
+REFRESH_INTERVAL_MS = 500
+
+
+class PerformancePanel(QWidget):
+    """
+    Collapsible view of the most recent trace spans (git processes, UI population, file I/O) with
+    per-category totals. It only refreshes while expanded and when new spans were recorded.
+    """
+
+    def __init__(self, tracer=TRACER, parent=None):
+        super().__init__(parent)
+        self.tracer = tracer
+        self.shown_generation = None
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.toggle_button = QToolButton(self)
+        self.toggle_button.setText('Performance')
+        self.toggle_button.setToolButtonStyle(Qt.ToolButtonTextBesideIcon)
+        self.toggle_button.setArrowType(Qt.RightArrow)
+        self.toggle_button.setCheckable(True)
+        self.toggle_button.setAutoRaise(True)
+        self.toggle_button.toggled.connect(self.setExpanded)
+        layout.addWidget(self.toggle_button)
+
+        self.body = QWidget(self)
+        body_layout = QVBoxLayout(self.body)
+        body_layout.setContentsMargins(0, 0, 0, 0)
+        controls_layout = QHBoxLayout()
+        self.summary_label = QLabel('', self.body)
+        controls_layout.addWidget(self.summary_label, 1)
+        self.record_checkbox = QCheckBox('Record', self.body)
+        self.record_checkbox.setChecked(self.tracer.enabled)
+        self.record_checkbox.toggled.connect(self.setRecording)
+        controls_layout.addWidget(self.record_checkbox)
+        self.clear_button = QPushButton('Clear', self.body)
+        self.clear_button.clicked.connect(self.tracer.clear)
+        controls_layout.addWidget(self.clear_button)
+        self.export_button = QPushButton('Export Chrome Trace...', self.body)
+        self.export_button.clicked.connect(self.exportTrace)
+        controls_layout.addWidget(self.export_button)
+        body_layout.addLayout(controls_layout)
+
+        self.span_tree = QTreeWidget(self.body)
+        self.span_tree.setHeaderLabels(['Category', 'Span', 'ms', 'Details', 'Thread'])
+        self.span_tree.setRootIsDecorated(False)
+        self.span_tree.setUniformRowHeights(True)
+        self.span_tree.header().setSectionResizeMode(3, QHeaderView.Stretch)
+        body_layout.addWidget(self.span_tree)
+        self.body.setVisible(False)
+        layout.addWidget(self.body)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(REFRESH_INTERVAL_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def setExpanded(self, expanded):
+        self.toggle_button.setArrowType(Qt.DownArrow if expanded else Qt.RightArrow)
+        self.body.setVisible(expanded)
+        if expanded:
+            self.refresh()
+            self.refresh_timer.start()
+        else:
+            self.refresh_timer.stop()
+
+    def setRecording(self, enabled):
+        self.tracer.enabled = enabled
+
+    def refresh(self):
+        spans, generation = self.tracer.snapshot()
+        if generation == self.shown_generation:
+            return
+        self.shown_generation = generation
+
+        totals = self.tracer.summary(spans)
+        self.summary_label.setText('  '.join(f"{category}: {count} spans, {total * 1000:.0f} ms"
+                                             for category, (count, total) in sorted(totals.items()))
+                                   or 'No spans recorded.')
+        items = []
+        for span in reversed(spans[-MAX_SHOWN_SPANS:]):
+            item = QTreeWidgetItem([span.category, span.name, f"{span.duration * 1000:.1f}", describe_span(span),
+                                    span.thread])
+            item.setTextAlignment(2, Qt.AlignRight)
+            if 'command' in span.args:
+                item.setToolTip(1, span.args['command'])
+            items.append(item)
+        self.span_tree.clear()
+        self.span_tree.addTopLevelItems(items)
+
+    def exportTrace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Chrome Trace", 'trace.json', "Trace files (*.json)")
+        if not path:
+            return
+        try:
+            self.tracer.exportChromeTrace(path)
+        except OSError as error:
+            QMessageBox.critical(self, "Error", f"Unable to write {path}: {error}")
@@ -0,0 +1,171 @@
+import os
+
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+# Fetches and rebases rewrite many refs in a row; the refs are looked at once the changes settle
+SETTLE_MS = 300
+POLL_INTERVAL_MS = 2000
+# Lists busy loading when refs change refresh again after this
+REFRESH_RETRY_MS = 500
+REMOTE_REFS = os.path.join('refs', 'remotes')
+LOCAL_REFS = os.path.join('refs', 'heads')
+
+
+def find_git_dirs(repo_dir):
+    """
+    (git dir, common dir) of a repository, found without running git; None if repo_dir is no
+    repository. HEAD and FETCH_HEAD live in the git dir, refs/ and packed-refs in the common dir
+    (the two differ for linked worktrees).
+    """
+    dot_git = os.path.join(repo_dir, '.git')
+    try:
+        if os.path.isdir(dot_git):
+            git_dir = dot_git
+        elif os.path.isfile(dot_git):
+            with open(dot_git) as dot_git_file:
+                content = dot_git_file.read().strip()
+            if not content.startswith('gitdir:'):
+                return None
+            git_dir = os.path.join(repo_dir, content[len('gitdir:'):].strip())
+        elif os.path.isfile(os.path.join(repo_dir, 'HEAD')) and os.path.isdir(os.path.join(repo_dir, 'refs')):
+            git_dir = repo_dir  # bare repository
+        else:
+            return None
+        common_dir = git_dir
+        commondir_path = os.path.join(git_dir, 'commondir')
+        if os.path.isfile(commondir_path):
+            with open(commondir_path) as commondir_file:
+                common_dir = os.path.join(git_dir, commondir_file.read().strip())
+    except OSError:
+        return None
+    return os.path.normpath(os.path.abspath(git_dir)), os.path.normpath(os.path.abspath(common_dir))
+
+
+def _stat_key(path):
+    """ Changes whenever git rewrites the file (always by renaming a lock file over it). """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class RefWatcher(QObject):
+    """
+    Watches a repository's HEAD, refs/, packed-refs and FETCH_HEAD and signals when the checked
+    out commit (headChanged) or the remote branches (branchesChanged) moved, so lists can be
+    updated incrementally instead of reloaded by hand. Uses QFileSystemWatcher (inotify and the
+    like), and polls every POLL_INTERVAL_MS where that is unavailable.
+    """
+    headChanged = pyqtSignal()
+    branchesChanged = pyqtSignal()
+
+    def __init__(self, parent=None, poll=False):
+        super().__init__(parent)
+        self.force_poll = poll
+        self.repo_dir = None
+        self.git_dir = None
+        self.common_dir = None
+        self.watcher = None
+        self.head_state = None
+        self.branches_state = None
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(SETTLE_MS)
+        self.settle_timer.timeout.connect(self.checkRefs)
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(POLL_INTERVAL_MS)
+        self.poll_timer.timeout.connect(self.checkRefs)
+
+    def setRepository(self, repo_dir):
+        """
+        Watch repo_dir instead of the previous repository (None or a non-repository: stop).
+        Its current refs are the baseline; only later changes are signalled.
+        """
+        if repo_dir and os.path.abspath(repo_dir) == self.repo_dir:
+            return
+        self.stop()
+        git_dirs = find_git_dirs(repo_dir) if repo_dir else None
+        if git_dirs is None:
+            return
+        self.repo_dir = os.path.abspath(repo_dir)
+        self.git_dir, self.common_dir = git_dirs
+        self.head_state = self.headState()
+        self.branches_state = self.branchesState()
+        if self.force_poll or not self.startWatching():
+            self.poll_timer.start()
+
+    def stop(self):
+        self.settle_timer.stop()
+        self.poll_timer.stop()
+        if self.watcher is not None:
+            self.watcher.deleteLater()
+            self.watcher = None
+        self.repo_dir = self.git_dir = self.common_dir = None
+
+    def isPolling(self):
+        return self.poll_timer.isActive()
+
+    def watchedPaths(self):
+        """
+        Directories whose entries change when a ref moves (ref files are replaced by renaming their
+        lock file, so the directory is what changes), plus FETCH_HEAD, which fetch rewrites in place.
+        """
+        paths = [self.git_dir, self.common_dir, os.path.join(self.git_dir, 'FETCH_HEAD')]
+        for refs in (LOCAL_REFS, REMOTE_REFS):
+            for directory, _, _ in os.walk(os.path.join(self.common_dir, refs)):
+                paths.append(directory)
+        return [path for path in dict.fromkeys(paths) if os.path.exists(path)]
+
+    def startWatching(self):
+        """ Watch with QFileSystemWatcher; False if the repository cannot be watched that way. """
+        self.watcher = QFileSystemWatcher(self)
+        failed = self.watcher.addPaths(self.watchedPaths())
+        if self.git_dir in failed or self.common_dir in failed:
+            self.watcher.deleteLater()
+            self.watcher = None
+            return False
+        self.watcher.directoryChanged.connect(self.onPathChanged)
+        self.watcher.fileChanged.connect(self.onPathChanged)
+        return True
+
+    def onPathChanged(self, path):
+        self.settle_timer.start()
+
+    def headState(self):
+        """ What HEAD points to, and the files its commit is read from. """
+        try:
+            with open(os.path.join(self.git_dir, 'HEAD')) as head_file:
+                head = head_file.read().strip()
+        except OSError:
+            head = None
+        ref_key = None
+        if head and head.startswith('ref:'):
+            ref_key = _stat_key(os.path.join(self.common_dir, head[len('ref:'):].strip()))
+        return head, ref_key, _stat_key(os.path.join(self.common_dir, 'packed-refs'))
+
+    def branchesState(self):
+        """ The loose remote ref files and packed-refs; every fetch that moves a branch changes one of them. """
+        refs = []
+        for directory, _, files in os.walk(os.path.join(self.common_dir, REMOTE_REFS)):
+            refs.extend((os.path.join(directory, name), _stat_key(os.path.join(directory, name))) for name in files)
+        refs.sort()
+        return tuple(refs), _stat_key(os.path.join(self.common_dir, 'packed-refs'))
+
+    def checkRefs(self):
+        if self.repo_dir is None:
+            return
+        if self.watcher is not None:
+            # New branch directories (feature/...) and a recreated FETCH_HEAD need watching too
+            watched = set(self.watcher.directories()) | set(self.watcher.files())
+            new_paths = [path for path in self.watchedPaths() if path not in watched]
+            if new_paths:
+                self.watcher.addPaths(new_paths)
+        head_state = self.headState()
+        if head_state != self.head_state:
+            self.head_state = head_state
+            self.headChanged.emit()
+        branches_state = self.branchesState()
+        if branches_state != self.branches_state:
+            self.branches_state = branches_state
+            self.branchesChanged.emit()
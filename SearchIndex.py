@@ -0,0 +1,126 @@
+import bisect
+import re
+
+TOKEN_REGEX = re.compile(r'\w+')
+FULL_HASH_REGEX = re.compile(r'^[0-9a-f]{40}$')
+HASH_PREFIX_REGEX = re.compile(r'^[0-9a-f]{1,40}$')
+
+# Depth of the hash-prefix trie; longer prefixes are narrowed by the final text check
+TRIE_DEPTH = 6
+
+
+class HashPrefixTrie:
+    """ Maps commit hash prefixes to record ids without storing every prefix of every hash. """
+
+    def __init__(self, depth=TRIE_DEPTH):
+        self.depth = depth
+        self.root = {}
+
+    def add(self, commit_hash, record_id):
+        node = self.root
+        for char in commit_hash[:self.depth]:
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append(record_id)
+
+    def find(self, prefix):
+        """ Return the ids of all hashes starting with prefix[:depth]. """
+        node = self.root
+        for char in prefix[:self.depth]:
+            node = node.get(char)
+            if node is None:
+                return []
+        ids = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key is None:
+                    ids.extend(child)
+                else:
+                    stack.append(child)
+        return ids
+
+
+class CommitSearchIndex:
+    """
+    Search index over the listed commits, built incrementally as pages arrive.
+    A query matches a commit when it occurs in the commit's text starting at a word boundary,
+    so "feat" finds "feature 2" and "#12" finds "pull request #12".
+    """
+
+    def __init__(self):
+        self.texts = []  # lowercased search text per record id
+        self.postings = {}  # word -> ids containing it
+        self.hashes = HashPrefixTrie()
+        self._sorted_words = None
+        self.last_query = ''
+        self.last_results = None
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, text):
+        """ Index one record's search text and return its id. """
+        record_id = len(self.texts)
+        text = text.lower()
+        self.texts.append(text)
+        for word in set(TOKEN_REGEX.findall(text)):
+            if FULL_HASH_REGEX.match(word):
+                self.hashes.add(word, record_id)
+            else:
+                self.postings.setdefault(word, []).append(record_id)
+        self._sorted_words = None
+        # Keep the cached result set complete so the next narrowing query can reuse it
+        if self.last_results is not None and (not self.last_query or self.matches(record_id, self.last_query)):
+            self.last_results.append(record_id)
+        return record_id
+
+    def matches(self, record_id, query):
+        """ True when query occurs in the record text at the start of a word. """
+        text = self.texts[record_id]
+        needs_boundary = query[0].isalnum() or query[0] == '_'
+        start = text.find(query)
+        while start != -1:
+            if not needs_boundary or start == 0 or not (text[start - 1].isalnum() or text[start - 1] == '_'):
+                return True
+            start = text.find(query, start + 1)
+        return False
+
+    def search(self, query):
+        """ Return the sorted ids of the records matching query. """
+        query = query.strip().lower()
+        if not query:
+            results = list(range(len(self.texts)))
+        elif TOKEN_REGEX.fullmatch(query) and len(query) <= self.hashes.depth:
+            # A single short word: the index lookups are already exact
+            results = self.candidates(query)
+        elif self.last_results is not None and self.last_query and query.startswith(self.last_query):
+            # Narrowing the previous query can only drop results
+            results = [record_id for record_id in self.last_results if self.matches(record_id, query)]
+        else:
+            results = [record_id for record_id in self.candidates(query) if self.matches(record_id, query)]
+
+        self.last_query = query
+        self.last_results = results
+        return results
+
+    def candidates(self, query):
+        """ Ids that may match: those with a word (or hash) starting with the query's first word. """
+        words = TOKEN_REGEX.findall(query)
+        if not words:
+            return range(len(self.texts))
+        first_word = words[0]
+
+        ids = set()
+        for word in self.wordsWithPrefix(first_word):
+            ids.update(self.postings[word])
+        if HASH_PREFIX_REGEX.match(first_word):
+            ids.update(self.hashes.find(first_word))
+        return sorted(ids)
+
+    def wordsWithPrefix(self, prefix):
+        if self._sorted_words is None:
+            self._sorted_words = sorted(self.postings)
+        start = bisect.bisect_left(self._sorted_words, prefix)
+        end = bisect.bisect_left(self._sorted_words, prefix + '\uffff')
+        return self._sorted_words[start:end]
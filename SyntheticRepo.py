@@ -0,0 +1,142 @@
+import os
+import random
+import shutil
+import subprocess
+from collections import namedtuple
+
+EPOCH = 1600000000
+AUTHORS = ['Ada Lovelace <ada@example.com>', 'Alan Turing <alan@example.com>', 'Grace Hopper <grace@example.com>',
+           'Linus Torvalds <linus@example.com>', 'Margaret Hamilton <margaret@example.com>']
+WORDS = ['parse', 'render', 'cache', 'index', 'fetch', 'merge', 'branch', 'commit', 'diff', 'patch', 'token',
+         'stream', 'buffer', 'worker', 'queue', 'config', 'search', 'filter', 'model', 'view']
+
+RepoSpec = namedtuple('RepoSpec', ['commits', 'merge_ratio', 'branches', 'files', 'files_per_commit', 'diff_lines',
+                                   'pr_commits', 'seed'],
+                      defaults=[2000, 0.3, 20, 200, 3, 20, 2, 1])
+SyntheticRepo = namedtuple('SyntheticRepo', ['origin_dir', 'work_dir', 'spec'])
+# Part of the directory name; bumped when the same spec generates a different history
+LAYOUT_VERSION = 2
+
+
+def spec_name(spec):
+    """ Directory name identifying a spec, so generated repositories can be reused. """
+    return (f"c{spec.commits}-m{spec.merge_ratio}-b{spec.branches}-f{spec.files}-fc{spec.files_per_commit}"
+            f"-d{spec.diff_lines}-p{spec.pr_commits}-s{spec.seed}-v{LAYOUT_VERSION}")
+
+
+class _FastImportWriter:
+    """ Generates the history of a RepoSpec as a `git fast-import` stream. """
+
+    def __init__(self, spec, stream):
+        self.spec = spec
+        self.stream = stream
+        self.random = random.Random(spec.seed)
+        self.mark = 0
+        self.time = EPOCH
+        self.contents = {}  # path -> list of lines on main
+        self.pr_number = 0
+
+    def write(self, text):
+        self.stream.write(text.encode('utf-8') if isinstance(text, str) else text)
+
+    def data(self, payload):
+        payload = payload.encode('utf-8')
+        self.write(f'data {len(payload)}\n')
+        self.write(payload)
+        self.write('\n')
+
+    def line(self):
+        words = self.random.choices(WORDS, k=self.random.randint(2, 6))
+        return f"    {'_'.join(words[:2])}({', '.join(words[2:])})  # {self.random.randint(0, 10 ** 6)}\n"
+
+    def changeFile(self, contents, path):
+        """ Replace (or add) diff_lines lines of a file, returning its new content. """
+        lines = contents.setdefault(path, [f'def {path.replace("/", "_").replace(".", "_")}():\n'])
+        start = self.random.randint(1, max(1, len(lines)))
+        removed = self.random.randint(0, min(self.spec.diff_lines // 2, len(lines) - start))
+        lines[start:start + removed] = [self.line() for _ in range(self.spec.diff_lines)]
+        return ''.join(lines)
+
+    def commit(self, ref, message, changes, parent=None, merge=None):
+        self.mark += 1
+        self.time += self.random.randint(60, 3600)
+        author = self.random.choice(AUTHORS)
+        self.write(f'commit {ref}\nmark :{self.mark}\n')
+        self.write(f'author {author} {self.time} +0000\ncommitter {author} {self.time} +0000\n')
+        self.data(message)
+        if parent is not None:
+            self.write(f'from :{parent}\n')
+        if merge is not None:
+            self.write(f'merge :{merge}\n')
+        for path, content in changes:
+            self.write(f'M 100644 inline {path}\n')
+            self.data(content)
+        self.write('\n')
+        return self.mark
+
+    def mainCommitChanges(self):
+        paths = self.random.sample(range(self.spec.files), min(self.spec.files_per_commit, self.spec.files))
+        return [(f'src/module_{index}.py', self.changeFile(self.contents, f'src/module_{index}.py'))
+                for index in paths]
+
+    def featureBranch(self, ref, base, commits):
+        """ Commits on a branch touching its own files; returns (tip mark, final file contents). """
+        self.pr_number += 1
+        contents = {}
+        tip = base
+        for step in range(commits):
+            paths = [f'features/pr_{self.pr_number}/part_{index}.py'
+                     for index in range(max(1, self.spec.files_per_commit))]
+            changes = [(path, self.changeFile(contents, path)) for path in paths]
+            tip = self.commit(ref, f"{self.random.choice(WORDS)} {self.random.choice(WORDS)} step {step + 1}",
+                              changes, parent=tip)
+        return tip, {path: ''.join(lines) for path, lines in contents.items()}
+
+    def run(self):
+        spec = self.spec
+        main_tip = self.commit('refs/heads/main', 'Initial commit',
+                               [(f'src/module_{index}.py', self.changeFile(self.contents, f'src/module_{index}.py'))
+                                for index in range(spec.files)])
+        main_commits = [main_tip]
+        for _ in range(spec.commits - 1):
+            if self.random.random() < spec.merge_ratio:
+                tip, files = self.featureBranch(f'refs/heads/feature/{self.pr_number + 1}', main_tip,
+                                                spec.pr_commits)
+                main_tip = self.commit('refs/heads/main',
+                                       f"Merge pull request #{self.pr_number} from feature/{self.pr_number}",
+                                       sorted(files.items()), parent=main_tip, merge=tip)
+            else:
+                main_tip = self.commit('refs/heads/main', f"{self.random.choice(WORDS)} {self.random.choice(WORDS)}",
+                                       self.mainCommitChanges(), parent=main_tip)
+            main_commits.append(main_tip)
+        # Open branches, forked from random (seeded) points of main, so their merge-bases lie at
+        # varying depths and they are behind main by varying counts
+        for branch in range(spec.branches):
+            self.featureBranch(f'refs/heads/open/{branch + 1}', self.random.choice(main_commits), spec.pr_commits)
+        self.write('done\n')
+
+
+def generate_repo(spec, root_dir, reuse=True):
+    """
+    Create a bare "origin" with the synthetic history of spec and a clone of it to work in, under
+    root_dir/<spec name>. An existing complete repository for the same spec is reused.
+    """
+    base_dir = os.path.join(root_dir, spec_name(spec))
+    origin_dir = os.path.join(base_dir, 'origin.git')
+    work_dir = os.path.join(base_dir, 'work')
+    if reuse and os.path.isdir(os.path.join(work_dir, '.git')):
+        return SyntheticRepo(origin_dir, work_dir, spec)
+
+    shutil.rmtree(base_dir, ignore_errors=True)
+    os.makedirs(base_dir)
+    subprocess.run(['git', 'init', '-q', '--bare', '-b', 'main', origin_dir], check=True)
+    importer = subprocess.Popen(['git', 'fast-import', '--quiet', '--done'], cwd=origin_dir, stdin=subprocess.PIPE)
+    try:
+        _FastImportWriter(spec, importer.stdin).run()
+    finally:
+        importer.stdin.close()
+        importer.wait()
+    if importer.returncode != 0:
+        raise subprocess.CalledProcessError(importer.returncode, 'git fast-import')
+    subprocess.run(['git', 'clone', '-q', origin_dir, work_dir], check=True)
+    return SyntheticRepo(origin_dir, work_dir, spec)
@@ -0,0 +1,111 @@
+import subprocess
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from GitProcess import CancelToken, GitCancelled
+
+
+class TaskSignals(QObject):
+    """ Signals a GitTask emits; they are delivered on the GUI thread. """
+    progress = pyqtSignal(str)
+    partial = pyqtSignal(object)
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()
+
+
+class GitTask(QRunnable):
+    """
+    Runs fn(task, *args, **kwargs) on a pool thread. The function can report progress,
+    publish partial results and must pass task.token to every git call so it can be cancelled.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.token = CancelToken()
+        self.signals = TaskSignals()
+        self.owner = None
+
+    def run(self):
+        try:
+            result = self.fn(self, *self.args, **self.kwargs)
+            self.token.raise_if_cancelled()
+        except GitCancelled:
+            self.signals.cancelled.emit()
+        except subprocess.CalledProcessError as e:
+            if self.token.is_cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.error.emit((e.stderr or str(e)).strip())
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+    def report(self, message):
+        self.signals.progress.emit(message)
+
+    def publish(self, value):
+        self.signals.partial.emit(value)
+
+    def cancel(self):
+        self.token.cancel()
+
+    @property
+    def is_cancelled(self):
+        return self.token.is_cancelled
+
+
+class TaskRunner(QObject):
+    """ Executes GitTasks on a thread pool and keeps track of the ones in flight. """
+    activeCountChanged = pyqtSignal(int)
+
+    def __init__(self, max_threads=None, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        if max_threads:
+            self.pool.setMaxThreadCount(max_threads)
+        self.active_tasks = set()
+
+    def submit(self, fn, *args, owner=None, on_result=None, on_error=None, on_progress=None, on_partial=None,
+               on_cancelled=None, on_finished=None, **kwargs):
+        """
+        Queue fn for background execution and return its GitTask.
+        owner groups tasks (usually the widget that started them) for activeCount/cancelAll.
+        """
+        task = GitTask(fn, *args, **kwargs)
+        task.owner = owner
+        # Bookkeeping first, so on_finished slots already see the updated active count
+        task.signals.finished.connect(lambda: self._taskFinished(task))
+        for signal, slot in ((task.signals.result, on_result), (task.signals.error, on_error),
+                             (task.signals.progress, on_progress), (task.signals.partial, on_partial),
+                             (task.signals.cancelled, on_cancelled), (task.signals.finished, on_finished)):
+            if slot is not None:
+                signal.connect(slot)
+
+        self.active_tasks.add(task)
+        self.activeCountChanged.emit(len(self.active_tasks))
+        self.pool.start(task)
+        return task
+
+    def isActive(self, task):
+        return task in self.active_tasks
+
+    def activeCount(self, owner=None):
+        return sum(1 for task in self.active_tasks if owner is None or task.owner is owner)
+
+    def cancelAll(self, owner=None):
+        for task in list(self.active_tasks):
+            if owner is None or task.owner is owner:
+                task.cancel()
+
+    def _taskFinished(self, task):
+        self.active_tasks.discard(task)
+        self.activeCountChanged.emit(len(self.active_tasks))
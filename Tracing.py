@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+# Spans kept for the Performance panel and trace exports; older ones are dropped
+DEFAULT_CAPACITY = 5000
+
+CATEGORY_GIT = 'git'
+CATEGORY_UI = 'ui'
+CATEGORY_IO = 'io'
+
+# A timed section of work: start is a time.perf_counter() value, duration in seconds.
+# args holds what the span measured, e.g. bytes, returncode, rows.
+Span = namedtuple('Span', ['name', 'category', 'start', 'duration', 'thread', 'args'])
+
+
+class OpenSpan:
+    """ A span started by Tracer.begin, for work that does not fit a with block (streamed processes). """
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.thread = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.ended = False
+
+    def end(self, **args):
+        if self.ended:
+            return
+        self.ended = True
+        self.args.update(args)
+        self.tracer.add(Span(self.name, self.category, self.start, time.perf_counter() - self.start, self.thread,
+                             self.args))
+
+
+class Tracer:
+    """
+    Lightweight tracing of the hot paths: every git process and UI population step records a span
+    into a bounded ring buffer. Recording is a deque append under a lock, cheap enough to stay on.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.spans = deque(maxlen=capacity)
+        self.enabled = True
+        self.generation = 0  # bumped per recorded span, so views can tell when to refresh
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+            self.generation += 1
+
+    def record(self, name, category, started, /, **args):
+        """ Record a span from started (a time.perf_counter() value) until now. """
+        if self.enabled:
+            self.add(Span(name, category, started, time.perf_counter() - started, threading.current_thread().name,
+                          args))
+
+    def begin(self, name, category, /, **args):
+        """ Start a span that is recorded when its end() is called; None while tracing is disabled. """
+        return OpenSpan(self, name, category, args) if self.enabled else None
+
+    @contextmanager
+    def span(self, name, category=CATEGORY_UI, /, **args):
+        """ Time a with block. The yielded dict can be filled with what the block measured. """
+        if not self.enabled:
+            yield args
+            return
+        started = time.perf_counter()
+        try:
+            yield args
+        except BaseException as error:
+            args['error'] = type(error).__name__
+            raise
+        finally:
+            self.record(name, category, started, **args)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.spans), self.generation
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+            self.generation += 1
+
+    def summary(self, spans=None):
+        """ {category: (span count, total seconds)} over spans (default: the whole buffer). """
+        if spans is None:
+            spans, _ = self.snapshot()
+        totals = {}
+        for span in spans:
+            count, total = totals.get(span.category, (0, 0.0))
+            totals[span.category] = (count + 1, total + span.duration)
+        return totals
+
+    def chromeTrace(self):
+        """ The buffered spans as a Chrome trace-format object (chrome://tracing, Perfetto). """
+        spans, _ = self.snapshot()
+        pid = os.getpid()
+        thread_ids = {}
+        events = []
+        for span in spans:
+            if span.thread not in thread_ids:
+                thread_ids[span.thread] = len(thread_ids) + 1
+                events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_ids[span.thread],
+                               'args': {'name': span.thread}})
+            events.append({'name': span.name, 'cat': span.category, 'ph': 'X', 'pid': pid,
+                           'tid': thread_ids[span.thread], 'ts': round(span.start * 1e6, 1),
+                           'dur': round(span.duration * 1e6, 1), 'args': span.args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def exportChromeTrace(self, path):
+        with open(path, 'w') as trace_file:
+            json.dump(self.chromeTrace(), trace_file)
+        return path
+
+
+TRACER = Tracer()
+
+
+def describe_span(span):
+    """ Short text of what a span measured, for the Performance panel. """
+    parts = []
+    if 'bytes' in span.args:
+        parts.append(f"{span.args['bytes'] / 1024:.1f} KB")
+    if 'returncode' in span.args:
+        parts.append(f"rc={span.args['returncode']}")
+    parts.extend(f"{key}={value}" for key, value in span.args.items()
+                 if key not in ('bytes', 'returncode', 'command'))
+    return ', '.join(parts)
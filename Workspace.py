@@ -0,0 +1,245 @@
+# Multi-repository workspaces: a set of repositories, each with its own base branch and output
+# directory, on which list/diff operations run concurrently in a process pool. Like
+# DiffExtractorCore this must not import Qt; worker processes import it on start.
+import json
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from CommitIndex import FILTER_PRS
+from DiffExtractorCore import diff_branch, fetch_origin, list_commits
+from DiffOutputPipeline import COMPRESSION_NONE
+from GitProcess import CancelToken, GitCancelled
+
+OPERATION_LIST = 'list'
+OPERATION_DIFF = 'diff'
+OPERATIONS = [OPERATION_LIST, OPERATION_DIFF]
+INDEX_FILE_NAME = 'workspace_index.json'
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+STATUS_CANCELLED = 'cancelled'
+# How often workers look at the shared cancel flag, and the parent at progress messages
+CANCEL_POLL_SECONDS = 0.2
+POLL_SECONDS = 0.1
+
+WorkspaceRepo = namedtuple('WorkspaceRepo', ['name', 'repo_dir', 'base_branch', 'output_dir'])
+# Outcome of one repository: outputs are the files written, summary a small dict of counts
+RepoResult = namedtuple('RepoResult', ['name', 'repo_dir', 'status', 'elapsed', 'outputs', 'summary', 'error'])
+WorkspaceRun = namedtuple('WorkspaceRun', ['results', 'index_path', 'elapsed'])
+
+
+class Workspace:
+    """ The repositories of a workspace file, plus the directory the aggregated index goes to. """
+
+    def __init__(self, repos=(), output_dir='', path=None):
+        self.repos = list(repos)
+        self.output_dir = output_dir
+        self.path = path
+
+    @classmethod
+    def load(cls, path):
+        """ Read a workspace file. Relative paths in it are relative to the file. """
+        with open(path) as workspace_file:
+            data = json.load(workspace_file)
+        base_dir = os.path.dirname(os.path.abspath(path))
+        output_dir = os.path.join(base_dir, data.get('output_dir') or 'workspace_output')
+        repos = []
+        for entry in data.get('repos', []):
+            repo_dir = os.path.join(base_dir, entry['path'])
+            name = entry.get('name') or os.path.basename(os.path.normpath(repo_dir))
+            repo_output_dir = os.path.join(base_dir, entry.get('output_dir') or os.path.join(output_dir, name))
+            repos.append(WorkspaceRepo(name, repo_dir, entry.get('base_branch') or 'main', repo_output_dir))
+        return cls(repos, output_dir, path)
+
+    def save(self, path=None):
+        """ Atomically write the workspace file. """
+        self.path = path or self.path
+        data = {
+            'output_dir': self.output_dir,
+            'repos': [{'name': repo.name, 'path': repo.repo_dir, 'base_branch': repo.base_branch,
+                       'output_dir': repo.output_dir} for repo in self.repos],
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', delete=False, dir=directory) as temp_file:
+            json.dump(data, temp_file, indent=4)
+        os.replace(temp_file.name, self.path)
+
+    def addRepo(self, repo_dir, base_branch='main', output_dir=None, name=None):
+        name = name or os.path.basename(os.path.normpath(repo_dir))
+        taken = {repo.name for repo in self.repos}
+        unique_name, number = name, 2
+        while unique_name in taken:
+            unique_name = f'{name}-{number}'
+            number += 1
+        repo = WorkspaceRepo(unique_name, repo_dir, base_branch,
+                             output_dir or os.path.join(self.output_dir, unique_name))
+        self.repos.append(repo)
+        return repo
+
+
+def _watch_cancel(cancel_event, token, finished):
+    """ Worker thread: cancel the repository's token (killing its git processes) when the run is cancelled. """
+    while not finished.is_set():
+        if cancel_event.wait(CANCEL_POLL_SECONDS):
+            token.cancel()
+            return
+
+
+def _list_repo(repo, options, token, progress):
+    if options.get('fetch'):
+        fetch_origin(repo.repo_dir, token, progress)
+    path = os.path.join(repo.output_dir, 'commits.json')
+    count = 0
+    # Written next to the target and renamed, so a failed run leaves no half-written list
+    with tempfile.NamedTemporaryFile('w', delete=False, dir=repo.output_dir, suffix='.tmp') as output_file:
+        try:
+            output_file.write('[\n')
+            for record in list_commits(repo.repo_dir, options.get('filter', FILTER_PRS), options.get('index_dir'),
+                                       token, progress):
+                output_file.write((',\n' if count else '') + json.dumps(record._asdict()))
+                count += 1
+            output_file.write('\n]\n')
+        except BaseException:
+            output_file.close()
+            os.remove(output_file.name)
+            raise
+    os.replace(output_file.name, path)
+    return [path], {'commits': count}
+
+
+def _diff_repo(repo, options, token, progress):
+    branch_diff = diff_branch(repo.repo_dir, options['branch'], repo.base_branch, repo.output_dir,
+                              compression=options.get('compression', COMPRESSION_NONE),
+                              max_bytes=options.get('max_bytes'), fetch=options.get('fetch', True),
+                              pathspecs=options.get('pathspecs', ()), chunk_bytes=options.get('chunk_bytes'),
+                              incremental=options.get('incremental', False), index_dir=options.get('index_dir'),
+                              diff_options=options.get('diff_options', {}).get(repo.name), token=token,
+                              progress=progress)
+    stats = branch_diff.stats
+    return [stats.path], {'merge_base': branch_diff.merge_base, 'tip': branch_diff.tip, 'mode': branch_diff.mode,
+                          'since': branch_diff.since, 'previous': branch_diff.previous,
+                          'bytes_written': stats.bytes_written, 'truncated': stats.truncated}
+
+
+def run_repo(repo, operation, options, messages=None, cancel_event=None):
+    """ Run one operation on one repository (in a pool process). Never raises; returns a RepoResult. """
+    started = time.perf_counter()
+    token = CancelToken()
+    finished = threading.Event()
+    if cancel_event is not None:
+        threading.Thread(target=_watch_cancel, args=(cancel_event, token, finished), daemon=True).start()
+
+    def progress(message):
+        if messages is not None:
+            messages.put((repo.name, message))
+
+    try:
+        if not os.path.isdir(repo.repo_dir):
+            raise ValueError(f"Repository directory does not exist: {repo.repo_dir}")
+        os.makedirs(repo.output_dir, exist_ok=True)
+        run = _list_repo if operation == OPERATION_LIST else _diff_repo
+        outputs, summary = run(repo, options, token, progress)
+        status, error = STATUS_OK, None
+    except GitCancelled:
+        outputs, summary, status, error = [], {}, STATUS_CANCELLED, None
+    except Exception as e:
+        outputs, summary = [], {}
+        status = STATUS_CANCELLED if token.is_cancelled else STATUS_ERROR
+        error = None if token.is_cancelled else (getattr(e, 'stderr', None) or str(e) or traceback.format_exc())
+        error = error.strip() if isinstance(error, str) else error
+    finally:
+        finished.set()
+    progress("Cancelled." if status == STATUS_CANCELLED else (f"Error: {error}" if error else "Done."))
+    return RepoResult(repo.name, repo.repo_dir, status, time.perf_counter() - started, outputs, summary, error)
+
+
+def _drain(messages, progress):
+    """ Pass on the progress messages workers queued so far. """
+    try:
+        while True:
+            progress(*messages.get_nowait())
+    except queue.Empty:
+        pass
+
+
+def write_workspace_index(workspace, operation, options, results, elapsed):
+    """ One JSON index over every repository's results. """
+    os.makedirs(workspace.output_dir, exist_ok=True)
+    index_path = os.path.join(workspace.output_dir, INDEX_FILE_NAME)
+    repos = {repo.name: repo for repo in workspace.repos}
+    index = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'operation': operation,
+        'options': {key: value for key, value in options.items()
+                    if key in ('filter', 'branch', 'compression', 'incremental')},
+        'elapsed': round(elapsed, 3),
+        'repos': [dict(result._asdict(), base_branch=repos[result.name].base_branch,
+                       output_dir=repos[result.name].output_dir, elapsed=round(result.elapsed, 3))
+                  for result in results],
+    }
+    with tempfile.NamedTemporaryFile('w', delete=False, dir=workspace.output_dir) as temp_file:
+        json.dump(index, temp_file, indent=2)
+    os.replace(temp_file.name, index_path)
+    return index_path
+
+
+def run_workspace(workspace, operation, options, max_workers=None, progress=None, token=None, on_result=None):
+    """
+    Run operation on every repository of the workspace concurrently, one repository per pool
+    process (each process works on its own repository, so nothing depends on a process cwd).
+    progress(name, message) receives per-repository progress, on_result(RepoResult) each result as
+    it finishes. Cancelling token stops the queued repositories and kills the running git processes.
+    Returns a WorkspaceRun; the aggregated index lists the repositories in workspace order.
+    """
+    progress = progress or (lambda name, message: None)
+    started = time.perf_counter()
+    if operation == OPERATION_DIFF and not options.get('branch'):
+        raise ValueError("The diff operation needs a branch to diff against each repository's base branch.")
+    if not workspace.repos:
+        raise ValueError("The workspace has no repositories.")
+
+    max_workers = min(max_workers or os.cpu_count() or 4, len(workspace.repos))
+    # Spawned workers: forking a process that runs Qt or other threads is not safe
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    with context.Manager() as manager:
+        messages = manager.Queue()
+        cancel_event = manager.Event()
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            futures = {executor.submit(run_repo, repo, operation, options, messages, cancel_event): repo
+                       for repo in workspace.repos}
+            for repo in workspace.repos:
+                progress(repo.name, "Queued.")
+            pending = set(futures)
+            while pending:
+                if token is not None and token.is_cancelled and not cancel_event.is_set():
+                    cancel_event.set()
+                    for future in pending:
+                        future.cancel()
+                done, pending = wait(pending, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+                _drain(messages, progress)
+                for future in done:
+                    repo = futures[future]
+                    if future.cancelled():
+                        result = RepoResult(repo.name, repo.repo_dir, STATUS_CANCELLED, 0.0, [], {}, None)
+                        progress(repo.name, "Cancelled.")
+                    else:
+                        result = future.result()
+                    results[repo.name] = result
+                    if on_result is not None:
+                        on_result(result)
+        _drain(messages, progress)
+
+    ordered = [results[repo.name] for repo in workspace.repos]
+    elapsed = time.perf_counter() - started
+    index_path = write_workspace_index(workspace, operation, options, ordered, elapsed)
+    if token is not None:
+        token.raise_if_cancelled()
+    return WorkspaceRun(ordered, index_path, elapsed)
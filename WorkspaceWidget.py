@@ -0,0 +1,279 @@
+import os
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QComboBox, QCheckBox,
+                             QSpinBox, QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog, QMessageBox)
+
+from CommitIndex import FILTER_ALL, FILTER_MERGES, FILTER_PRS
+from ConfigManager import ConfigManager
+from OutputOptionsWidget import OutputOptionsWidget
+from PathFilterWidget import PathFilterWidget
+from TaskRunner import TaskRunner
+from Workspace import OPERATION_DIFF, OPERATION_LIST, STATUS_OK, Workspace, run_workspace
+
+COLUMN_NAME = 0
+COLUMN_REPO = 1
+COLUMN_BASE = 2
+COLUMN_OUTPUT = 3
+COLUMN_STATUS = 4
+HEADERS = ['Name', 'Repository', 'Base Branch', 'Output Dir', 'Status']
+WORKSPACE_FILTER = "Workspaces (*.json);;All files (*)"
+
+
+class WorkspaceWidget(QWidget):
+    """
+    Several repositories, each with its own base branch and output directory. List and diff
+    operations run on all of them at once in a process pool, with a status per repository and
+    one aggregated index.
+    """
+
+    def __init__(self, task_runner=None, config_manager=None, open_file=None, parent=None):
+        super().__init__(parent)
+        self.config_manager = config_manager or ConfigManager.shared()
+        self.task_runner = task_runner or TaskRunner(parent=self)
+        self.open_file = open_file
+        self.workspace = Workspace(output_dir=os.path.join(self.config_manager.get_config_dir(), 'workspace_output'))
+        self.index_path = None
+        self.updating_table = False
+
+        layout = QVBoxLayout(self)
+        file_layout = QHBoxLayout()
+        self.file_label = QLabel('Unsaved workspace', self)
+        file_layout.addWidget(self.file_label, 1)
+        for text, slot in (('New', self.newWorkspace), ('Open...', self.openWorkspaceDialog),
+                           ('Save', self.saveWorkspace), ('Save As...', self.saveWorkspaceAs)):
+            button = QPushButton(text, self)
+            button.clicked.connect(slot)
+            file_layout.addWidget(button)
+        layout.addLayout(file_layout)
+
+        output_layout = QHBoxLayout()
+        output_layout.addWidget(QLabel('Index Directory:', self))
+        self.output_input = QLineEdit(self)
+        self.output_input.editingFinished.connect(self.updateOutputDir)
+        output_layout.addWidget(self.output_input)
+        layout.addLayout(output_layout)
+
+        self.repo_table = QTableWidget(0, len(HEADERS), self)
+        self.repo_table.setHorizontalHeaderLabels(HEADERS)
+        self.repo_table.verticalHeader().setVisible(False)
+        self.repo_table.horizontalHeader().setSectionResizeMode(COLUMN_STATUS, QHeaderView.Stretch)
+        self.repo_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.repo_table.cellChanged.connect(self.onCellChanged)
+        layout.addWidget(self.repo_table)
+
+        repo_buttons = QHBoxLayout()
+        self.add_button = QPushButton('Add Repository...', self)
+        self.add_button.clicked.connect(self.addRepository)
+        repo_buttons.addWidget(self.add_button)
+        self.remove_button = QPushButton('Remove Selected', self)
+        self.remove_button.clicked.connect(self.removeSelected)
+        repo_buttons.addWidget(self.remove_button)
+        repo_buttons.addStretch(1)
+        layout.addLayout(repo_buttons)
+
+        operation_layout = QHBoxLayout()
+        self.operation_combo = QComboBox(self)
+        self.operation_combo.addItem('List commits', OPERATION_LIST)
+        self.operation_combo.addItem('Diff branch against base', OPERATION_DIFF)
+        self.operation_combo.currentIndexChanged.connect(self.updateOperationInputs)
+        operation_layout.addWidget(self.operation_combo)
+        self.filter_combo = QComboBox(self)
+        for label, list_filter in (('Pull requests', FILTER_PRS), ('Merges', FILTER_MERGES), ('All', FILTER_ALL)):
+            self.filter_combo.addItem(label, list_filter)
+        operation_layout.addWidget(self.filter_combo)
+        self.branch_input = QLineEdit(self)
+        self.branch_input.setPlaceholderText('Branch to diff, e.g. release/2024c')
+        operation_layout.addWidget(self.branch_input, 1)
+        self.fetch_checkbox = QCheckBox('Fetch', self)
+        self.fetch_checkbox.setChecked(True)
+        operation_layout.addWidget(self.fetch_checkbox)
+        self.incremental_checkbox = QCheckBox('Only New Commits', self)
+        self.incremental_checkbox.setToolTip("Diff only what was pushed since each repository's last extraction")
+        self.incremental_checkbox.setChecked(self.config_manager.get_incremental_branch_diffs())
+        self.incremental_checkbox.toggled.connect(self.config_manager.set_incremental_branch_diffs)
+        operation_layout.addWidget(self.incremental_checkbox)
+        operation_layout.addWidget(QLabel('Processes:', self))
+        self.workers_spin = QSpinBox(self)
+        self.workers_spin.setRange(1, 64)
+        self.workers_spin.setValue(min(os.cpu_count() or 4, 8))
+        operation_layout.addWidget(self.workers_spin)
+        layout.addLayout(operation_layout)
+
+        self.output_options = OutputOptionsWidget(self.config_manager, self)
+        layout.addWidget(self.output_options)
+        self.path_filter = PathFilterWidget(self.config_manager, self)
+        layout.addWidget(self.path_filter)
+
+        run_layout = QHBoxLayout()
+        self.run_button = QPushButton('Run on All Repositories', self)
+        self.run_button.clicked.connect(self.runWorkspace)
+        run_layout.addWidget(self.run_button, 1)
+        self.index_button = QPushButton('Open Index', self)
+        self.index_button.setEnabled(False)
+        self.index_button.clicked.connect(lambda: self.openIndex())
+        run_layout.addWidget(self.index_button)
+        self.cancel_button = QPushButton('Cancel', self)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(lambda: self.task_runner.cancelAll(self))
+        run_layout.addWidget(self.cancel_button)
+        layout.addLayout(run_layout)
+        self.status_label = QLabel('Ready.', self)
+        layout.addWidget(self.status_label)
+
+        self.updateOperationInputs()
+        last_file = self.config_manager.get_workspace_file()
+        if last_file and os.path.exists(last_file):
+            self.openWorkspace(last_file)
+        else:
+            self.showWorkspace()
+
+    def updateOperationInputs(self):
+        diff = self.operation_combo.currentData() == OPERATION_DIFF
+        self.branch_input.setEnabled(diff)
+        self.incremental_checkbox.setEnabled(diff)
+        self.filter_combo.setEnabled(not diff)
+
+    def showWorkspace(self):
+        self.updating_table = True
+        self.file_label.setText(self.workspace.path or 'Unsaved workspace')
+        self.output_input.setText(self.workspace.output_dir)
+        self.repo_table.setRowCount(len(self.workspace.repos))
+        for row, repo in enumerate(self.workspace.repos):
+            self.setRow(row, repo)
+        self.repo_table.resizeColumnsToContents()
+        self.updating_table = False
+
+    def setRow(self, row, repo):
+        for column, value in ((COLUMN_NAME, repo.name), (COLUMN_REPO, repo.repo_dir), (COLUMN_BASE, repo.base_branch),
+                              (COLUMN_OUTPUT, repo.output_dir), (COLUMN_STATUS, '')):
+            item = QTableWidgetItem(value)
+            if column in (COLUMN_REPO, COLUMN_STATUS):
+                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+            self.repo_table.setItem(row, column, item)
+
+    def onCellChanged(self, row, column):
+        if self.updating_table or row >= len(self.workspace.repos):
+            return
+        value = self.repo_table.item(row, column).text().strip()
+        field = {COLUMN_NAME: 'name', COLUMN_BASE: 'base_branch', COLUMN_OUTPUT: 'output_dir'}.get(column)
+        if field and value:
+            self.workspace.repos[row] = self.workspace.repos[row]._replace(**{field: value})
+
+    def updateOutputDir(self):
+        self.workspace.output_dir = self.output_input.text().strip()
+
+    def newWorkspace(self):
+        self.workspace = Workspace(output_dir=self.workspace.output_dir)
+        self.showWorkspace()
+
+    def openWorkspaceDialog(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Workspace", os.path.dirname(self.workspace.path or ''),
+                                              WORKSPACE_FILTER)
+        if path:
+            self.openWorkspace(path)
+
+    def openWorkspace(self, path):
+        try:
+            self.workspace = Workspace.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.critical(self, "Error", f"Unable to open workspace {path}: {e}")
+            return
+        self.config_manager.set_workspace_file(path)
+        self.showWorkspace()
+
+    def saveWorkspace(self):
+        if not self.workspace.path:
+            return self.saveWorkspaceAs()
+        try:
+            self.workspace.save()
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Unable to save workspace: {e}")
+            return False
+        self.config_manager.set_workspace_file(self.workspace.path)
+        self.file_label.setText(self.workspace.path)
+        return True
+
+    def saveWorkspaceAs(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Workspace", 'workspace.json', WORKSPACE_FILTER)
+        if not path:
+            return False
+        self.workspace.path = path
+        return self.saveWorkspace()
+
+    def addRepository(self):
+        directory = QFileDialog.getExistingDirectory(self, "Select Repository Directory")
+        if directory:
+            self.workspace.addRepo(directory, self.config_manager.get_origin_branch() or 'main')
+            self.showWorkspace()
+
+    def removeSelected(self):
+        rows = sorted({index.row() for index in self.repo_table.selectedIndexes()}, reverse=True)
+        for row in rows:
+            del self.workspace.repos[row]
+        self.showWorkspace()
+
+    def runWorkspace(self):
+        operation = self.operation_combo.currentData()
+        if not self.workspace.repos:
+            QMessageBox.warning(self, "Input Error", "Add at least one repository to the workspace.")
+            return
+        if operation == OPERATION_DIFF and not self.branch_input.text().strip():
+            QMessageBox.warning(self, "Input Error", "Enter the branch to diff against each base branch.")
+            return
+        if self.workspace.path:
+            self.saveWorkspace()
+
+        options = {
+            'filter': self.filter_combo.currentData(), 'index_dir': self.config_manager.get_config_dir(),
+            'fetch': self.fetch_checkbox.isChecked(), 'branch': self.branch_input.text().strip(),
+            'compression': self.output_options.compression(), 'max_bytes': self.output_options.maxBytes(),
+            'pathspecs': self.path_filter.pathspecs(), 'chunk_bytes': self.output_options.chunkBytes(),
+            'incremental': self.incremental_checkbox.isChecked(),
+            # Each repository is diffed with its own stored diff options
+            'diff_options': {repo.name: self.config_manager.get_repo_diff_options(repo.repo_dir)
+                             for repo in self.workspace.repos},
+        }
+        for row in range(self.repo_table.rowCount()):
+            self.repo_table.item(row, COLUMN_STATUS).setText('')
+        self.run_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.status_label.setText(f"Running on {len(self.workspace.repos)} repositories...")
+        self.task_runner.submit(self.workspaceTask, self.workspace, operation, options, self.workers_spin.value(),
+                                owner=self, on_partial=self.onRepoProgress, on_result=self.onWorkspaceDone,
+                                on_error=lambda message: QMessageBox.critical(self, "Error",
+                                                                              f"An error occurred: {message}"),
+                                on_cancelled=lambda: self.status_label.setText("Cancelled."),
+                                on_finished=self.onTaskFinished)
+
+    @staticmethod
+    def workspaceTask(task, workspace, operation, options, workers):
+        """ Worker: drive the process pool, publishing (repository name, message) as they come in. """
+        return run_workspace(workspace, operation, options, workers, token=task.token,
+                             progress=lambda name, message: task.publish((name, message)))
+
+    def onRepoProgress(self, value):
+        name, message = value
+        for row, repo in enumerate(self.workspace.repos):
+            if repo.name == name:
+                item = self.repo_table.item(row, COLUMN_STATUS)
+                item.setText(message.splitlines()[0] if message else '')
+                item.setToolTip(message)
+
+    def onWorkspaceDone(self, run):
+        self.index_path = run.index_path
+        self.index_button.setEnabled(True)
+        failed = [result for result in run.results if result.status != STATUS_OK]
+        self.status_label.setText(f"{len(run.results) - len(failed)} of {len(run.results)} repositories done in "
+                                  f"{run.elapsed:.1f}s. Index: {run.index_path}")
+        if failed:
+            QMessageBox.warning(self, "Workspace", "\n".join(f"{result.name}: {result.error or result.status}"
+                                                             for result in failed))
+
+    def onTaskFinished(self):
+        self.run_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+
+    def openIndex(self):
+        if self.index_path and self.open_file is not None:
+            self.open_file(self.index_path)
@@ -0,0 +1,350 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+from SyntheticRepo import RepoSpec, generate_repo
+
+DEFAULT_OPERATIONS = ['list_prs', 'list_prs_warm', 'display_prs', 'search_prs', 'generate_diff',
+                      'generate_diff_cached', 'pr_diffs', 'branch_diff']
+SEARCH_QUERIES = ['merge pull request #1', 'feature/2', 'step', 'ada', 'cache index']
+
+
+class SubprocessCounter:
+    """ Counts the processes started through subprocess.Popen, per command (e.g. "git diff"). """
+
+    def __init__(self):
+        self.commands = Counter()
+        self._lock = threading.Lock()
+        self._original_init = None
+
+    def install(self):
+        original_init = self._original_init = subprocess.Popen.__init__
+        counter = self
+
+        def counting_init(popen, args, *rest, **kwargs):
+            command = ' '.join(args[:2]) if isinstance(args, (list, tuple)) else str(args).split(' ', 1)[0]
+            with counter._lock:
+                counter.commands[command] += 1
+            original_init(popen, args, *rest, **kwargs)
+
+        subprocess.Popen.__init__ = counting_init
+
+    def uninstall(self):
+        if self._original_init is not None:
+            subprocess.Popen.__init__ = self._original_init
+
+    def reset(self):
+        with self._lock:
+            self.commands.clear()
+
+
+def peak_rss_mb(who):
+    """ Peak resident set size in MB of this process (RUSAGE_SELF) or its largest finished child. """
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+# Operations. Each takes (repo_dir, scratch_dir, options), does its untimed setup and returns the
+# callable to time, which returns a dict of counts describing what it processed.
+
+def setup_list_prs(repo_dir, scratch_dir, options, warm=False):
+    """ listPRs: stream the merge commits through the persistent commit index. """
+    from CommitIndex import FILTER_MERGES
+    from DiffExtractorCore import list_commits
+    index_dir = os.path.join(scratch_dir, 'index')
+
+    def run():
+        return {'records': sum(1 for _ in list_commits(repo_dir, FILTER_MERGES, index_dir))}
+
+    if warm:
+        run()
+    return run
+
+
+def setup_list_prs_warm(repo_dir, scratch_dir, options):
+    return setup_list_prs(repo_dir, scratch_dir, options, warm=True)
+
+
+def _merge_pages(repo_dir, scratch_dir):
+    from CommitIndex import FILTER_MERGES
+    from DiffExtractorCore import iter_commit_pages
+    return list(iter_commit_pages(repo_dir, FILTER_MERGES, os.path.join(scratch_dir, 'index')))
+
+
+def _output_dir(scratch_dir):
+    output_dir = os.path.join(scratch_dir, 'output')
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+
+def _search_text(record):
+    # Same text as GitDiffExtractor.searchText, without importing the widget
+    return f"{record.hash} {record.author} {record.subject}"
+
+
+def setup_display_prs(repo_dir, scratch_dir, options):
+    """ displayPRs: append the listed pages to the list model and the search index. """
+    from CommitListModel import CommitListModel
+    from SearchIndex import CommitSearchIndex
+    pages = _merge_pages(repo_dir, scratch_dir)
+
+    def run():
+        model = CommitListModel()
+        search_index = CommitSearchIndex()
+        for page in pages:
+            for record in page:
+                search_index.add(_search_text(record))
+            model.appendRecords(page)
+        return {'records': model.recordCount()}
+
+    return run
+
+
+def setup_search_prs(repo_dir, scratch_dir, options):
+    """ searchPRs: type each query one character at a time, searching after every keystroke. """
+    from SearchIndex import CommitSearchIndex
+    search_index = CommitSearchIndex()
+    for page in _merge_pages(repo_dir, scratch_dir):
+        for record in page:
+            search_index.add(_search_text(record))
+
+    def run():
+        searches = matches = 0
+        for query in SEARCH_QUERIES:
+            for end in range(1, len(query) + 1):
+                matches += len(search_index.search(query[:end]))
+                searches += 1
+        return {'searches': searches, 'matches': matches}
+
+    return run
+
+
+def setup_generate_diff(repo_dir, scratch_dir, options, warm=False):
+    """ generateDiff: diff the sampled merge commits in one batch, through the diff cache. """
+    from DiffCache import DiffCache
+    from DiffExtractorCore import diff_commit
+    cache = DiffCache(os.path.join(scratch_dir, 'cache'))
+    output_dir = _output_dir(scratch_dir)
+
+    def run():
+        diff_run = diff_commit(repo_dir, options['merges'], output_dir, cache=cache)
+        cache.save_index()
+        return {'diffs': len(diff_run.results),
+                'bytes': sum(result.stats.bytes_written for result in diff_run.results if result.stats)}
+
+    if warm:
+        run()
+    return run
+
+
+def setup_generate_diff_cached(repo_dir, scratch_dir, options):
+    return setup_generate_diff(repo_dir, scratch_dir, options, warm=True)
+
+
+def setup_pr_diffs(repo_dir, scratch_dir, options):
+    """ getPRDiffs: write the per-commit patches of the sampled PRs. """
+    from DiffExtractorCore import diff_pr
+    output_dir = _output_dir(scratch_dir)
+
+    def run():
+        patches = 0
+        for merge in options['merges'][:options['pr_count']]:
+            patches += len(diff_pr(repo_dir, merge, output_dir).results)
+        return {'prs': min(len(options['merges']), options['pr_count']), 'patches': patches}
+
+    return run
+
+
+def setup_branch_diff(repo_dir, scratch_dir, options):
+    """ getCommitsForBranch: fetch and diff the sampled open branches against main. """
+    from DiffExtractorCore import diff_branch
+    output_dir = _output_dir(scratch_dir)
+
+    def run():
+        for branch in options['branches']:
+            diff_branch(repo_dir, branch, 'main', output_dir)
+        return {'branches': len(options['branches'])}
+
+    return run
+
+
+OPERATIONS = {name: globals()[f'setup_{name}'] for name in DEFAULT_OPERATIONS}
+
+
+def run_operation(name, repo_dir, options):
+    """ Run one operation in this (fresh) process and return its measurements. """
+    counter = SubprocessCounter()
+    counter.install()
+    scratch_dir = tempfile.mkdtemp(prefix=f'bench_{name}_')
+    try:
+        try:
+            run = OPERATIONS[name](repo_dir, scratch_dir, options)
+        except ImportError as error:
+            return {'skipped': str(error)}
+        counter.reset()
+        setup_rss = peak_rss_mb(resource.RUSAGE_SELF) if resource else None
+        started = time.perf_counter()
+        counts = run()
+        wall = time.perf_counter() - started
+        return {
+            'wall_seconds': round(wall, 4),
+            'peak_rss_mb': peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+            'setup_peak_rss_mb': setup_rss,
+            'peak_child_rss_mb': peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+            'subprocesses': sum(counter.commands.values()),
+            'subprocesses_by_command': dict(counter.commands.most_common()),
+            'counts': counts,
+        }
+    finally:
+        counter.uninstall()
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def summarize(runs):
+    if 'skipped' in runs[0]:
+        return runs[0]
+    walls = [run['wall_seconds'] for run in runs]
+    summary = dict(runs[-1])
+    summary.update({
+        'wall_seconds': round(statistics.median(walls), 4),
+        'wall_seconds_min': min(walls),
+        'wall_seconds_runs': walls,
+        'peak_rss_mb': max((run['peak_rss_mb'] or 0) for run in runs) or None,
+    })
+    return summary
+
+
+def git_version():
+    return subprocess.run(['git', '--version'], stdout=subprocess.PIPE, text=True).stdout.strip()
+
+
+def sample_options(repo_dir, args):
+    merges = subprocess.run(['git', 'rev-list', '--merges', f'--max-count={args.diff_count}', 'HEAD'],
+                            cwd=repo_dir, stdout=subprocess.PIPE, text=True, check=True).stdout.split()
+    branches = subprocess.run(['git', 'for-each-ref', '--format=%(refname:strip=3)', f'--count={args.branch_count}',
+                               'refs/remotes/origin/open/'],
+                              cwd=repo_dir, stdout=subprocess.PIPE, text=True, check=True).stdout.split()
+    return {'merges': merges, 'branches': branches, 'pr_count': args.pr_count}
+
+
+def compare(results, baseline_path, threshold):
+    """ Print the wall time ratio of every operation against a previous results file. """
+    with open(baseline_path) as baseline_file:
+        baseline = {result['operation']: result for result in json.load(baseline_file)['results']}
+    regressions = 0
+    for result in results:
+        previous = baseline.get(result['operation'])
+        if not previous or 'wall_seconds' not in previous or 'wall_seconds' not in result:
+            continue
+        ratio = result['wall_seconds'] / previous['wall_seconds'] if previous['wall_seconds'] else float('inf')
+        flag = '  REGRESSION' if ratio > threshold else ''
+        regressions += bool(flag)
+        print(f"  {result['operation']:<22} {previous['wall_seconds']:8.3f}s -> {result['wall_seconds']:8.3f}s "
+              f"({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the extractor's operations on a generated repository: wall "
+                                                 "time, peak RSS and subprocesses started, written to JSON.")
+    repo_group = parser.add_argument_group('synthetic repository')
+    repo_group.add_argument('--commits', type=int, default=RepoSpec().commits, help="Commits on main")
+    repo_group.add_argument('--merge-ratio', type=float, default=RepoSpec().merge_ratio,
+                            help="Fraction of main commits that merge a PR")
+    repo_group.add_argument('--branches', type=int, default=RepoSpec().branches, help="Unmerged branches")
+    repo_group.add_argument('--files', type=int, default=RepoSpec().files, help="Files in the initial tree")
+    repo_group.add_argument('--files-per-commit', type=int, default=RepoSpec().files_per_commit)
+    repo_group.add_argument('--diff-lines', type=int, default=RepoSpec().diff_lines,
+                            help="Lines added per changed file")
+    repo_group.add_argument('--pr-commits', type=int, default=RepoSpec().pr_commits, help="Commits per PR")
+    repo_group.add_argument('--seed', type=int, default=RepoSpec().seed)
+    repo_group.add_argument('--repos-dir', default='bench_repos', help="Where generated repositories are kept")
+    repo_group.add_argument('--regenerate', action='store_true', help="Regenerate even if the repository exists")
+    parser.add_argument('--repo', help="Benchmark this existing repository instead of a generated one")
+    parser.add_argument('--operations', default=','.join(DEFAULT_OPERATIONS),
+                        help=f"Comma-separated subset of: {', '.join(DEFAULT_OPERATIONS)}")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per operation, each in a fresh process")
+    parser.add_argument('--diff-count', type=int, default=20, help="Merge commits diffed by generate_diff")
+    parser.add_argument('--pr-count', type=int, default=5, help="PRs extracted by pr_diffs")
+    parser.add_argument('--branch-count', type=int, default=5, help="Branches diffed by branch_diff")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', metavar='RESULTS_JSON', help="Compare wall times with an earlier results file")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="Ratio above which --compare reports a regression (exit code 1)")
+    args = parser.parse_args(argv)
+
+    operations = [name.strip() for name in args.operations.split(',') if name.strip()]
+    unknown = [name for name in operations if name not in OPERATIONS]
+    if unknown:
+        parser.error(f"Unknown operations: {', '.join(unknown)}")
+
+    spec = None
+    if args.repo:
+        repo_dir = os.path.abspath(args.repo)
+    else:
+        spec = RepoSpec(args.commits, args.merge_ratio, args.branches, args.files, args.files_per_commit,
+                        args.diff_lines, args.pr_commits, args.seed)
+        started = time.perf_counter()
+        repo_dir = generate_repo(spec, os.path.abspath(args.repos_dir), reuse=not args.regenerate).work_dir
+        print(f"Repository: {repo_dir} ({time.perf_counter() - started:.1f}s)")
+    options = sample_options(repo_dir, args)
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for name in operations:
+        runs = []
+        for _ in range(args.repeat):
+            # A fresh interpreter per run, so peak RSS and warm-up belong to this operation only
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                runs.append(executor.submit(run_operation, name, repo_dir, options).result())
+            if 'skipped' in runs[-1]:
+                break
+        result = {'operation': name, **summarize(runs)}
+        results.append(result)
+        if 'skipped' in result:
+            print(f"{name:<22} skipped: {result['skipped']}")
+        else:
+            print(f"{name:<22} {result['wall_seconds']:8.3f}s  {result['peak_rss_mb'] or 0:7.1f} MB  "
+                  f"{result['subprocesses']:5} processes  {result['counts']}")
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'git': git_version(),
+        'repo': repo_dir,
+        'spec': spec._asdict() if spec else None,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        print(f"Compared with {args.compare}:")
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
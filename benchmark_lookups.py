@@ -0,0 +1,52 @@
+import argparse
+import statistics
+import time
+
+from GitLogReader import GitLogReader
+from GitObjectReader import GitObjectReader
+from GitProcess import run_git
+
+
+def time_queries(query, names):
+    """ Run query(name) for every name and return the per-query latencies in milliseconds. """
+    latencies = []
+    for name in names:
+        started = time.perf_counter()
+        query(name)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def describe(label, latencies):
+    return (f"{label:<34} {statistics.mean(latencies):8.3f} ms mean  "
+            f"{statistics.median(latencies):8.3f} ms median  {sum(latencies) / 1000:7.2f}s total")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-query latency of one git process per lookup versus the "
+                                                 "persistent cat-file connection.")
+    parser.add_argument('--repo', default='.')
+    parser.add_argument('--count', type=int, default=200, help="Number of commits to look up")
+    args = parser.parse_args(argv)
+
+    names = []
+    for record in GitLogReader(args.repo).iter_commits():
+        names.append(record.hash)
+        if len(names) >= args.count:
+            break
+    reader = GitObjectReader.shared(args.repo)
+
+    print(f"{len(names)} commits from {args.repo}")
+    print(describe("parents: git rev-list per query",
+                   time_queries(lambda name: run_git(args.repo, ['rev-list', '--parents', '-n', '1', name]),
+                                names)))
+    # The first query starts the process; it is timed with the rest
+    print(describe("parents: cat-file --batch", time_queries(reader.parents, names)))
+    print(describe("type: git cat-file -t per query",
+                   time_queries(lambda name: run_git(args.repo, ['cat-file', '-t', name]), names)))
+    print(describe("type: cat-file --batch-check", time_queries(reader.info, names)))
+    reader.close()
+
+
+if __name__ == '__main__':
+    main()
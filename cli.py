@@ -0,0 +1,268 @@
+import argparse
+import json
+import os
+import sys
+
+from CommitIndex import FILTER_ALL, FILTER_PRS, FILTERS
+from ConfigManager import DEFAULT_CONFIG_FILE, ConfigManager
+from DiffCache import DiffCache
+from DiffChunker import tokens_to_bytes
+from DiffExtractorCore import (branch_range, changed_files, commit_range, diff_branch, diff_commit, diff_pr,
+                               fetch_origin, list_branches, list_commits, time_diff_options)
+from DiffOptions import DIFF_ALGORITHMS, MERGE_MODES, WHITESPACE_MODES, DiffOptions, diff_options_variants
+from DiffOutputPipeline import available_compressions
+from DiffStat import pathspec_args
+from FetchCoordinator import DEFAULT_FRESHNESS_SECONDS, FetchCoordinator
+from Workspace import OPERATION_DIFF, OPERATIONS, STATUS_OK, Workspace, run_workspace
+
+DEFAULT_CACHE_MAX_MB = 512
+FORMAT_JSON = 'json'
+FORMAT_NDJSON = 'ndjson'
+
+
+def to_json(value):
+    """ Convert namedtuples (recursively) into plain dicts and lists for json.dumps. """
+    if hasattr(value, '_asdict'):
+        return {key: to_json(item) for key, item in value._asdict().items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    return value
+
+
+def emit(items, output_format, stream=sys.stdout):
+    """ Write items as one JSON array, or one JSON object per line as they are produced (ndjson). """
+    if output_format == FORMAT_NDJSON:
+        for item in items:
+            stream.write(json.dumps(to_json(item)) + '\n')
+            stream.flush()
+    else:
+        json.dump([to_json(item) for item in items], stream, indent=2)
+        stream.write('\n')
+
+
+def progress_printer(args):
+    if args.quiet:
+        return lambda message: None
+    return lambda message: print(message, file=sys.stderr)
+
+
+def open_cache(args):
+    if args.no_cache:
+        return None
+    config_dir = os.path.dirname(os.path.abspath(args.config))
+    return DiffCache.shared(config_dir, args.cache_max_mb * 1024 * 1024)
+
+
+def pathspecs(args):
+    return pathspec_args(args.include, args.exclude)
+
+
+def diff_options(args, repo_dir=None):
+    """ The DiffOptions stored for the repository (as chosen in the app), overridden by the ones given. """
+    stored = ConfigManager.shared(args.config).get_repo_diff_options(repo_dir or args.repo)
+    return stored._replace(**{field: getattr(args, field) for field in DiffOptions._fields
+                              if getattr(args, field, None) is not None})
+
+
+def output_options(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    return dict(cache=open_cache(args), compression=args.compression,
+                max_bytes=args.max_mb * 1024 * 1024 if args.max_mb else None, pathspecs=pathspecs(args),
+                chunk_bytes=args.chunk_bytes or tokens_to_bytes(args.chunk_tokens) or None)
+
+
+def run_list(args):
+    progress = progress_printer(args)
+    if args.fetch:
+        fetch_origin(args.repo, progress=progress)
+    # The persistent commit index lives next to the config, exactly as for the GUI
+    index_dir = None if args.no_index else os.path.dirname(os.path.abspath(args.config))
+    emit(list_commits(args.repo, args.filter, index_dir, progress=progress), args.format)
+
+
+def run_diff(args):
+    run = diff_commit(args.repo, args.commits, args.output_dir, max_workers=args.workers,
+                      diff_options=diff_options(args), progress=progress_printer(args), **output_options(args))
+    emit(run.results, args.format)
+
+
+def run_time_options(args):
+    variants = diff_options_variants(diff_options(args))
+    emit(time_diff_options(args.repo, args.commits, variants, pathspecs(args), progress=progress_printer(args)),
+         args.format)
+
+
+def run_pr(args):
+    options = output_options(args)
+    del options['max_bytes'], options['pathspecs'], options['chunk_bytes']
+    run = diff_pr(args.repo, args.merge_commit, args.output_dir, combined=args.combined,
+                  diff_options=diff_options(args), progress=progress_printer(args), **options)
+    emit(run.results, args.format)
+
+
+def run_branch(args):
+    # Every extraction is remembered next to the config, so a later --incremental run has a starting point
+    branch_diff = diff_branch(args.repo, args.branch, args.base, args.output_dir, fetch=args.fetch,
+                              incremental=args.incremental, index_dir=os.path.dirname(os.path.abspath(args.config)),
+                              diff_options=diff_options(args), progress=progress_printer(args), **output_options(args))
+    emit([branch_diff], args.format)
+
+
+def run_files(args):
+    if args.branch:
+        branch_diff = branch_range(args.repo, args.branch, args.base, fetch=args.fetch,
+                                   progress=progress_printer(args))
+        base, target = branch_diff.merge_base, branch_diff.tip
+    else:
+        base, target = commit_range(args.repo, args.commit, merge_mode=diff_options(args).merge_mode)
+    emit(changed_files(args.repo, base, target, pathspecs(args), diff_options=diff_options(args)), args.format)
+
+
+def run_branches(args):
+    branches = list_branches(args.repo, args.base, os.path.dirname(os.path.abspath(args.config)), fetch=args.fetch,
+                             progress=progress_printer(args))
+    if args.sort != 'name':
+        branches.sort(key=lambda branch: getattr(branch, args.sort) or 0, reverse=True)
+    emit(branches, args.format)
+
+
+def run_workspace_command(args):
+    workspace = Workspace.load(args.workspace)
+    options = {
+        'filter': args.filter, 'index_dir': os.path.dirname(os.path.abspath(args.config)), 'fetch': args.fetch,
+        'branch': args.branch, 'compression': args.compression,
+        'max_bytes': args.max_mb * 1024 * 1024 if args.max_mb else None, 'pathspecs': pathspecs(args),
+        'chunk_bytes': tokens_to_bytes(args.chunk_tokens) or None, 'incremental': args.incremental,
+        'diff_options': {repo.name: diff_options(args, repo.repo_dir) for repo in workspace.repos},
+    }
+    progress = progress_printer(args)
+    run = run_workspace(workspace, args.operation, options, args.workers,
+                        progress=lambda name, message: progress(f"[{name}] {message}"))
+    progress(f"Index: {run.index_path} ({run.elapsed:.1f}s)")
+    emit(run.results, args.format)
+    return 0 if all(result.status == STATUS_OK for result in run.results) else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='main.py', description="Extract git diffs without the GUI.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--repo', default='.', help="Git repository directory (default: current directory)")
+    common.add_argument('--format', choices=[FORMAT_JSON, FORMAT_NDJSON], default=FORMAT_JSON)
+    common.add_argument('--config', default=DEFAULT_CONFIG_FILE,
+                        help="Config file; the diff cache and commit index live in its directory")
+    common.add_argument('--quiet', action='store_true', help="Do not print progress to stderr")
+    common.add_argument('--include', action='append', default=[], metavar='PATHSPEC',
+                        help="Only diff paths matching this pathspec (repeatable)")
+    common.add_argument('--exclude', action='append', default=[], metavar='PATHSPEC',
+                        help="Never diff paths matching this pathspec, e.g. '*.lock' (repeatable)")
+    common.add_argument('--fetch-freshness', type=int, default=DEFAULT_FRESHNESS_SECONDS,
+                        help="Seconds a fetch of origin stays fresh within this run (0: always fetch)")
+
+    output = argparse.ArgumentParser(add_help=False, parents=[common])
+    output.add_argument('--output-dir', default='.', help="Directory the diff files are written to")
+    output.add_argument('--compression', choices=available_compressions(), default='')
+    output.add_argument('--max-mb', type=int, default=0, help="Truncate each diff after this many MB (0: no limit)")
+    output.add_argument('--chunk-tokens', type=int, default=0,
+                        help="Split each diff at file/hunk boundaries into chunks of about this many tokens")
+    output.add_argument('--chunk-bytes', type=int, default=0, help="Like --chunk-tokens, with a budget in bytes")
+    output.add_argument('--no-cache', action='store_true', help="Bypass the diff cache")
+    output.add_argument('--cache-max-mb', type=int, default=DEFAULT_CACHE_MAX_MB)
+
+    # Default to the options stored for the repository, see diff_options()
+    engine = argparse.ArgumentParser(add_help=False)
+    engine.add_argument('--merge-mode', choices=list(MERGE_MODES),
+                        help="How merges are diffed: against their first parent (default), combined (--cc), "
+                             "against git's re-merge (--remerge-diff), or parent 1 against parent 2")
+    engine.add_argument('--diff-algorithm', dest='algorithm', choices=DIFF_ALGORITHMS[1:])
+    engine.add_argument('--rename-limit', type=int, metavar='FILES',
+                        help="Files compared for rename and copy detection (git -l, 0: git's default)")
+    engine.add_argument('--no-renames', dest='renames', action='store_const', const=False,
+                        help="Skip rename and copy detection (--rename-limit and --copies then do not apply)")
+    engine.add_argument('--renames', dest='renames', action='store_const', const=True)
+    engine.add_argument('--copies', dest='copies', action='store_const', const=True,
+                        help="Also detect files copied from modified files (git -C)")
+    engine.add_argument('--no-copies', dest='copies', action='store_const', const=False)
+    engine.add_argument('--whitespace', choices=[mode for mode in WHITESPACE_MODES if mode],
+                        help="Whitespace changes to ignore")
+
+    list_parser = commands.add_parser('list', parents=[common], help="List commits as JSON")
+    list_parser.add_argument('--filter', choices=list(FILTERS), default=FILTER_ALL)
+    list_parser.add_argument('--fetch', action='store_true', help="Fetch origin first")
+    list_parser.add_argument('--no-index', action='store_true', help="Stream git log instead of using the index")
+    list_parser.set_defaults(handler=run_list)
+
+    diff_parser = commands.add_parser('diff', parents=[output, engine], help="Diff commits against their parents")
+    diff_parser.add_argument('commits', nargs='+')
+    diff_parser.add_argument('--workers', type=int, default=None)
+    diff_parser.set_defaults(handler=run_diff)
+
+    time_parser = commands.add_parser('time-options', parents=[common, engine],
+                                      help="Time diffing commits with each merge mode, algorithm, rename and "
+                                           "whitespace setting, varied one at a time from the given options")
+    time_parser.add_argument('commits', nargs='+')
+    time_parser.set_defaults(handler=run_time_options)
+
+    pr_parser = commands.add_parser('pr', parents=[output, engine], help="Write the patches of the commits a PR merged")
+    pr_parser.add_argument('merge_commit')
+    pr_parser.add_argument('--combined', action='store_true', help="Write all patches into one file")
+    pr_parser.set_defaults(handler=run_pr)
+
+    branch_parser = commands.add_parser('branch', parents=[output, engine], help="Diff a branch against its base")
+    branch_parser.add_argument('branch')
+    branch_parser.add_argument('--base', required=True, help="Base branch the diff starts from")
+    branch_parser.add_argument('--no-fetch', dest='fetch', action='store_false')
+    branch_parser.add_argument('--incremental', action='store_true',
+                               help="Only diff the commits pushed since the last extraction of this branch")
+    branch_parser.set_defaults(handler=run_branch)
+
+    files_parser = commands.add_parser('files', parents=[common, engine],
+                                       help="List changed files with added/deleted line counts, without patches")
+    files_parser.add_argument('commit', nargs='?', help="Commit to list (merges: see --merge-mode)")
+    files_parser.add_argument('--branch', help="List the changes of a branch since it diverged from --base instead")
+    files_parser.add_argument('--base', help="Base branch for --branch")
+    files_parser.add_argument('--no-fetch', dest='fetch', action='store_false')
+    files_parser.set_defaults(handler=run_files)
+
+    branches_parser = commands.add_parser('branches', parents=[common], help="List remote branches")
+    branches_parser.add_argument('--no-fetch', dest='fetch', action='store_false')
+    branches_parser.add_argument('--base', help="Also count commits ahead of and behind this base branch")
+    branches_parser.add_argument('--sort', choices=['name', 'date', 'ahead', 'behind'], default='name',
+                                 help="Order (date, ahead and behind: largest first)")
+    branches_parser.set_defaults(handler=run_branches)
+
+    workspace_parser = commands.add_parser('workspace', parents=[common],
+                                           help="Run list or diff on every repository of a workspace concurrently")
+    workspace_parser.add_argument('workspace', help="Workspace JSON file")
+    workspace_parser.add_argument('operation', choices=OPERATIONS)
+    workspace_parser.add_argument('--branch', help="diff: branch diffed against each repository's base branch")
+    workspace_parser.add_argument('--filter', choices=list(FILTERS), default=FILTER_PRS, help="list: commits listed")
+    workspace_parser.add_argument('--no-fetch', dest='fetch', action='store_false')
+    workspace_parser.add_argument('--workers', type=int, default=None, help="Repositories processed at once")
+    workspace_parser.add_argument('--compression', choices=available_compressions(), default='')
+    workspace_parser.add_argument('--max-mb', type=int, default=0)
+    workspace_parser.add_argument('--chunk-tokens', type=int, default=0)
+    workspace_parser.add_argument('--incremental', action='store_true',
+                                  help="diff: only the commits pushed since each repository's last extraction")
+    workspace_parser.set_defaults(handler=run_workspace_command)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'files' and not (args.commit or (args.branch and args.base)):
+        parser.error("files needs a commit, or --branch together with --base")
+    if args.command == 'workspace' and args.operation == OPERATION_DIFF and not args.branch:
+        parser.error("workspace diff needs --branch")
+    FetchCoordinator.set_default_freshness(args.fetch_freshness)
+    try:
+        return args.handler(args) or 0
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+import os
+import subprocess
+
+import pytest
+
+EPOCH = 1600000000
+
+
+class GitRepo:
+    """ A throwaway repository with deterministic authors and dates. """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.time = EPOCH
+        os.makedirs(self.path, exist_ok=True)
+        self.git('init', '-q', '-b', 'main')
+
+    def git(self, *args, env=None):
+        return subprocess.run(['git', *args], cwd=self.path, check=True, capture_output=True, text=True,
+                              env=env and {**os.environ, **env}).stdout.strip()
+
+    def write(self, path, content):
+        full_path = os.path.join(self.path, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb' if isinstance(content, bytes) else 'w') as file:
+            file.write(content)
+
+    def commit(self, message, files=None, remove=()):
+        """ Write files ({path: content}), remove paths, commit everything and return the new hash. """
+        for path, content in (files or {}).items():
+            self.write(path, content)
+        for path in remove:
+            self.git('rm', '-q', path)
+        self.time += 60
+        self.git('add', '-A')
+        date = f'{self.time} +0000'
+        self.git('-c', f'core.hooksPath={os.devnull}', 'commit', '-q', '--allow-empty', '-m', message,
+                 env={'GIT_AUTHOR_DATE': date, 'GIT_COMMITTER_DATE': date})
+        return self.git('rev-parse', 'HEAD')
+
+
+@pytest.fixture
+def git_repo(tmp_path, monkeypatch):
+    for role in ('AUTHOR', 'COMMITTER'):
+        monkeypatch.setenv(f'GIT_{role}_NAME', 'Ada Lovelace')
+        monkeypatch.setenv(f'GIT_{role}_EMAIL', 'ada@example.com')
+    monkeypatch.setenv('GIT_CONFIG_GLOBAL', os.devnull)
+    monkeypatch.setenv('GIT_CONFIG_NOSYSTEM', '1')
+    return GitRepo(tmp_path / 'repo')
@@ -0,0 +1,143 @@
+import json
+import os
+
+import pytest
+
+from BranchHistory import BranchHistory, is_ancestor
+from DiffExtractorCore import DIFF_FULL, DIFF_INCREMENTAL, DIFF_UNCHANGED, diff_branch
+from DiffOptions import DiffOptions
+from GitObjectReader import GitObjectReader
+
+
+@pytest.fixture
+def branch_repo(git_repo):
+    """ main with two commits and feature forked from the first, both published as origin/ branches. """
+    fork = git_repo.commit('base', {'main.txt': 'main\n', 'feature.txt': 'start\n'})
+    git_repo.commit('main moves on', {'main.txt': 'main 2\n'})
+    git_repo.git('checkout', '-q', '-b', 'feature', fork)
+    git_repo.commit('feature 1', {'feature.txt': 'start\nstep 1\n'})
+    publish(git_repo)
+    yield git_repo
+    GitObjectReader.close_all()
+
+
+def publish(git_repo):
+    for branch in ('main', 'feature'):
+        git_repo.git('update-ref', f'refs/remotes/origin/{branch}', branch)
+
+
+def extract(git_repo, tmp_path, incremental=True, **kwargs):
+    messages = []
+    kwargs.setdefault('output_dir', str(tmp_path / 'out'))
+    os.makedirs(kwargs['output_dir'], exist_ok=True)
+    branch_diff = diff_branch(git_repo.path, 'feature', 'main', fetch=False, incremental=incremental,
+                              index_dir=str(tmp_path / 'config'), progress=messages.append, **kwargs)
+    return branch_diff, messages
+
+
+def read(path):
+    with open(path) as diff_file:
+        return diff_file.read()
+
+
+def test_is_ancestor(branch_repo):
+    assert is_ancestor(branch_repo.path, 'main~1', 'feature')
+    assert not is_ancestor(branch_repo.path, 'main', 'feature')
+    assert not is_ancestor(branch_repo.path, 'f' * 40, 'feature')
+
+
+def test_history_round_trip(branch_repo, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    branch_diff, _ = extract(branch_repo, tmp_path, output_dir='relative')
+    assert branch_diff.mode == DIFF_FULL
+
+    last = BranchHistory(branch_repo.path, str(tmp_path / 'config')).last('origin/feature', 'origin/main')
+    assert last['tip'] == branch_diff.tip
+    assert last['merge_base'] == branch_diff.merge_base
+    # Stored absolute, so another working directory can continue the chain
+    assert last['stats']['path'] == str(tmp_path / 'relative' / 'all_commits_on_origin_feature.diff')
+    assert last['full'] == last['stats']['path']
+
+    history = BranchHistory(branch_repo.path, str(tmp_path / 'config'))
+    history.forget('origin/feature', 'origin/main')
+    assert BranchHistory(branch_repo.path, str(tmp_path / 'config')).last('origin/feature', 'origin/main') is None
+
+
+def test_unchanged_branch(branch_repo, tmp_path):
+    first, _ = extract(branch_repo, tmp_path)
+    second, messages = extract(branch_repo, tmp_path)
+    assert second.mode == DIFF_UNCHANGED
+    assert second.stats.path == first.stats.path
+    assert any('did not change' in message for message in messages)
+
+
+def test_new_commits_are_diffed_incrementally(branch_repo, tmp_path):
+    first, _ = extract(branch_repo, tmp_path)
+    branch_repo.commit('feature 2', {'feature.txt': 'start\nstep 1\nstep 2\n'})
+    publish(branch_repo)
+    second, _ = extract(branch_repo, tmp_path)
+
+    assert second.mode == DIFF_INCREMENTAL
+    assert second.since == first.tip
+    assert second.previous == first.stats.path
+    delta = read(second.stats.path)
+    assert '+step 2' in delta and '+step 1' not in delta
+
+    with open(second.stats.path[:-len('.diff')] + '.delta.json') as pointer_file:
+        pointer = json.load(pointer_file)
+    assert (pointer['from'], pointer['to']) == (first.tip, second.tip)
+    assert pointer['full'] == first.stats.path
+    assert os.path.isabs(pointer['path'])
+
+    # The chain keeps pointing at the full diff it started from
+    branch_repo.commit('feature 3', {'feature.txt': 'start\nstep 1\nstep 2\nstep 3\n'})
+    publish(branch_repo)
+    third, _ = extract(branch_repo, tmp_path)
+    assert third.previous == second.stats.path
+    assert BranchHistory(branch_repo.path, str(tmp_path / 'config')).last(
+        'origin/feature', 'origin/main')['full'] == first.stats.path
+
+
+@pytest.mark.parametrize('change, reason', [
+    ('pathspecs', 'Path filters changed'),
+    ('diff_options', 'Diff options changed'),
+    ('removed', 'was removed'),
+    ('force_push', 'force-pushed'),
+    ('rebase', 'rebased'),
+])
+def test_full_diff_fallbacks(branch_repo, tmp_path, change, reason):
+    first, _ = extract(branch_repo, tmp_path)
+    kwargs = {}
+    if change == 'pathspecs':
+        kwargs['pathspecs'] = ['--', 'feature.txt']
+    elif change == 'diff_options':
+        kwargs['diff_options'] = DiffOptions(algorithm='histogram')
+    elif change == 'removed':
+        os.remove(first.stats.path)
+    elif change == 'force_push':
+        branch_repo.git('reset', '-q', '--hard', 'feature~1')
+        branch_repo.commit('feature 1 rewritten', {'feature.txt': 'start\nrewritten\n'})
+    elif change == 'rebase':
+        branch_repo.git('rebase', '-q', 'main')
+    branch_repo.commit('feature 2', {'feature.txt': read(os.path.join(branch_repo.path, 'feature.txt')) + 'step 2\n'})
+    publish(branch_repo)
+
+    second, messages = extract(branch_repo, tmp_path, **kwargs)
+    assert second.mode == DIFF_FULL
+    assert second.since is None
+    assert any(reason in message for message in messages)
+
+
+def test_full_diff_when_not_incremental(branch_repo, tmp_path):
+    extract(branch_repo, tmp_path)
+    branch_repo.commit('feature 2', {'feature.txt': 'start\nstep 1\nstep 2\n'})
+    publish(branch_repo)
+    second, _ = extract(branch_repo, tmp_path, incremental=False)
+    assert second.mode == DIFF_FULL
+    assert '+step 1' in read(second.stats.path)
+
+
+def test_truncated_diff_is_not_continued(branch_repo, tmp_path):
+    branch_diff, _ = extract(branch_repo, tmp_path, max_bytes=10)
+    assert branch_diff.stats.truncated
+    assert BranchHistory(branch_repo.path, str(tmp_path / 'config')).last('origin/feature', 'origin/main') is None
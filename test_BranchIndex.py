@@ -0,0 +1,151 @@
+import pytest
+from PyQt5.QtCore import Qt
+
+import BranchIndex as branch_index_module
+from BranchIndex import BranchIndex, BranchInfo, ahead_behind, list_branch_refs
+from BranchListModel import COLUMN_AHEAD, COLUMN_BEHIND, COLUMN_NAME, COLUMN_SUBJECT, BranchListModel
+from GitObjectReader import GitObjectReader
+
+
+@pytest.fixture
+def branch_repo(git_repo, monkeypatch):
+    """
+    Remote branches off main: feature is 2 ahead and 1 behind, same points at feature's tip and
+    stale at main's first commit. Returns (repo, {name: tip}, counted tips).
+    """
+    base = git_repo.commit('base', {'a.txt': 'a\n'})
+    git_repo.git('checkout', '-q', '-b', 'feature')
+    git_repo.commit('feature 1', {'b.txt': '1\n'})
+    feature = git_repo.commit('feature 2: 100% done\twith a tab', {'b.txt': '2\n'})
+    git_repo.git('checkout', '-q', 'main')
+    main = git_repo.commit('main 2', {'a.txt': 'a 2\n'})
+    tips = {'origin/main': main, 'origin/feature': feature, 'origin/same': feature, 'origin/stale': base}
+    for name, tip in tips.items():
+        git_repo.git('update-ref', f'refs/remotes/{name}', tip)
+    git_repo.git('symbolic-ref', 'refs/remotes/origin/HEAD', 'refs/remotes/origin/main')
+
+    counted = []
+
+    def counting_ahead_behind(repo_dir, base_tip, tip, token=None):
+        counted.append(tip)
+        return ahead_behind(repo_dir, base_tip, tip, token)
+    monkeypatch.setattr(branch_index_module, 'ahead_behind', counting_ahead_behind)
+    yield git_repo, tips, counted
+    GitObjectReader.close_all()
+
+
+def all_counts(branch_index, branches, base_branch='origin/main'):
+    counts = {}
+    for batch in branch_index.iter_counts(branches, base_branch):
+        counts.update(batch)
+    return counts
+
+
+def test_list_branch_refs(branch_repo):
+    git_repo, tips, _ = branch_repo
+    branches = list_branch_refs(git_repo.path)
+    # Sorted by name, without the origin/HEAD symref
+    assert [branch.name for branch in branches] == ['origin/feature', 'origin/main', 'origin/same', 'origin/stale']
+    feature = branches[0]
+    assert feature.tip == tips['origin/feature']
+    assert feature.subject == 'feature 2: 100% done\twith a tab'
+    assert feature.date == int(git_repo.git('log', '-1', '--format=%ct', tips['origin/feature']))
+    assert (feature.ahead, feature.behind) == (None, None)
+
+
+def test_ahead_behind(branch_repo):
+    git_repo, tips, _ = branch_repo
+    assert ahead_behind(git_repo.path, tips['origin/main'], tips['origin/feature']) == (2, 1)
+    assert ahead_behind(git_repo.path, tips['origin/main'], tips['origin/stale']) == (0, 1)
+    assert ahead_behind(git_repo.path, tips['origin/main'], tips['origin/main']) == (0, 0)
+
+
+def test_counts_are_cached_per_tip(branch_repo, tmp_path):
+    git_repo, tips, counted = branch_repo
+    branch_index = BranchIndex(git_repo.path, str(tmp_path / 'config'))
+    branches = list_branch_refs(git_repo.path)
+    assert all_counts(branch_index, branches) == {'origin/feature': (2, 1), 'origin/main': (0, 0),
+                                                  'origin/same': (2, 1), 'origin/stale': (0, 1)}
+    # Branches sharing a tip are counted once
+    assert sorted(counted) == sorted({*tips.values()})
+
+    # Only the tip that moved is counted again, also by an index loaded from disk
+    counted.clear()
+    git_repo.git('checkout', '-q', 'feature')
+    moved = git_repo.commit('feature 3', {'b.txt': '3\n'})
+    git_repo.git('update-ref', 'refs/remotes/origin/feature', moved)
+    branch_index = BranchIndex(git_repo.path, str(tmp_path / 'config'))
+    batches = list(branch_index.iter_counts(list_branch_refs(git_repo.path), 'origin/main'))
+    assert counted == [moved]
+    assert batches[0] == {'origin/main': (0, 0), 'origin/same': (2, 1), 'origin/stale': (0, 1)}
+    assert batches[1:] == [{'origin/feature': (3, 1)}]
+
+
+def test_moving_the_base_invalidates_every_count(branch_repo, tmp_path):
+    git_repo, tips, counted = branch_repo
+    branch_index = BranchIndex(git_repo.path, str(tmp_path / 'config'))
+    all_counts(branch_index, list_branch_refs(git_repo.path))
+    counted.clear()
+    git_repo.git('checkout', '-q', 'main')
+    main = git_repo.commit('main 3', {'a.txt': 'a 3\n'})
+    git_repo.git('update-ref', 'refs/remotes/origin/main', main)
+    counts = all_counts(branch_index, list_branch_refs(git_repo.path))
+    assert sorted(counted) == sorted({main, tips['origin/feature'], tips['origin/stale']})
+    assert counts == {'origin/feature': (2, 2), 'origin/main': (0, 0), 'origin/same': (2, 2),
+                      'origin/stale': (0, 2)}
+
+
+def test_counts_against_a_missing_base(branch_repo):
+    git_repo, _, _ = branch_repo
+    with pytest.raises(ValueError):
+        all_counts(BranchIndex(git_repo.path), list_branch_refs(git_repo.path), 'origin/missing')
+
+
+def branch_model(branches):
+    model = BranchListModel()
+    model.setBranches(branches)
+    return model
+
+
+def column(model, column_number):
+    return [model.data(model.index(row, column_number)) for row in range(model.rowCount())]
+
+
+BRANCHES = [BranchInfo('origin/alpha', 'a' * 40, 300, 'Add Alpha'),
+            BranchInfo('origin/beta', 'b' * 40, 100, 'fix beta', 5, 1),
+            BranchInfo('origin/gamma', 'c' * 40, 200, 'Gamma')]
+
+
+def test_model_counts_arrive_later():
+    model = branch_model(BRANCHES)
+    assert column(model, COLUMN_NAME) == ['origin/alpha', 'origin/beta', 'origin/gamma']
+    assert column(model, COLUMN_AHEAD) == ['', '5', '']
+    model.setCounts({'origin/alpha': (3, 0), 'origin/gamma': (0, 7), 'origin/deleted': (1, 1)})
+    assert column(model, COLUMN_AHEAD) == ['3', '5', '0']
+    assert column(model, COLUMN_BEHIND) == ['0', '1', '7']
+
+
+def test_model_sorts_and_filters_rows():
+    model = branch_model(BRANCHES)
+    model.setCounts({'origin/alpha': (3, 0), 'origin/gamma': (0, 7)})
+    model.sort(COLUMN_AHEAD, Qt.DescendingOrder)
+    assert column(model, COLUMN_NAME) == ['origin/beta', 'origin/alpha', 'origin/gamma']
+    model.sort(COLUMN_SUBJECT)
+    assert column(model, COLUMN_NAME) == ['origin/alpha', 'origin/beta', 'origin/gamma']
+    model.setFilterText(' GAMMA ')
+    assert column(model, COLUMN_NAME) == ['origin/gamma']
+    assert model.rowOf('origin/gamma') == 0
+    assert model.rowOf('origin/alpha') is None
+
+
+def test_model_update_keeps_the_counts_of_unmoved_tips():
+    model = branch_model(BRANCHES)
+    model.setCounts({'origin/alpha': (3, 0), 'origin/gamma': (0, 7)})
+    moved = [BRANCHES[0], BRANCHES[1], BRANCHES[2]._replace(tip='d' * 40, subject='Gamma 2')]
+    assert model.updateBranches(moved)
+    assert column(model, COLUMN_AHEAD) == ['3', '5', '']
+    assert column(model, COLUMN_SUBJECT)[2] == 'Gamma 2'
+    # A branch list that changed shape resets the model
+    assert not model.updateBranches(moved[:2])
+    assert column(model, COLUMN_NAME) == ['origin/alpha', 'origin/beta']
+    assert column(model, COLUMN_AHEAD) == ['', '5']
@@ -0,0 +1,91 @@
+import pytest
+
+from CommitIndex import FILTER_ALL, FILTER_MERGES, FILTER_PRS, CommitIndex, extract_pr_number
+from GitObjectReader import GitObjectReader
+
+
+@pytest.fixture
+def index_repo(git_repo, tmp_path):
+    yield git_repo, CommitIndex(git_repo.path, str(tmp_path / 'config'))
+    GitObjectReader.close_all()
+
+
+def merge_pr(git_repo, number):
+    git_repo.git('checkout', '-q', '-b', f'feature/{number}')
+    git_repo.commit(f'work on #{number}', {f'feature_{number}.txt': f'{number}\n'})
+    git_repo.git('checkout', '-q', 'main')
+    git_repo.git('merge', '-q', '--no-ff', '-m', f'Merge pull request #{number} from feature/{number}',
+                 f'feature/{number}')
+    return git_repo.git('rev-parse', 'HEAD')
+
+
+def subjects(commit_index, list_filter=FILTER_ALL, **kwargs):
+    return [record.subject for page in commit_index.iter_pages(list_filter, **kwargs) for record in page]
+
+
+def test_extract_pr_number():
+    assert extract_pr_number('Merge pull request #123 from user/branch') == 123
+    assert extract_pr_number('Fix #4 and #5') == 4
+    assert extract_pr_number('No number') is None
+
+
+def test_refresh_indexes_in_log_order(index_repo):
+    git_repo, commit_index = index_repo
+    git_repo.commit('first')
+    merge_pr(git_repo, 1)
+    git_repo.commit('Merge branch hotfix without a PR')
+    result = commit_index.refresh()
+    assert (result.new_commits, result.rebuilt) == (4, True)
+    assert subjects(commit_index) == ['Merge branch hotfix without a PR', 'Merge pull request #1 from feature/1',
+                                      'work on #1', 'first']
+    assert subjects(commit_index, FILTER_MERGES) == ['Merge pull request #1 from feature/1']
+    assert subjects(commit_index, FILTER_PRS) == ['Merge pull request #1 from feature/1']
+    assert commit_index.count() == 4
+    assert commit_index.count(FILTER_PRS) == 1
+
+
+def test_refresh_only_walks_new_commits(index_repo):
+    git_repo, commit_index = index_repo
+    git_repo.commit('first')
+    first = commit_index.refresh()
+    assert commit_index.refresh().new_commits == 0
+
+    merge_pr(git_repo, 2)
+    pages = []
+    generator = commit_index.iter_refresh()
+    while True:
+        try:
+            pages.append(next(generator))
+        except StopIteration as stop:
+            result = stop.value
+            break
+    assert (result.new_commits, result.rebuilt) == (2, False)
+    assert result.generation == first.generation + 1
+    assert [record.subject for page in pages for record in page] == ['Merge pull request #2 from feature/2',
+                                                                     'work on #2']
+    # Newer generations come first; before_generation lists the rows that were there already
+    assert subjects(commit_index)[0] == 'Merge pull request #2 from feature/2'
+    assert subjects(commit_index, before_generation=result.generation) == ['first']
+
+
+def test_rewritten_history_rebuilds(index_repo):
+    git_repo, commit_index = index_repo
+    git_repo.commit('first')
+    git_repo.commit('second')
+    commit_index.refresh()
+    git_repo.git('reset', '-q', '--hard', 'HEAD~1')
+    git_repo.commit('second, amended')
+    result = commit_index.refresh()
+    assert result.rebuilt
+    assert subjects(commit_index) == ['second, amended', 'first']
+
+
+def test_matches_agrees_with_the_sql_filters(index_repo):
+    git_repo, commit_index = index_repo
+    git_repo.commit('first')
+    merge_pr(git_repo, 3)
+    commit_index.refresh()
+    records = [record for page in commit_index.iter_pages() for record in page]
+    for list_filter in (FILTER_ALL, FILTER_MERGES, FILTER_PRS):
+        assert [record.subject for record in records if CommitIndex.matches(record, list_filter)] == \
+            subjects(commit_index, list_filter)
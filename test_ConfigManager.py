@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+
+import pytest
+
+from ConfigManager import MAX_RECENT_REPOS, REPO_SETTINGS_KEY, ConfigManager
+from DiffOptions import DEFAULT_DIFF_OPTIONS, DiffOptions
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    return str(tmp_path / 'config.json')
+
+
+def read(config_file):
+    with open(config_file) as file:
+        return json.load(file)
+
+
+def count_saves(config_manager, monkeypatch):
+    saves = []
+    save_config = config_manager.save_config
+
+    def counting_save():
+        saves.append(dict(config_manager.config))
+        save_config()
+    monkeypatch.setattr(config_manager, 'save_config', counting_save)
+    return saves
+
+
+def test_changes_are_debounced(config_file, monkeypatch):
+    config_manager = ConfigManager(config_file, flush_interval=60)
+    saves = count_saves(config_manager, monkeypatch)
+    config_manager.set_output_dir('/out')
+    config_manager.set_origin_branch('main')
+    config_manager.set_output_max_mb(5)
+    assert saves == []
+    assert not os.path.exists(config_file)
+
+    config_manager.flush()
+    assert len(saves) == 1
+    assert read(config_file)['origin_branch'] == 'main'
+    assert read(config_file)['output_max_mb'] == 5
+    # Nothing pending, nothing written
+    config_manager.flush()
+    assert len(saves) == 1
+
+
+def test_timer_writes_once_after_the_interval(config_file, monkeypatch):
+    config_manager = ConfigManager(config_file, flush_interval=0.05)
+    saved = threading.Event()
+    saves = []
+    monkeypatch.setattr(config_manager, 'save_config', lambda: (saves.append(1), saved.set()))
+    config_manager.set_output_dir('/a')
+    config_manager.set_output_dir('/b')
+    assert saved.wait(5)
+    assert config_manager._flush_timer is None
+    assert saves == [1]
+
+
+def test_unchanged_values_are_not_written_or_notified(config_file):
+    config_manager = ConfigManager(config_file, flush_interval=60)
+    changes = []
+    config_manager.addListener(lambda key, value: changes.append((key, value)))
+    config_manager.set_output_dir('')
+    assert changes == []
+    assert not config_manager._dirty
+    config_manager.set_output_dir('/out')
+    assert changes == [('last_output_dir', '/out')]
+    config_manager.flush()
+
+
+def test_load_keeps_defaults_for_missing_keys(config_file):
+    with open(config_file, 'w') as file:
+        json.dump({'origin_branch': 'develop'}, file)
+    config_manager = ConfigManager(config_file)
+    assert config_manager.get_origin_branch() == 'develop'
+    assert config_manager.get_fetch_freshness_seconds() == 300
+    assert config_manager.get_diff_cache_max_bytes() == 512 * 1024 * 1024
+
+
+def test_shared_per_config_file(config_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(ConfigManager, '_instances', {})
+    shared = ConfigManager.shared(config_file)
+    assert ConfigManager.shared(os.path.join(str(tmp_path), '.', 'config.json')) is shared
+    assert ConfigManager.shared(str(tmp_path / 'other.json')) is not shared
+
+
+def test_repo_settings_are_keyed_by_absolute_path(config_file, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_manager = ConfigManager(config_file, flush_interval=60)
+    changes = []
+    config_manager.addListener(lambda key, value: changes.append((key, value)))
+    config_manager.set_repo_filter('repo', 'prs')
+    assert config_manager.get_repo_filter(str(tmp_path / 'repo')) == 'prs'
+    assert config_manager.get_repo_filter('other', 'all') == 'all'
+    assert changes == [(REPO_SETTINGS_KEY, (str(tmp_path / 'repo'), 'filter', 'prs'))]
+
+    config_manager.set_repo_filter('./repo', 'prs')
+    assert len(changes) == 1
+
+    config_manager.flush()
+    assert read(config_file)['repos'] == {str(tmp_path / 'repo'): {'filter': 'prs'}}
+
+
+def test_repo_base_branch_falls_back_to_the_last_used(config_file):
+    config_manager = ConfigManager(config_file, flush_interval=60)
+    config_manager.set_repo_base_branch('/repos/a', 'develop')
+    assert config_manager.get_repo_base_branch('/repos/a') == 'develop'
+    assert config_manager.get_repo_base_branch('/repos/b') == 'develop'
+    config_manager.set_repo_base_branch('/repos/b', 'main')
+    assert config_manager.get_repo_base_branch('/repos/a') == 'develop'
+    config_manager.flush()
+
+
+def test_repo_diff_options_round_trip(config_file):
+    config_manager = ConfigManager(config_file, flush_interval=60)
+    assert config_manager.get_repo_diff_options('/repos/a') == DEFAULT_DIFF_OPTIONS
+    options = DiffOptions(algorithm='histogram', renames=False, whitespace='ignore-all-space')
+    config_manager.set_repo_diff_options('/repos/a', options)
+    # Values an older or newer version wrote fall back to the defaults one by one
+    config_manager.set_repo_setting('/repos/b', 'diff_options', {'algorithm': 'fancy', 'renames': False})
+    config_manager.flush()
+    reloaded = ConfigManager(config_file)
+    assert reloaded.get_repo_diff_options('/repos/a') == options
+    assert reloaded.get_repo_diff_options('/repos/b') == DEFAULT_DIFF_OPTIONS._replace(renames=False)
+
+
+def test_recent_repos(config_file, tmp_path):
+    config_manager = ConfigManager(config_file, flush_interval=60)
+    for number in range(MAX_RECENT_REPOS + 2):
+        config_manager.set_repo_dir(str(tmp_path / f'repo{number}'))
+    config_manager.set_repo_dir(str(tmp_path / 'repo5'))
+    recent = config_manager.get_recent_repos()
+    assert len(recent) == MAX_RECENT_REPOS
+    assert recent[:2] == [str(tmp_path / 'repo5'), str(tmp_path / f'repo{MAX_RECENT_REPOS + 1}')]
+    assert recent.count(str(tmp_path / 'repo5')) == 1
+    config_manager.flush()
@@ -0,0 +1,111 @@
+import json
+import os
+
+from DiffCache import INDEX_FILE_NAME, DiffCache
+
+
+def store_bytes(cache, tmp_path, key, size):
+    source = tmp_path / f'{key}.src'
+    source.write_bytes(b'x' * size)
+    cache.store(key, str(source))
+
+
+def test_make_key_depends_on_options():
+    assert DiffCache.make_key('a', 'b') == DiffCache.make_key('a', 'b', ())
+    assert DiffCache.make_key('a', 'b') != DiffCache.make_key('a', 'b', ('--no-renames',))
+    assert DiffCache.make_key('a', 'b') != DiffCache.make_key('b', 'a')
+
+
+def test_lookup_counts_hits_and_misses(tmp_path):
+    cache = DiffCache(str(tmp_path), max_bytes=1000)
+    store_bytes(cache, tmp_path, 'k1', 10)
+    with open(cache.lookup('k1'), 'rb') as cached_file:
+        assert cached_file.read() == b'x' * 10
+    assert cache.lookup('k2') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiffCache(str(tmp_path), max_bytes=300)
+    for key in ('k1', 'k2', 'k3'):
+        store_bytes(cache, tmp_path, key, 100)
+    assert cache.lookup('k1') is not None  # k2 is now the least recently used
+    store_bytes(cache, tmp_path, 'k4', 100)
+    assert list(cache.entries) == ['k3', 'k1', 'k4']
+    assert cache.lookup('k2') is None
+    assert not os.path.exists(cache.entry_path('k2'))
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] == 300
+
+
+def test_replacing_an_entry_keeps_the_size_right(tmp_path):
+    cache = DiffCache(str(tmp_path), max_bytes=300)
+    store_bytes(cache, tmp_path, 'k1', 100)
+    store_bytes(cache, tmp_path, 'k1', 50)
+    assert cache.stats()['bytes'] == 50
+    assert cache.stats()['entries'] == 1
+
+
+def test_oversized_diffs_are_not_cached(tmp_path):
+    cache = DiffCache(str(tmp_path), max_bytes=100)
+    store_bytes(cache, tmp_path, 'small', 60)
+    store_bytes(cache, tmp_path, 'huge', 101)
+    assert list(cache.entries) == ['small']
+
+
+def test_store_move(tmp_path):
+    cache = DiffCache(str(tmp_path))
+    temp_path = cache.temp_path('k1')
+    with open(temp_path, 'wb') as temp_file:
+        temp_file.write(b'diff')
+    cache.store('k1', temp_path, move=True)
+    assert not os.path.exists(temp_path)
+    assert cache.lookup('k1') == cache.entry_path('k1')
+
+
+def test_index_persists_recency(tmp_path):
+    cache = DiffCache(str(tmp_path), max_bytes=1000)
+    for key in ('k1', 'k2', 'k3'):
+        store_bytes(cache, tmp_path, key, 100)
+    cache.lookup('k1')
+    cache.save_index()
+
+    reloaded = DiffCache(str(tmp_path), max_bytes=1000)
+    assert list(reloaded.entries) == ['k2', 'k3', 'k1']
+    assert reloaded.total_bytes == 300
+
+
+def test_index_drops_missing_blobs(tmp_path):
+    cache = DiffCache(str(tmp_path))
+    store_bytes(cache, tmp_path, 'k1', 100)
+    store_bytes(cache, tmp_path, 'k2', 100)
+    cache.save_index()
+    os.remove(cache.entry_path('k1'))
+    reloaded = DiffCache(str(tmp_path))
+    assert list(reloaded.entries) == ['k2']
+    assert reloaded.total_bytes == 100
+
+
+def test_save_index_only_when_changed(tmp_path):
+    cache = DiffCache(str(tmp_path))
+    cache.save_index()
+    assert not os.path.exists(tmp_path / INDEX_FILE_NAME)
+    store_bytes(cache, tmp_path, 'k1', 10)
+    cache.save_index()
+    with open(tmp_path / INDEX_FILE_NAME) as index_file:
+        assert list(json.load(index_file)['entries']) == ['k1']
+
+
+def test_corrupt_index_starts_empty(tmp_path, capsys):
+    (tmp_path / INDEX_FILE_NAME).write_text('{not json')
+    cache = DiffCache(str(tmp_path))
+    assert cache.stats()['entries'] == 0
+    assert 'Error loading diff cache index' in capsys.readouterr().out
+
+
+def test_shared_per_config_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(DiffCache, '_instances', {})
+    first = DiffCache.shared(str(tmp_path / 'a'))
+    assert DiffCache.shared(str(tmp_path / 'a' / '.')) is first
+    assert DiffCache.shared(str(tmp_path / 'b')) is not first
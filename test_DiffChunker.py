@@ -0,0 +1,138 @@
+import json
+import os
+
+import pytest
+
+from DiffChunker import MIN_CHUNK_BYTES, DiffChunker, diff_file_name, estimate_tokens, tokens_to_bytes
+
+
+def file_diff(path, hunks, lines_per_hunk=10, width=40):
+    lines = [f'diff --git a/{path} b/{path}\n', f'--- a/{path}\n', f'+++ b/{path}\n']
+    for hunk in range(hunks):
+        lines.append(f'@@ -{hunk * 100 + 1},{lines_per_hunk} +{hunk * 100 + 1},{lines_per_hunk} @@\n')
+        lines.extend(f'+{path} {hunk} {line} '.ljust(width, 'x') + '\n' for line in range(lines_per_hunk))
+    return ''.join(lines).encode()
+
+
+def chunk(tmp_path, diff, budget, write_size=None):
+    chunker = DiffChunker(lambda number: str(tmp_path / f'out.part{number}.diff'), str(tmp_path / 'out.json'),
+                          budget, source='base..target')
+    write_size = write_size or len(diff) or 1
+    for start in range(0, len(diff), write_size):
+        chunker.write(diff[start:start + write_size])
+    chunker.close()
+    with open(tmp_path / 'out.json') as manifest_file:
+        manifest = json.load(manifest_file)
+    chunks = [(tmp_path / entry['path']).read_bytes() for entry in manifest['chunks']]
+    return manifest, chunks
+
+
+def test_token_estimates():
+    assert tokens_to_bytes(1000) == 4000
+    assert estimate_tokens(0) == 0
+    assert estimate_tokens(1) == 1
+    assert estimate_tokens(8) == 2
+
+
+def test_diff_file_name():
+    assert diff_file_name(b'diff --git a/old name.py b/new name.py\n') == 'new name.py'
+    assert diff_file_name(b'diff --cc src/merged.py\n') == 'src/merged.py'
+
+
+def test_small_diff_is_one_chunk(tmp_path):
+    diff = file_diff('a.py', 2) + file_diff('b.py', 1)
+    manifest, chunks = chunk(tmp_path, diff, 100000)
+    assert chunks == [diff]
+    assert manifest['source'] == 'base..target'
+    assert manifest['total_bytes'] == len(diff)
+    assert [entry['path'] for entry in manifest['chunks'][0]['files']] == ['a.py', 'b.py']
+    assert manifest['chunks'][0]['tokens'] == estimate_tokens(len(diff))
+
+
+def test_chunks_stay_within_budget_and_cut_between_files(tmp_path):
+    files = [file_diff(f'file_{number}.py', 1) for number in range(6)]
+    budget = 2 * len(files[0]) + 10
+    manifest, chunks = chunk(tmp_path, b''.join(files), budget)
+    assert all(len(data) <= budget for data in chunks)
+    assert chunks == [files[0] + files[1], files[2] + files[3], files[4] + files[5]]
+    assert [[entry['path'] for entry in entry_chunk['files']] for entry_chunk in manifest['chunks']] == \
+        [['file_0.py', 'file_1.py'], ['file_2.py', 'file_3.py'], ['file_4.py', 'file_5.py']]
+    assert [entry_chunk['bytes'] for entry_chunk in manifest['chunks']] == [len(data) for data in chunks]
+
+
+def test_split_file_repeats_its_header(tmp_path):
+    diff = file_diff('big.py', 8)
+    header = diff[:diff.index(b'@@')]
+    budget = MIN_CHUNK_BYTES
+    manifest, chunks = chunk(tmp_path, diff, budget)
+    assert len(chunks) > 1
+    assert all(len(data) <= budget for data in chunks)
+    assert all(data.startswith(header + b'@@ ') for data in chunks)
+    # Every hunk is whole, and the hunks add up to the original diff
+    assert b''.join(data[len(header):] for data in chunks) == diff[len(header):]
+    entries = [entry for entry_chunk in manifest['chunks'] for entry in entry_chunk['files']]
+    assert all(entry['path'] == 'big.py' and entry['split'] for entry in entries)
+    assert sum(entry['bytes'] for entry in entries) == manifest['total_bytes']
+
+
+def test_oversized_hunk_is_cut_between_lines(tmp_path):
+    diff = file_diff('huge.py', 1, lines_per_hunk=100)
+    hunk_header = diff.splitlines(keepends=True)[3]
+    manifest, chunks = chunk(tmp_path, diff, MIN_CHUNK_BYTES)
+    assert len(chunks) > 1
+    assert all(len(data) <= MIN_CHUNK_BYTES for data in chunks)
+    assert all(hunk_header in data for data in chunks)
+    body = [line for data in chunks for line in data.splitlines(keepends=True)[4:]]
+    assert b''.join(body) == b''.join(diff.splitlines(keepends=True)[4:])
+
+
+def test_split_writes_give_the_same_chunks(tmp_path):
+    diff = b''.join(file_diff(f'file_{number}.py', 3) for number in range(4))
+    (tmp_path / 'whole').mkdir()
+    (tmp_path / 'pieces').mkdir()
+    _, whole = chunk(tmp_path / 'whole', diff, 2048)
+    _, pieces = chunk(tmp_path / 'pieces', diff, 2048, write_size=7)
+    assert len(whole) > 1
+    assert whole == pieces
+
+
+def test_file_without_hunks_and_missing_final_newline(tmp_path):
+    diff = (b'diff --git a/logo.png b/logo.png\nBinary files a/logo.png and b/logo.png differ\n'
+            + file_diff('a.py', 1)[:-1])
+    manifest, chunks = chunk(tmp_path, diff, 100000)
+    assert chunks == [diff]
+    assert [entry['path'] for entry in manifest['chunks'][0]['files']] == ['logo.png', 'a.py']
+
+
+@pytest.mark.parametrize('write_size', [None, 1, 7])
+def test_lone_carriage_return_does_not_end_a_line(tmp_path, write_size):
+    lines = file_diff('a.py', 3).splitlines(keepends=True)
+    lines.insert(5, b'+crlf line\r\n')
+    # The last line of the second hunk crosses the budget only with what follows its lone '\r', so the
+    # chunk boundary falls inside that line if '\r' is taken for a line end
+    first_chunk = sum(len(line) for line in lines[:26])
+    carriage_line = b'+cr line'.ljust(MIN_CHUNK_BYTES - first_chunk - 8, b'x') + b'\r@@ -5 +5 @@ y\n'
+    lines.insert(26, carriage_line)
+    diff = b''.join(lines)
+    _, chunks = chunk(tmp_path, diff, MIN_CHUNK_BYTES, write_size)
+    assert len(chunks) == 2
+    assert all(data.endswith(b'\n') for data in chunks)
+    assert carriage_line in chunks[1]
+    assert chunks[1].startswith(diff[:diff.index(b'@@')] + b'@@ -101,')
+    hunk_headers = [line for data in chunks for line in data.split(b'\n') if line.startswith(b'@@')]
+    # The whole second hunk moved on to the next chunk
+    assert hunk_headers == [b'@@ -1,10 +1,10 @@', b'@@ -101,10 +101,10 @@', b'@@ -201,10 +201,10 @@']
+
+
+def test_stale_chunks_of_a_longer_run_are_removed(tmp_path):
+    diff = b''.join(file_diff(f'file_{number}.py', 3) for number in range(4))
+    chunk(tmp_path, diff, MIN_CHUNK_BYTES)
+    assert os.path.exists(tmp_path / 'out.part3.diff')
+    manifest, _ = chunk(tmp_path, file_diff('a.py', 1), MIN_CHUNK_BYTES)
+    assert len(manifest['chunks']) == 1
+    assert sorted(os.listdir(tmp_path)) == ['out.json', 'out.part1.diff']
+
+
+def test_budget_has_a_minimum(tmp_path):
+    manifest, _ = chunk(tmp_path, file_diff('a.py', 1), 10)
+    assert manifest['budget_bytes'] == MIN_CHUNK_BYTES
@@ -0,0 +1,97 @@
+import pytest
+
+from DiffExtractorCore import commit_range, diff_commit, iter_commit_pages, list_commits, refresh_commits
+from DiffOptions import MERGE_COMBINED, MERGE_PARENTS, DiffOptions
+from GitObjectReader import GitObjectReader
+
+
+@pytest.fixture
+def merge_repo(git_repo):
+    """ main with a conflict-free merge of feature. Returns (repo, {name: hash}). """
+    commits = {'root': git_repo.commit('root', {'a.txt': 'a\n', 'b.txt': 'b\n'})}
+    commits['main'] = git_repo.commit('main change', {'a.txt': 'a 2\n'})
+    git_repo.git('checkout', '-q', '-b', 'feature', commits['root'])
+    commits['feature'] = git_repo.commit('feature change', {'b.txt': 'b 2\n'})
+    git_repo.git('checkout', '-q', 'main')
+    git_repo.git('merge', '-q', '--no-ff', '-m', 'Merge pull request #7 from feature', 'feature')
+    commits['merge'] = git_repo.git('rev-parse', 'HEAD')
+    yield git_repo, commits
+    GitObjectReader.close_all()
+
+
+def test_commit_range(merge_repo):
+    git_repo, commits = merge_repo
+    assert commit_range(git_repo.path, commits['main']) == (commits['root'], commits['main'])
+    assert commit_range(git_repo.path, commits['merge']) == (commits['main'], commits['merge'])
+    assert commit_range(git_repo.path, commits['merge'], merge_mode=MERGE_PARENTS) == \
+        (commits['main'], commits['feature'])
+    # Modes git diffs from the merge alone list the changes against the first parent
+    assert commit_range(git_repo.path, commits['merge'], merge_mode=MERGE_COMBINED) == \
+        (commits['main'], commits['merge'])
+    with pytest.raises(ValueError):
+        commit_range(git_repo.path, commits['root'])
+
+
+def test_listing_with_and_without_the_index(merge_repo, tmp_path):
+    git_repo, commits = merge_repo
+    streamed = [record.hash for record in list_commits(git_repo.path)]
+    indexed = [record.hash for record in list_commits(git_repo.path, index_dir=str(tmp_path / 'config'))]
+    assert streamed == indexed
+    assert streamed[0] == commits['merge'] and len(streamed) == 4
+    pages = list(iter_commit_pages(git_repo.path, 'prs', index_dir=str(tmp_path / 'config')))
+    assert [[record.hash for record in page] for page in pages] == [[commits['merge']]]
+
+
+def test_refresh_commits(merge_repo, tmp_path):
+    git_repo, _ = merge_repo
+    refresh_commits(git_repo.path, index_dir=str(tmp_path / 'config'))
+    new_commit = git_repo.commit('after the merge')
+    result, records = refresh_commits(git_repo.path, index_dir=str(tmp_path / 'config'))
+    assert (result.new_commits, result.rebuilt) == (1, False)
+    assert [record.hash for record in records] == [new_commit]
+    result, records = refresh_commits(git_repo.path, 'merges', index_dir=str(tmp_path / 'config'))
+    assert (result.new_commits, records) == (0, [])
+
+
+def test_diff_commit(merge_repo, tmp_path):
+    git_repo, commits = merge_repo
+    run = diff_commit(git_repo.path, [commits['merge'], commits['root']], str(tmp_path))
+    results = {result.commit: result for result in run.results}
+    with open(results[commits['merge']].path) as diff_file:
+        assert diff_file.read() == git_repo.git('diff', commits['main'], commits['merge']) + '\n'
+    assert results[commits['root']].path is None
+    assert 'initial commit' in results[commits['root']].warning
+    with open(run.index_path) as index_file:
+        index = index_file.read()
+    assert commits['merge'] in index and 'skipped' in index
+
+
+def test_diff_commit_merge_modes(merge_repo, tmp_path):
+    git_repo, commits = merge_repo
+    run = diff_commit(git_repo.path, [commits['merge']], str(tmp_path),
+                      diff_options=DiffOptions(merge_mode=MERGE_PARENTS))
+    with open(run.results[0].path) as diff_file:
+        text = diff_file.read()
+    assert '+b 2' in text and '-a 2' in text
+    # A clean merge resolves nothing, so its combined diff is empty
+    run = diff_commit(git_repo.path, [commits['merge']], str(tmp_path),
+                      diff_options=DiffOptions(merge_mode=MERGE_COMBINED))
+    with open(run.results[0].path) as diff_file:
+        assert diff_file.read() == ''
+
+
+def test_unknown_commit_is_skipped_with_a_warning(merge_repo, tmp_path):
+    git_repo, commits = merge_repo
+    unknown = 'f' * 40
+    run = diff_commit(git_repo.path, [commits['main'], unknown, 'no-such-branch', commits['merge']], str(tmp_path))
+    assert [result.commit for result in run.results] == [commits['main'], unknown, 'no-such-branch',
+                                                         commits['merge']]
+    results = {result.commit: result for result in run.results}
+    for bad in (unknown, 'no-such-branch'):
+        assert results[bad].path is None
+        assert results[bad].warning.startswith(f'Unable to resolve commit {bad}')
+    assert results[commits['main']].path and results[commits['merge']].path
+    with open(run.index_path) as index_file:
+        assert f'{unknown}\tskipped' in index_file.read()
+    with pytest.raises(ValueError, match='Unable to resolve commit'):
+        commit_range(git_repo.path, unknown)
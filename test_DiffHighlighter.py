@@ -0,0 +1,80 @@
+from pygments.lexers import PythonLexer
+
+from DiffHighlighter import (TokenCache, highlight_diff, highlight_section, hunk_prefix_width, section_key,
+                             split_sections)
+
+LEXER = PythonLexer(stripnl=False, ensurenl=False)
+
+
+def token_columns(tokens):
+    return [tokens[index] for index in range(0, len(tokens), 3)]
+
+
+def test_split_sections():
+    lines = ['diff --git a/a.py b/a.py\n', '@@ -1 +1 @@\n', '+x\n', 'diff --cc b.py\n', '@@@ -1 -1 +1 @@@\n']
+    assert [(start, path, len(section)) for start, path, section in split_sections(lines)] == \
+        [(0, 'a.py', 3), (3, 'b.py', 2)]
+
+
+def test_section_key_follows_content():
+    section = ['diff --git a/a.py b/a.py\n', 'index 1111111..2222222 100644\n', '@@ -1 +1 @@\n', '+x = 1\n']
+    other_context = section[:3] + ['+x  = 1\n']
+    assert section_key(section, LEXER) == section_key(list(section), LEXER)
+    assert section_key(section, LEXER) != section_key(other_context, LEXER)
+
+
+def test_hunk_prefix_width():
+    assert hunk_prefix_width('@@ -1,2 +1,2 @@ def f():\n') == 1
+    assert hunk_prefix_width('@@@ -1 -1 +1 @@@\n') == 2
+    assert hunk_prefix_width('@@@@ -1 -1 -1 +1 @@@@\n') == 3
+
+
+def test_highlight_section_skips_headers():
+    section = ['diff --git a/a.py b/a.py\n', '--- a/a.py\n', '+++ b/a.py\n', '@@ -1,2 +1,2 @@\n',
+               '-import os\n', '+import sys\n', ' -- not a header\n']
+    line_tokens = highlight_section(section, LEXER)
+    assert [bool(tokens) for tokens in line_tokens] == [False, False, False, False, True, True, True]
+    # Columns count from the start of the line, past the one-column prefix
+    assert token_columns(line_tokens[5])[0] == 1
+
+
+def test_highlight_removed_line_looking_like_a_header():
+    section = ['diff --git a/a.py b/a.py\n', '@@ -1,2 +1 @@\n', '--- x\n', ' y = 2\n']
+    line_tokens = highlight_section(section, LEXER)
+    assert line_tokens[2]
+    assert min(token_columns(line_tokens[2])) >= 1
+
+
+def test_highlight_combined_diff_prefixes():
+    section = ['diff --cc a.py\n', 'index 1,2..3\n', '@@@ -1,1 -1,1 +1,2 @@@\n', '++import os\n',
+               '+ import sys\n', '  value = 1\n']
+    line_tokens = highlight_section(section, LEXER)
+    assert not line_tokens[0] and not line_tokens[1] and not line_tokens[2]
+    # The keywords start right after the two prefix columns
+    for number in (3, 4):
+        column, length, _ = line_tokens[number][:3]
+        assert (column, section[number][column:column + length]) == (2, 'import')
+    column, length, _ = line_tokens[5][:3]
+    assert section[5][column:column + length] == '='
+
+
+def test_highlight_diff_serves_sections_from_the_cache(monkeypatch):
+    cache = TokenCache()
+    monkeypatch.setattr('DiffHighlighter.TOKEN_CACHE', cache)
+    lines = ['diff --git a/a.py b/a.py\n', '@@ -1 +1 @@\n', '+import os\n',
+             'diff --git a/notes.unknownext b/notes.unknownext\n', '@@ -1 +1 @@\n', '+text\n']
+    batches = []
+    highlight_diff(lines, publish=batches.append)
+    assert sorted(line for batch in batches for line in batch) == [2]
+    assert len(cache.entries) == 1
+    highlight_diff(lines, publish=batches.append)
+    assert len(cache.entries) == 1
+
+
+def test_token_cache_evicts_least_recently_used():
+    cache = TokenCache(max_entries=6)
+    cache.put('a', [[1, 2, 3]])
+    cache.put('b', [[1, 2, 3]])
+    assert cache.get('a') is not None
+    cache.put('c', [[1, 2, 3]])
+    assert list(cache.entries) == ['a', 'c']
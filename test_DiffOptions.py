@@ -0,0 +1,47 @@
+from DiffOptions import (DEFAULT_DIFF_OPTIONS, MERGE_COMBINED, MERGE_MODES, MERGE_REMERGE, DiffOptions,
+                         describe_diff_options, diff_command, diff_engine_args, diff_options_from_settings,
+                         diff_options_variants)
+
+
+def test_default_options_add_no_arguments():
+    assert diff_engine_args(None) == []
+    assert diff_engine_args(DEFAULT_DIFF_OPTIONS) == []
+    assert diff_command('a', 'b') == ['diff', 'a', 'b']
+
+
+def test_engine_args():
+    options = DiffOptions(algorithm='histogram', rename_limit=500, whitespace='ignore-all-space', copies=True)
+    assert diff_engine_args(options) == ['--diff-algorithm=histogram', '-C', '-l500', '--ignore-all-space']
+
+
+def test_no_renames_drops_copies_and_limit():
+    assert diff_engine_args(DiffOptions(renames=False, rename_limit=500, copies=True)) == ['--no-renames']
+    assert describe_diff_options(DiffOptions(renames=False, copies=True)) == \
+        'first-parent, default algorithm, no renames'
+
+
+def test_single_commit_merge_modes():
+    assert diff_command(None, 'merge', DiffOptions(merge_mode=MERGE_COMBINED)) == \
+        ['show', '--format=', '--cc', 'merge']
+    assert diff_command(None, 'merge', DiffOptions(merge_mode=MERGE_REMERGE, algorithm='patience')) == \
+        ['show', '--format=', '--remerge-diff', '--diff-algorithm=patience', 'merge']
+
+
+def test_options_from_settings():
+    assert diff_options_from_settings(None) == DEFAULT_DIFF_OPTIONS
+    assert diff_options_from_settings(DiffOptions(algorithm='minimal', copies=True)._asdict()) == \
+        DiffOptions(algorithm='minimal', copies=True)
+    assert diff_options_from_settings({'merge_mode': 'octopus', 'algorithm': 'fancy', 'whitespace': 'none',
+                                       'rename_limit': -3, 'unknown': 1}) == DEFAULT_DIFF_OPTIONS
+    assert diff_options_from_settings({'rename_limit': None, 'renames': 0}) == DiffOptions(renames=False)
+
+
+def test_variants_start_with_the_options_and_are_unique():
+    variants = diff_options_variants(DiffOptions(algorithm='histogram'))
+    assert variants[0] == DiffOptions(algorithm='histogram')
+    assert len(variants) == len(set(variants))
+    assert {variant.merge_mode for variant in variants} == set(MERGE_MODES)
+    assert DiffOptions(algorithm='histogram', copies=True) in variants
+    assert DiffOptions(algorithm='histogram', renames=False) in variants
+    # Copies do not apply without rename detection
+    assert not any(variant.copies for variant in diff_options_variants(DiffOptions(renames=False)))
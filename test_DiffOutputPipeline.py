@@ -0,0 +1,145 @@
+import gzip
+import os
+import subprocess
+
+import pytest
+
+import DiffOutputPipeline as pipeline_module
+from BatchDiffGenerator import diff_cache_key, write_cached_diff
+from DiffCache import DiffCache
+from DiffOutputPipeline import (COMPRESSION_GZIP, COMPRESSION_NONE, COMPRESSION_ZSTD, TRUNCATION_MARKER,
+                                available_compressions, copy_to_output, open_output, open_sink, output_path,
+                                write_git_output)
+
+# Neither UTF-8 nor text: NUL bytes, invalid sequences, a lone '\r' and no final newline
+BINARY = bytes(range(256)) * 64 + b'\xff\xfe\r\x80'
+
+
+@pytest.fixture
+def diff_repo(git_repo):
+    """ A repository whose second commit rewrites a large text file. Returns (repo, base, target). """
+    base = git_repo.commit('base', {'big.txt': ''.join(f'line {number}\n' for number in range(5000))})
+    target = git_repo.commit('rewrite', {'big.txt': ''.join(f'changed {number}\n' for number in range(5000))})
+    return git_repo, base, target
+
+
+def write_output(path, data, compression=COMPRESSION_NONE, max_bytes=None, tee_path=None):
+    output = open_output(path, compression, max_bytes, tee_path)
+    for start in range(0, len(data), 1000):
+        if not output.write(data[start:start + 1000]):
+            break
+    return output.close()
+
+
+def test_output_path():
+    assert output_path('a.diff', COMPRESSION_NONE) == 'a.diff'
+    assert output_path('a.diff', None) == 'a.diff'
+    assert output_path('a.diff', COMPRESSION_GZIP) == 'a.diff.gz'
+    assert output_path('a.diff', COMPRESSION_ZSTD) == 'a.diff.zst'
+
+
+def test_gzip_round_trip(tmp_path):
+    path = output_path(str(tmp_path / 'out.diff'), COMPRESSION_GZIP)
+    stats = write_output(path, BINARY, COMPRESSION_GZIP)
+    with gzip.open(path, 'rb') as compressed:
+        assert compressed.read() == BINARY
+    assert (stats.path, stats.bytes_in, stats.truncated) == (path, len(BINARY), False)
+    assert stats.bytes_written == os.path.getsize(path) < len(BINARY)
+
+
+def test_zstd_round_trip(tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    path = output_path(str(tmp_path / 'out.diff'), COMPRESSION_ZSTD)
+    stats = write_output(path, BINARY, COMPRESSION_ZSTD)
+    with open(path, 'rb') as compressed:
+        assert zstandard.ZstdDecompressor().stream_reader(compressed).read() == BINARY
+    assert stats.bytes_in == len(BINARY)
+
+
+def test_zstd_without_the_package(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline_module, 'zstandard', None)
+    assert COMPRESSION_ZSTD not in available_compressions()
+    with pytest.raises(RuntimeError):
+        open_sink(str(tmp_path / 'out.diff.zst'), COMPRESSION_ZSTD)
+
+
+@pytest.mark.parametrize('compression', [COMPRESSION_NONE, COMPRESSION_GZIP])
+def test_truncation_writes_the_marker(tmp_path, compression):
+    path = output_path(str(tmp_path / 'out.diff'), compression)
+    tee_path = str(tmp_path / 'tee')
+    stats = write_output(path, BINARY, compression, max_bytes=2500, tee_path=tee_path)
+    marker = TRUNCATION_MARKER.format(limit=2500).encode()
+    with (gzip.open if compression else open)(path, 'rb') as output_file:
+        assert output_file.read() == BINARY[:2500] + marker
+    assert (stats.bytes_in, stats.truncated) == (2500, True)
+    assert stats.bytes_written == os.path.getsize(path)
+    # The tee gets the raw diff only, never the marker
+    with open(tee_path, 'rb') as tee_file:
+        assert tee_file.read() == BINARY[:2500]
+
+
+def test_output_exactly_at_the_limit_is_not_truncated(tmp_path):
+    stats = write_output(str(tmp_path / 'out.diff'), BINARY[:3000], max_bytes=3000)
+    assert (stats.bytes_in, stats.bytes_written, stats.truncated) == (3000, 3000, False)
+
+
+def test_copy_to_output(tmp_path):
+    (tmp_path / 'source').write_bytes(BINARY)
+    stats = copy_to_output(str(tmp_path / 'source'), str(tmp_path / 'copy'), max_bytes=100)
+    assert (tmp_path / 'copy').read_bytes() == BINARY[:100] + TRUNCATION_MARKER.format(limit=100).encode()
+    assert stats.truncated
+
+
+def test_write_git_output_keeps_binary_data(git_repo, tmp_path):
+    git_repo.commit('binary', {'data.bin': BINARY})
+    stats = write_git_output(git_repo.path, ['cat-file', 'blob', 'HEAD:data.bin'], str(tmp_path / 'out'))
+    assert (tmp_path / 'out').read_bytes() == BINARY
+    assert (stats.bytes_in, stats.bytes_written, stats.truncated) == (len(BINARY), len(BINARY), False)
+
+
+def test_write_git_output_keeps_non_utf8_diffs(git_repo, tmp_path):
+    base = git_repo.commit('latin-1', {'names.txt': 'caf\xe9\n'.encode('latin-1')})
+    target = git_repo.commit('more latin-1', {'names.txt': 'caf\xe9\nna\xefve\r\n'.encode('latin-1')})
+    path = str(tmp_path / 'out.diff')
+    write_git_output(git_repo.path, ['diff', base, target], path)
+    with open(path, 'rb') as diff_file:
+        diff = diff_file.read()
+    assert diff == subprocess.run(['git', 'diff', base, target], cwd=git_repo.path, capture_output=True,
+                                  check=True).stdout
+    assert b'+na\xefve\r\n' in diff
+
+
+def test_write_git_output_truncates_and_stops_git(diff_repo, tmp_path):
+    git_repo, base, target = diff_repo
+    path = str(tmp_path / 'out.diff')
+    stats = write_git_output(git_repo.path, ['diff', base, target], path, max_bytes=1000)
+    assert (stats.bytes_in, stats.truncated) == (1000, True)
+    with open(path, 'rb') as diff_file:
+        assert diff_file.read().endswith(TRUNCATION_MARKER.format(limit=1000).encode())
+
+
+def test_write_git_output_raises_git_errors(git_repo, tmp_path):
+    git_repo.commit('first')
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        write_git_output(git_repo.path, ['cat-file', 'blob', 'HEAD:missing.txt'], str(tmp_path / 'out'))
+    assert 'missing.txt' in error.value.stderr
+
+
+def test_truncated_diffs_are_not_cached(diff_repo, tmp_path):
+    git_repo, base, target = diff_repo
+    cache = DiffCache(str(tmp_path / 'config'))
+    key = diff_cache_key(base, target)
+    stats = write_cached_diff(git_repo.path, base, target, str(tmp_path / 'truncated.diff'), cache, max_bytes=1000)
+    assert stats.truncated
+    assert cache.lookup(key) is None
+    assert cache.stats()['entries'] == 0
+    assert os.listdir(cache.cache_dir) == []
+
+    stats = write_cached_diff(git_repo.path, base, target, str(tmp_path / 'whole.diff'), cache)
+    assert not stats.truncated
+    with open(cache.lookup(key), 'rb') as cached_file:
+        assert cached_file.read() == (tmp_path / 'whole.diff').read_bytes()
+    # A limited diff served from the cache is truncated the same way
+    stats = write_cached_diff(git_repo.path, base, target, str(tmp_path / 'cached.diff'), cache, max_bytes=1000)
+    assert stats.truncated
+    assert (tmp_path / 'cached.diff').read_bytes() == (tmp_path / 'truncated.diff').read_bytes()
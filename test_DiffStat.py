@@ -0,0 +1,75 @@
+from DiffCache import DiffCache
+from DiffOptions import DiffOptions
+from DiffStat import (FileStat, describe_file_stats, diff_stat, file_patch, parse_diff_stat, pathspec_args,
+                      split_pathspecs)
+
+ZERO = '0' * 40
+BLOB = '1' * 40
+
+
+def test_parse_diff_stat():
+    output = '\0'.join([
+        f':100644 100644 {BLOB} {BLOB} M', 'src/a file.py',
+        f':000000 100644 {ZERO} {BLOB} A', 'logo.png',
+        f':100644 100644 {BLOB} {BLOB} R087', 'old/name.py', 'new/name.py',
+        f':100644 100644 {BLOB} {BLOB} C100', 'base.py', 'copy.py',
+        '3\t1\tsrc/a file.py',
+        '-\t-\tlogo.png',
+        '2\t2\t', 'old/name.py', 'new/name.py',
+        '0\t0\t', 'base.py', 'copy.py',
+        '',
+    ])
+    assert parse_diff_stat(output) == [
+        FileStat('src/a file.py', None, 'M', 3, 1),
+        FileStat('logo.png', None, 'A', None, None),
+        FileStat('new/name.py', 'old/name.py', 'R', 2, 2),
+        FileStat('copy.py', 'base.py', 'C', 0, 0),
+    ]
+
+
+def test_parse_empty_diff_stat():
+    assert parse_diff_stat('') == []
+
+
+def test_pathspecs():
+    assert split_pathspecs(' src "docs/my file.md" ') == ['src', 'docs/my file.md']
+    assert split_pathspecs('  ') == []
+    assert pathspec_args() == []
+    assert pathspec_args(['src']) == ['--', 'src']
+    assert pathspec_args(exclude=['*.lock']) == ['--', ':(exclude)*.lock']
+
+
+def test_describe_file_stats():
+    assert describe_file_stats([FileStat('a', None, 'M', 3, 1), FileStat('b', None, 'A', None, None)]) == \
+        '2 files, +3 -1'
+
+
+def test_diff_stat_of_a_repository(git_repo):
+    lines = ''.join(f'line {number}\n' for number in range(20))
+    base = git_repo.commit('base', {'old.txt': lines, 'keep.txt': 'a\nb\n', 'image.bin': b'\0\1\2'})
+    target = git_repo.commit('change', {'new.txt': lines + 'more\n', 'keep.txt': 'a\nc\nd\n', 'image.bin': b'\0\3'},
+                             remove=['old.txt'])
+    assert diff_stat(git_repo.path, base, target) == [
+        FileStat('image.bin', None, 'M', None, None),
+        FileStat('keep.txt', None, 'M', 2, 1),
+        FileStat('new.txt', 'old.txt', 'R', 1, 0),
+    ]
+    without_renames = diff_stat(git_repo.path, base, target, diff_options=DiffOptions(renames=False))
+    assert [(file_stat.status, file_stat.path) for file_stat in without_renames] == \
+        [('M', 'image.bin'), ('M', 'keep.txt'), ('A', 'new.txt'), ('D', 'old.txt')]
+    assert diff_stat(git_repo.path, base, target, pathspec_args(['keep.txt'])) == \
+        [FileStat('keep.txt', None, 'M', 2, 1)]
+
+
+def test_file_patch_is_cached(git_repo, tmp_path):
+    base = git_repo.commit('base', {'a.txt': 'one\n'})
+    target = git_repo.commit('change', {'a.txt': 'two\n'})
+    cache = DiffCache(str(tmp_path / 'config'))
+    file_stat = FileStat('a.txt', None, 'M', 1, 1)
+    patch = file_patch(git_repo.path, base, target, file_stat, cache)
+    assert '-one\n+two\n' in patch
+    assert file_patch(git_repo.path, base, target, file_stat, cache) == patch
+    assert cache.stats()['hits'] == 1
+    # Other engine options are another cache entry
+    file_patch(git_repo.path, base, target, file_stat, cache, diff_options=DiffOptions(algorithm='patience'))
+    assert cache.stats()['entries'] == 2
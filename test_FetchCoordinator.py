@@ -0,0 +1,235 @@
+import subprocess
+import threading
+
+import pytest
+
+import FetchCoordinator as fetch_module
+from FetchCoordinator import FetchCoordinator, branch_refspec
+from GitProcess import CancelToken, GitCancelled
+
+subprocess_run_git = fetch_module.run_git
+
+
+class GitCalls:
+    """ Stands in for run_git in FetchCoordinator: records the fetches and holds them at a gate until released. """
+
+    def __init__(self):
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+        self._lock = threading.Lock()
+
+    def __call__(self, repo_dir, args, token=None, **kwargs):
+        with self._lock:
+            self.calls.append(args)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        self.started.set()
+        try:
+            assert self.gate.wait(10)
+            return subprocess_run_git(repo_dir, args, token, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def remote(git_repo, tmp_path, monkeypatch):
+    """ (upstream repository pushing to a local bare origin, clone of origin, recorded git calls) """
+    git_repo.commit('base', {'a.txt': 'a\n'})
+    git_repo.git('branch', 'feature')
+    origin_dir = str(tmp_path / 'origin.git')
+    work_dir = str(tmp_path / 'work')
+    git_repo.git('clone', '-q', '--bare', git_repo.path, origin_dir)
+    git_repo.git('remote', 'add', 'origin', origin_dir)
+    git_repo.git('clone', '-q', origin_dir, work_dir)
+    calls = GitCalls()
+    monkeypatch.setattr(fetch_module, 'run_git', calls)
+    return git_repo, work_dir, calls
+
+
+def remote_tip(work_dir, branch):
+    return subprocess.run(['git', 'rev-parse', f'origin/{branch}'], cwd=work_dir, check=True, capture_output=True,
+                          text=True).stdout.strip()
+
+
+def push(git_repo, branch, message):
+    git_repo.git('checkout', '-q', branch)
+    commit_hash = git_repo.commit(message, {f'{branch}.txt': message})
+    git_repo.git('push', '-q', 'origin', branch)
+    return commit_hash
+
+
+def in_thread(target, *args, **kwargs):
+    """ Run target on a thread; returns (thread, outcome) with outcome['result'] or outcome['error'] once joined. """
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = target(*args, **kwargs)
+        except BaseException as e:
+            outcome['error'] = e
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def waiting_progress():
+    """ A progress callback and the event it sets once its caller waits for another fetch. """
+    waiting = threading.Event()
+    return (lambda message: waiting.set() if message.startswith('Waiting') else None), waiting
+
+
+def test_branch_refspec():
+    assert branch_refspec('origin/feature/x') == '+refs/heads/feature/x:refs/remotes/origin/feature/x'
+    assert branch_refspec('main') == '+refs/heads/main:refs/remotes/origin/main'
+
+
+def test_no_second_fetch_within_the_freshness_window(remote):
+    _, work_dir, calls = remote
+    coordinator = FetchCoordinator(work_dir)
+    coordinator.freshness = 300
+    assert coordinator.fetch()
+    assert not coordinator.fetch()
+    # A full fetch is fresh for every refspec
+    assert not coordinator.fetch([branch_refspec('feature')])
+    assert coordinator.fetch(force=True)
+    assert len(calls.calls) == 2
+
+    coordinator.invalidate()
+    assert coordinator.fetch()
+    coordinator.freshness = 0
+    assert coordinator.fetch()
+    assert len(calls.calls) == 4
+
+
+def test_concurrent_callers_share_one_fetch(remote):
+    git_repo, work_dir, calls = remote
+    tip = push(git_repo, 'main', 'main 2')
+    coordinator = FetchCoordinator(work_dir)
+    calls.gate.clear()
+    owner, owner_outcome = in_thread(coordinator.fetch)
+    assert calls.started.wait(10)
+    progress, waiting = waiting_progress()
+    joined, joined_outcome = in_thread(coordinator.fetch, progress=progress)
+    assert waiting.wait(10)
+    calls.gate.set()
+    owner.join(10)
+    joined.join(10)
+    assert owner_outcome == {'result': True}
+    assert joined_outcome == {'result': True}
+    assert len(calls.calls) == 1
+    assert remote_tip(work_dir, 'main') == tip
+
+
+def test_refspec_fetch_updates_only_its_branch(remote):
+    git_repo, work_dir, calls = remote
+    main_before = remote_tip(work_dir, 'main')
+    feature_tip = push(git_repo, 'feature', 'feature 2')
+    push(git_repo, 'main', 'main 2')
+    coordinator = FetchCoordinator(work_dir)
+    assert coordinator.fetch([branch_refspec('origin/feature')])
+    assert remote_tip(work_dir, 'feature') == feature_tip
+    assert remote_tip(work_dir, 'main') == main_before
+    assert coordinator.isFresh([branch_refspec('feature')])
+    assert not coordinator.isFresh([branch_refspec('feature'), branch_refspec('main')])
+    assert not coordinator.isFresh()
+
+
+def test_failed_fetch_is_raised_to_joined_callers_and_not_fresh(remote):
+    git_repo, work_dir, calls = remote
+    refspecs = [branch_refspec('feature')]
+    coordinator = FetchCoordinator(work_dir)
+    coordinator.freshness = 300
+    assert coordinator.fetch(refspecs)
+    subprocess.run(['git', 'remote', 'set-url', 'origin', str(work_dir) + '-missing'], cwd=work_dir, check=True)
+
+    calls.gate.clear()
+    calls.started.clear()
+    owner, owner_outcome = in_thread(coordinator.fetch, refspecs, force=True)
+    assert calls.started.wait(10)
+    progress, waiting = waiting_progress()
+    joined, joined_outcome = in_thread(coordinator.fetch, refspecs, progress=progress, force=True)
+    assert waiting.wait(10)
+    calls.gate.set()
+    owner.join(10)
+    joined.join(10)
+    assert isinstance(owner_outcome['error'], subprocess.CalledProcessError)
+    assert joined_outcome['error'] is owner_outcome['error']
+    assert len(calls.calls) == 2
+    assert not coordinator.isFresh(refspecs)
+
+
+def test_cancelled_owner_makes_joined_callers_fetch(remote):
+    git_repo, work_dir, calls = remote
+    tip = push(git_repo, 'main', 'main 2')
+    coordinator = FetchCoordinator(work_dir)
+    token = CancelToken()
+    calls.gate.clear()
+    owner, owner_outcome = in_thread(coordinator.fetch, token=token)
+    assert calls.started.wait(10)
+    progress, waiting = waiting_progress()
+    joined, joined_outcome = in_thread(coordinator.fetch, progress=progress)
+    assert waiting.wait(10)
+    token.cancel()
+    calls.gate.set()
+    owner.join(10)
+    joined.join(10)
+    assert isinstance(owner_outcome['error'], GitCancelled)
+    assert joined_outcome == {'result': True}
+    assert len(calls.calls) == 2
+    assert remote_tip(work_dir, 'main') == tip
+    assert coordinator.isFresh()
+
+
+def test_full_fetch_waits_for_a_running_refspec_fetch(remote):
+    git_repo, work_dir, calls = remote
+    push(git_repo, 'feature', 'feature 2')
+    main_tip = push(git_repo, 'main', 'main 2')
+    coordinator = FetchCoordinator(work_dir)
+    calls.gate.clear()
+    refspec_fetch, refspec_outcome = in_thread(coordinator.fetch, [branch_refspec('feature')])
+    assert calls.started.wait(10)
+    progress, waiting = waiting_progress()
+    full_fetch, full_outcome = in_thread(coordinator.fetch, progress=progress)
+    assert waiting.wait(10)
+    assert len(calls.calls) == 1
+    calls.gate.set()
+    refspec_fetch.join(10)
+    full_fetch.join(10)
+    assert refspec_outcome == {'result': True}
+    assert full_outcome == {'result': True}
+    assert [call[2:] for call in calls.calls] == [[branch_refspec('feature')], []]
+    assert calls.max_active == 1
+    assert remote_tip(work_dir, 'main') == main_tip
+    assert coordinator.isFresh()
+
+
+def test_refspec_fetch_joins_a_running_full_fetch(remote):
+    _, work_dir, calls = remote
+    coordinator = FetchCoordinator(work_dir)
+    coordinator.freshness = 300
+    calls.gate.clear()
+    full_fetch, _ = in_thread(coordinator.fetch)
+    assert calls.started.wait(10)
+    progress, waiting = waiting_progress()
+    refspec_fetch, outcome = in_thread(coordinator.fetch, [branch_refspec('feature')], progress=progress)
+    assert waiting.wait(10)
+    calls.gate.set()
+    full_fetch.join(10)
+    refspec_fetch.join(10)
+    assert outcome == {'result': True}
+    assert len(calls.calls) == 1
+
+
+def test_background_fetch_reports_errors(remote):
+    _, work_dir, _ = remote
+    subprocess.run(['git', 'remote', 'set-url', 'origin', str(work_dir) + '-missing'], cwd=work_dir, check=True)
+    coordinator = FetchCoordinator(work_dir)
+    errors = []
+    coordinator.fetchInBackground(on_error=errors.append).join(30)
+    assert len(errors) == 1 and coordinator.last_error is errors[0]
+    assert not coordinator.isFresh()
@@ -0,0 +1,54 @@
+import subprocess
+
+import pytest
+
+from GitLogReader import CommitRecord, GitLogReader, parse_commit_record
+
+
+def test_parse_commit_record():
+    raw = b'a' * 40 + b'\x1f' + b'b' * 40 + b' ' + b'c' * 40 + b'\x1fAda Lovelace\x1f1600000060\x1fMerge #12'
+    assert parse_commit_record(raw) == CommitRecord('a' * 40, ('b' * 40, 'c' * 40), 'Ada Lovelace', 1600000060,
+                                                    'Merge #12')
+
+
+def test_parse_root_commit_and_separators_in_subject():
+    record = parse_commit_record('abc\x1f\x1fGrace\x1f\x1fodd \x1f subject\ncommit 123'.encode())
+    assert record.parents == ()
+    assert record.date == 0
+    assert record.subject == 'odd \x1f subject\ncommit 123'
+
+
+def test_parse_invalid_utf8():
+    record = parse_commit_record(b'abc\x1f\x1f\xff\x1f1\x1fsubject')
+    assert record.author == '�'
+
+
+def test_iter_commits_newest_first(git_repo):
+    hashes = [git_repo.commit(f'change {number}', {'file.txt': f'{number}\n'}) for number in range(5)]
+    records = list(GitLogReader(git_repo.path).iter_commits())
+    assert [record.hash for record in records] == hashes[::-1]
+    assert [record.subject for record in records] == [f'change {number}' for number in reversed(range(5))]
+    assert records[-1].parents == ()
+    assert all(record.parents == (parent,) for record, parent in zip(records, hashes[-2::-1]))
+    assert records[0].author == 'Ada Lovelace'
+
+
+def test_iter_commits_subject_with_newlines(git_repo):
+    git_repo.commit('commit deadbeef\nsecond line\n\nbody\ncommit cafe')
+    git_repo.commit('next')
+    records = list(GitLogReader(git_repo.path).iter_commits())
+    assert [record.subject for record in records] == ['next', 'commit deadbeef second line']
+
+
+def test_iter_pages(git_repo):
+    for number in range(5):
+        git_repo.commit(f'change {number}')
+    pages = list(GitLogReader(git_repo.path, ['--first-parent']).iter_pages(page_size=2))
+    assert [len(page) for page in pages] == [2, 2, 1]
+
+
+def test_iter_commits_error(git_repo):
+    git_repo.commit('only')
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        list(GitLogReader(git_repo.path, ['no-such-ref']).iter_commits())
+    assert 'no-such-ref' in error.value.stderr
@@ -0,0 +1,142 @@
+import hashlib
+import itertools
+
+import pytest
+
+from conftest import EPOCH
+from GitObjectReader import GitObjectReader
+
+
+@pytest.fixture
+def reader_repo(git_repo):
+    yield git_repo, GitObjectReader.shared(git_repo.path)
+    GitObjectReader.close_all()
+
+
+def blob_id(content):
+    return hashlib.sha1(b'blob %d\0' % len(content) + content).hexdigest()
+
+
+def ambiguous_blobs():
+    """ Two blob contents whose object ids share their first four digits, the shortest prefix git accepts. """
+    seen = {}
+    for number in itertools.count():
+        content = b'%d\n' % number
+        prefix = blob_id(content)[:4]
+        if prefix in seen:
+            return seen[prefix], content
+        seen[prefix] = content
+
+
+def test_info_and_read(reader_repo):
+    git_repo, reader = reader_repo
+    git_repo.commit('first', {'a.txt': 'alpha\n'})
+    blob = git_repo.git('rev-parse', 'HEAD:a.txt')
+    assert reader.info('HEAD:a.txt') == (blob, 'blob', 6)
+    assert reader.read(blob) == ((blob, 'blob', 6), b'alpha\n')
+    assert reader.info('HEAD').type == 'commit'
+
+
+def test_missing_and_ambiguous_names(reader_repo):
+    git_repo, reader = reader_repo
+    git_repo.commit('first')
+    first, second = ambiguous_blobs()
+    for content in (first, second):
+        git_repo.write('blob.txt', content)
+        git_repo.git('hash-object', '-w', 'blob.txt')
+    prefix = blob_id(first)[:4]
+    for name in ('f' * 40, 'no-such-branch', 'HEAD:missing.txt', prefix):
+        assert reader.info(name) is None
+        assert reader.read(name) == (None, None)
+    # The connections stay usable after a miss
+    assert reader.info(blob_id(first)[:12]).oid == blob_id(first)
+    assert reader.read(blob_id(second))[1] == second
+    for name in ('', 'HEAD\nHEAD'):
+        with pytest.raises(ValueError):
+            reader.info(name)
+
+
+def test_resolve(reader_repo):
+    git_repo, reader = reader_repo
+    commit_hash = git_repo.commit('first', {'a.txt': 'a\n'})
+    git_repo.git('tag', '-a', '-m', 'release', 'v1')
+    assert reader.resolve(commit_hash[:7]) == commit_hash
+    assert reader.resolve('v1') == commit_hash
+    assert reader.resolve('v1', 'tree') == git_repo.git('rev-parse', 'HEAD^{tree}')
+    with pytest.raises(ValueError):
+        reader.resolve('no-such-branch')
+    with pytest.raises(ValueError):
+        reader.resolve('HEAD:a.txt')
+
+
+def test_commit_header_of_a_root_commit(reader_repo):
+    git_repo, reader = reader_repo
+    commit_hash = git_repo.commit('first line\n\nbody', {'a.txt': 'a\n'})
+    header = reader.commitHeader(commit_hash[:7])
+    assert header.hash == commit_hash
+    assert header.tree == git_repo.git('rev-parse', 'HEAD^{tree}')
+    assert header.parents == ()
+    assert header.author == header.committer == 'Ada Lovelace <ada@example.com>'
+    assert header.author_date == header.commit_date == EPOCH + 60
+    assert header.subject == 'first line'
+    with pytest.raises(ValueError):
+        reader.commitHeader('no-such-branch')
+
+
+def test_commit_header_of_a_merge(reader_repo):
+    git_repo, reader = reader_repo
+    root = git_repo.commit('root', {'a.txt': 'a\n'})
+    git_repo.git('checkout', '-q', '-b', 'feature')
+    feature = git_repo.commit('feature', {'b.txt': 'b\n'})
+    git_repo.git('checkout', '-q', 'main')
+    main = git_repo.commit('main', {'a.txt': 'a 2\n'})
+    git_repo.git('merge', '-q', '--no-ff', '-m', 'Merge branch feature', 'feature')
+    header = reader.commitHeader('HEAD')
+    assert header.parents == (main, feature)
+    assert header.subject == 'Merge branch feature'
+    assert reader.parents('HEAD~1') == (root,)
+
+
+def test_split_identity():
+    assert GitObjectReader.splitIdentity('A <a@example.com> 1700000000 +0100') == ('A <a@example.com>', 1700000000)
+    assert GitObjectReader.splitIdentity('A <a@example.com> x') == ('A <a@example.com>', None)
+
+
+def test_a_dead_process_is_restarted(reader_repo):
+    git_repo, reader = reader_repo
+    commit_hash = git_repo.commit('first')
+    assert reader.info('HEAD').oid == commit_hash
+    process = reader._check.process
+    process.kill()
+    process.wait()
+    assert reader.info('HEAD').oid == commit_hash
+    assert reader._check.process is not process
+
+
+def test_a_process_dying_mid_query_is_replaced(reader_repo, monkeypatch):
+    git_repo, reader = reader_repo
+    commit_hash = git_repo.commit('first')
+    assert reader.read('HEAD')[0].oid == commit_hash
+    process = reader._batch.process
+    # The process answers nothing, as if it had died after the name was sent
+    monkeypatch.setattr(process.stdout, 'readline', lambda: b'')
+    with pytest.raises(OSError):
+        reader.read('HEAD')
+    assert reader._batch.process is None
+    assert process.poll() is not None
+    assert reader.read('HEAD')[0].oid == commit_hash
+
+
+def test_shared_reader_per_repository(git_repo, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    other_dir = tmp_path / 'other'
+    other_dir.mkdir()
+    try:
+        reader = GitObjectReader.shared(git_repo.path)
+        assert GitObjectReader.shared('repo') is reader
+        assert GitObjectReader.shared(str(tmp_path / 'repo' / '.')) is reader
+        assert GitObjectReader.shared(str(other_dir)) is not reader
+        GitObjectReader.close_all()
+        assert GitObjectReader.shared(git_repo.path) is not reader
+    finally:
+        GitObjectReader.close_all()
@@ -0,0 +1,203 @@
+import os
+import subprocess
+import threading
+import time
+
+import pytest
+from PyQt5.QtCore import QCoreApplication
+
+from GitProcess import (MAX_STDERR_BYTES, CancelToken, GitCancelled, StderrDrain, finish_git, popen_git,
+                        run_git)
+from TaskRunner import GitTask, TaskRunner
+
+needs_fifo = pytest.mark.skipif(not hasattr(os, 'mkfifo'), reason='needs named pipes')
+
+
+@pytest.fixture
+def blocked_git(git_repo, tmp_path):
+    """ Arguments of a git command that blocks until killed: reading a config file from a pipe nobody writes. """
+    fifo = str(tmp_path / 'config.fifo')
+    os.mkfifo(fifo)
+    return git_repo, ['config', '--file', fifo, '--list']
+
+
+@pytest.fixture
+def noisy_repo(git_repo):
+    """ A repository whose for-each-ref warns about 3000 broken refs, well over a pipe buffer of stderr. """
+    git_repo.commit('first')
+    heads_dir = os.path.join(git_repo.path, '.git', 'refs', 'heads')
+    for number in range(3000):
+        with open(os.path.join(heads_dir, f'broken-{number:04d}-' + 'x' * 40), 'w') as ref_file:
+            ref_file.write('not a hash\n')
+    return git_repo
+
+
+def in_thread(target, *args):
+    """ Run target on a thread; returns (thread, outcome) with outcome['result'] or outcome['error'] once joined. """
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = target(*args)
+        except BaseException as e:
+            outcome['error'] = e
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def wait_for_process(token):
+    deadline = time.monotonic() + 10
+    while not token._processes:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return next(iter(token._processes))
+
+
+def test_run_git(git_repo):
+    commit_hash = git_repo.commit('first')
+    result = run_git(git_repo.path, ['rev-parse', 'HEAD'])
+    assert (result.returncode, result.stdout) == (0, commit_hash + '\n')
+    assert run_git(git_repo.path, ['rev-parse', 'HEAD'], text=False).stdout == commit_hash.encode() + b'\n'
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        run_git(git_repo.path, ['rev-parse', '--verify', 'no-such-branch'])
+    assert error.value.stderr.startswith('fatal')
+    assert run_git(git_repo.path, ['rev-parse', '--verify', 'no-such-branch'], check=False).returncode != 0
+
+
+def test_run_git_into_a_file(git_repo, tmp_path):
+    commit_hash = git_repo.commit('first')
+    with open(tmp_path / 'out', 'w') as out_file:
+        assert run_git(git_repo.path, ['rev-parse', 'HEAD'], stdout=out_file).stdout is None
+    assert (tmp_path / 'out').read_text() == commit_hash + '\n'
+
+
+def test_popen_git_with_a_cancelled_token_does_not_start(git_repo):
+    token = CancelToken()
+    token.cancel()
+    assert token.is_cancelled
+    with pytest.raises(GitCancelled):
+        popen_git(git_repo.path, ['version'], token)
+    with pytest.raises(GitCancelled):
+        run_git(git_repo.path, ['version'], token)
+
+
+def test_process_registered_after_cancel_is_killed(git_repo):
+    process = subprocess.Popen(['git', 'cat-file', '--batch'], cwd=git_repo.path, stdin=subprocess.PIPE)
+    token = CancelToken()
+    token.cancel()
+    token.register(process)
+    assert process.wait(10) != 0
+    process.stdin.close()
+
+
+@needs_fifo
+def test_cancel_kills_a_running_git_process(blocked_git):
+    git_repo, args = blocked_git
+    token = CancelToken()
+    thread, outcome = in_thread(run_git, git_repo.path, args, token)
+    process = wait_for_process(token)
+    token.cancel()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert isinstance(outcome['error'], GitCancelled)
+    assert process.returncode != 0
+    assert not token._processes
+
+
+@needs_fifo
+def test_cancel_kills_a_streamed_git_process(blocked_git):
+    git_repo, args = blocked_git
+    token = CancelToken()
+    process = popen_git(git_repo.path, args, token, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr_drain = StderrDrain(process)
+    token.cancel()
+    assert process.stdout.read() == b''
+    assert process.wait(10) != 0
+    stderr_drain.finish()
+    process.stdout.close()
+    token.unregister(process)
+    finish_git(process, 0)
+    with pytest.raises(GitCancelled):
+        token.raise_if_cancelled()
+
+
+def stream_with_drain(repo_dir, args):
+    process = popen_git(repo_dir, args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr_drain = StderrDrain(process)
+    stdout = process.stdout.read()
+    process.stdout.close()
+    process.wait()
+    return stdout, stderr_drain.finish()
+
+
+def test_large_stderr_does_not_deadlock(noisy_repo):
+    thread, outcome = in_thread(stream_with_drain, noisy_repo.path, ['for-each-ref', '--format=%(refname)'])
+    thread.join(60)
+    assert not thread.is_alive()
+    stdout, stderr = outcome['result']
+    assert stdout == b'refs/heads/main\n'
+    # Only the end of the warnings is kept
+    assert len(stderr) == MAX_STDERR_BYTES
+    assert stderr.endswith(b'broken-2999-' + b'x' * 40 + b'\n')
+
+
+def test_run_git_with_large_stderr(noisy_repo):
+    thread, outcome = in_thread(run_git, noisy_repo.path, ['for-each-ref', '--format=%(refname)'])
+    thread.join(60)
+    assert not thread.is_alive()
+    assert outcome['result'].stdout == 'refs/heads/main\n'
+    assert outcome['result'].stderr.count('warning') == 3000
+
+
+def run_task(fn, cancel=False):
+    """ Run a GitTask on this thread; returns the signals it emitted as [(name, value)]. """
+    task = GitTask(fn)
+    emitted = []
+    for name in ('progress', 'partial', 'result', 'error', 'cancelled', 'finished'):
+        getattr(task.signals, name).connect(lambda *value, name=name: emitted.append((name, *value)))
+    if cancel:
+        task.cancel()
+    task.run()
+    return emitted
+
+
+def test_task_signals(git_repo):
+    git_repo.commit('first')
+
+    def work(task):
+        task.report('working')
+        task.publish(1)
+        return run_git(git_repo.path, ['rev-parse', 'HEAD'], task.token).stdout.strip()
+    assert run_task(work) == [('progress', 'working'), ('partial', 1), ('result', git_repo.git('rev-parse', 'HEAD')),
+                              ('finished',)]
+
+    def failing(task):
+        return run_git(git_repo.path, ['rev-parse', '--verify', 'no-such-branch'], task.token)
+    [(name, message), finished] = run_task(failing)
+    assert (name, finished) == ('error', ('finished',))
+    assert message.startswith('fatal')
+
+    assert run_task(failing, cancel=True) == [('cancelled',), ('finished',)]
+    assert run_task(lambda task: 1 / 0)[0] == ('error', 'division by zero')
+
+
+@needs_fifo
+def test_task_runner_cancels_by_owner(blocked_git):
+    git_repo, args = blocked_git
+    app = QCoreApplication.instance() or QCoreApplication([])
+    runner = TaskRunner()
+    owner = object()
+    outcomes = []
+    task = runner.submit(lambda task: run_git(git_repo.path, args, task.token), owner=owner,
+                         on_cancelled=lambda: outcomes.append('cancelled'))
+    assert runner.activeCount(owner) == 1 and runner.activeCount(object()) == 0
+    wait_for_process(task.token)
+    runner.cancelAll(owner)
+    deadline = time.monotonic() + 10
+    while runner.isActive(task):
+        assert time.monotonic() < deadline
+        app.processEvents()
+        time.sleep(0.01)
+    assert outcomes == ['cancelled']
+    assert runner.activeCount() == 0
@@ -0,0 +1,117 @@
+import pytest
+
+import PRPatchExtractor as extractor_module
+
+from DiffCache import DiffCache
+from DiffOptions import DiffOptions
+from GitObjectReader import GitObjectReader
+from PRPatchExtractor import PRPatchExtractor
+
+
+@pytest.fixture
+def pr_repo(git_repo):
+    """ A PR of three commits merged into main, which moved on meanwhile. Returns (repo, merge, PR commits). """
+    fork = git_repo.commit('base', {'main.txt': 'main\n', 'feature.txt': 'start\n'})
+    git_repo.commit('main moves on', {'main.txt': 'main 2\n'})
+    git_repo.git('checkout', '-q', '-b', 'feature', fork)
+    commits = [git_repo.commit(f'feature {step}', {'feature.txt': f'start\nstep {step}\n',
+                                                   f'part_{step}.txt': f'part {step}\n'}) for step in range(3)]
+    git_repo.git('checkout', '-q', 'main')
+    git_repo.git('merge', '-q', '--no-ff', '-m', 'Merge pull request #1 from feature', 'feature')
+    yield git_repo, git_repo.git('rev-parse', 'HEAD'), commits
+    GitObjectReader.close_all()
+
+
+def expected_patch(git_repo, commit_hash):
+    return git_repo.git('diff', f'{commit_hash}^', commit_hash) + '\n'
+
+
+def read(path):
+    with open(path) as patch_file:
+        return patch_file.read()
+
+
+def test_pr_commits(pr_repo):
+    git_repo, merge, commits = pr_repo
+    fork = git_repo.git('rev-parse', f'{commits[0]}^')
+    assert PRPatchExtractor(git_repo.path, None).pr_commits(merge) == \
+        [(commits[2], commits[1]), (commits[1], commits[0]), (commits[0], fork)]
+
+
+def test_patch_per_commit(pr_repo, tmp_path):
+    git_repo, merge, commits = pr_repo
+    results = PRPatchExtractor(git_repo.path, str(tmp_path)).run(merge)
+    assert [result.commit for result in results] == commits[::-1]
+    for result in results:
+        assert read(result.path) == expected_patch(git_repo, result.commit)
+
+
+def test_combined_patch_keeps_commit_order_with_cached_commits(pr_repo, tmp_path):
+    git_repo, merge, commits = pr_repo
+    cache = DiffCache(str(tmp_path / 'config'))
+    (tmp_path / 'first').mkdir()
+    (tmp_path / 'second').mkdir()
+    # Cache only the middle commit, so the combined file mixes cached and streamed patches
+    PRPatchExtractor(git_repo.path, str(tmp_path / 'first'), cache).run(merge)
+    for commit_hash in (commits[0], commits[2]):
+        parent = git_repo.git('rev-parse', f'{commit_hash}^')
+        cache.entries.pop(PRPatchExtractor(git_repo.path, None).cacheKey(commit_hash, parent))
+
+    [result] = PRPatchExtractor(git_repo.path, str(tmp_path / 'second'), cache).run(merge, combined=True)
+    assert result.commit == merge
+    assert read(result.path) == ''.join(f'commit {commit_hash}\n' + expected_patch(git_repo, commit_hash)
+                                        for commit_hash in commits[::-1])
+
+
+def test_cached_patches_are_reused(pr_repo, tmp_path):
+    git_repo, merge, commits = pr_repo
+    cache = DiffCache(str(tmp_path / 'config'))
+    (tmp_path / 'first').mkdir()
+    (tmp_path / 'second').mkdir()
+    PRPatchExtractor(git_repo.path, str(tmp_path / 'first'), cache).run(merge)
+    assert cache.stats()['entries'] == 3
+    results = PRPatchExtractor(git_repo.path, str(tmp_path / 'second'), cache).run(merge)
+    assert cache.stats()['hits'] == 3
+    assert [read(result.path) for result in results] == [expected_patch(git_repo, commit_hash)
+                                                         for commit_hash in commits[::-1]]
+
+
+def test_diff_options_key_the_cache(pr_repo, tmp_path):
+    git_repo, merge, _ = pr_repo
+    cache = DiffCache(str(tmp_path / 'config'))
+    PRPatchExtractor(git_repo.path, str(tmp_path), cache).run(merge)
+    PRPatchExtractor(git_repo.path, str(tmp_path), cache, diff_options=DiffOptions(renames=False)).run(merge)
+    assert cache.stats()['hits'] == 0
+    assert cache.stats()['entries'] == 6
+
+
+def test_commit_hashes_are_passed_on_stdin(pr_repo, tmp_path, monkeypatch):
+    git_repo, _, _ = pr_repo
+    git_repo.git('checkout', '-q', 'feature')
+    commits = [git_repo.commit(f'more {step}', {'feature.txt': f'more {step}\n'}) for step in range(20)]
+    git_repo.git('checkout', '-q', 'main')
+    git_repo.git('merge', '-q', '--no-ff', '-m', 'Merge pull request #2 from feature', 'feature')
+    merge = git_repo.git('rev-parse', 'HEAD')
+    commands = []
+
+    def recording_popen_git(repo_dir, args, token=None, **kwargs):
+        commands.append(args)
+        return popen_git(repo_dir, args, token, **kwargs)
+    popen_git = extractor_module.popen_git
+    monkeypatch.setattr(extractor_module, 'popen_git', recording_popen_git)
+
+    results = PRPatchExtractor(git_repo.path, str(tmp_path)).run(merge)
+    assert [result.commit for result in results] == commits[::-1]
+    for result in results:
+        assert read(result.path) == expected_patch(git_repo, result.commit)
+    [command] = commands
+    assert '--stdin' in command
+    assert not set(commits) & set(command)
+
+
+def test_not_a_merge(git_repo, tmp_path):
+    git_repo.commit('base')
+    commit_hash = git_repo.commit('second')
+    with pytest.raises(ValueError, match=f'{commit_hash} is not a merge commit'):
+        PRPatchExtractor(git_repo.path, str(tmp_path)).run(commit_hash)
+    GitObjectReader.close_all()
@@ -0,0 +1,61 @@
+from SearchIndex import CommitSearchIndex, HashPrefixTrie
+
+HASHES = ['abc123' + '0' * 34, 'abc124' + '1' * 34, 'abd000' + '2' * 34, 'ffffff' + '3' * 34]
+
+
+def make_index(texts):
+    index = CommitSearchIndex()
+    for text in texts:
+        index.add(text)
+    return index
+
+
+def test_trie_prefixes():
+    trie = HashPrefixTrie(depth=6)
+    for record_id, commit_hash in enumerate(HASHES):
+        trie.add(commit_hash, record_id)
+    assert sorted(trie.find('ab')) == [0, 1, 2]
+    assert sorted(trie.find('abc12')) == [0, 1]
+    assert trie.find('abc123') == [0]
+    assert trie.find('abd') == [2]
+    assert trie.find('abe') == []
+    assert sorted(trie.find('')) == [0, 1, 2, 3]
+
+
+def test_trie_prefix_longer_than_depth_is_cut():
+    trie = HashPrefixTrie(depth=3)
+    for record_id, commit_hash in enumerate(HASHES):
+        trie.add(commit_hash, record_id)
+    # Only the first 3 characters are indexed; the search narrows longer prefixes by text
+    assert sorted(trie.find('abc999')) == [0, 1]
+
+
+def test_search_hash_prefixes():
+    index = make_index([f'{commit_hash} Merge pull request #{number}' for number, commit_hash in enumerate(HASHES)])
+    assert index.search('abc') == [0, 1]
+    assert index.search('ABC124') == [1]
+    assert index.search('abc124' + '1' * 10) == [1]
+    assert index.search('abc125') == []
+
+
+def test_search_word_prefixes():
+    index = make_index(['Merge pull request #12 from feature/2', 'Refactor the parser', 'prefetch pages',
+                        'Add #120 support'])
+    assert index.search('feat') == [0]
+    assert index.search('pars') == [1]
+    # Only at the start of a word
+    assert index.search('fetch') == []
+    assert index.search('#12') == [0, 3]
+    assert index.search('pull request') == [0]
+    assert index.search('') == [0, 1, 2, 3]
+    assert index.search('  ') == [0, 1, 2, 3]
+
+
+def test_narrowing_reuses_and_extends_results():
+    index = make_index(['render view', 'render model', 'parse view'])
+    assert index.search('ren') == [0, 1]
+    assert index.search('render m') == [1]
+    # Records added after a search stay in the cached results the next narrowing query starts from
+    index.add('render model cache')
+    assert index.search('render mo') == [1, 3]
+    assert index.search('view') == [0, 2]